@@ -0,0 +1,89 @@
+import os
+import re
+import base64
+import hashlib
+
+import numpy as np
+
+# Cross-brand price and catalog analytics. Per-brand statistics are computed
+# once per save (db._refresh_brand_stats) from the catalog's price array;
+# comparisons only combine those precomputed rows.
+
+# ---------- Settings ----------
+# lower edges of the price bands shared by every brand; the last band is open-ended
+ANALYTICS_PRICE_BANDS = [float(x) for x in os.getenv("ANALYTICS_PRICE_BANDS", "0,250,500,1000,2500,5000,10000").split(",")]
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+# ---------------- Per-brand statistics ----------------
+def price_stats(prices) -> dict:
+    """Catalog size, price percentiles and per-band counts of a price array (NaN = no price)."""
+    prices = np.asarray(prices, dtype=np.float64)
+    priced = prices[~np.isnan(prices)]
+    stats = {"products": int(prices.size), "priced": int(priced.size), "band_edges": ANALYTICS_PRICE_BANDS}
+    if priced.size:
+        stats.update(min=round(float(priced.min()), 2), max=round(float(priced.max()), 2),
+                     mean=round(float(priced.mean()), 2))
+        for pct, value in zip(PERCENTILES, np.percentile(priced, PERCENTILES)):
+            stats[f"p{pct}"] = round(float(value), 2)
+    else:
+        stats.update({key: None for key in ["min", "max", "mean"] + [f"p{pct}" for pct in PERCENTILES]})
+    edges = np.append(np.asarray(ANALYTICS_PRICE_BANDS), np.inf)
+    stats["band_counts"] = np.histogram(priced, bins=edges)[0].tolist()
+    return stats
+
+
+def _title_key(title: str) -> str:
+    return " ".join(re.findall(r"\w+", title.lower()))
+
+
+def title_keys(titles) -> np.ndarray:
+    """Sorted unique 64-bit hashes of normalized product titles (what catalog overlap compares)."""
+    keys = set()
+    for title in titles:
+        key = _title_key(title or "")
+        if key:
+            keys.add(int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little"))
+    return np.array(sorted(keys), dtype=np.uint64)
+
+
+def pack_keys(keys: np.ndarray) -> str:
+    return base64.b64encode(keys.astype("<u8").tobytes()).decode("ascii")
+
+
+def unpack_keys(text: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(text), dtype="<u8")
+
+
+# ---------------- Comparison ----------------
+def band_labels(edges: list) -> list:
+    upper = edges[1:] + [None]
+    return [f"{lo:g}+" if hi is None else f"{lo:g}-{hi:g}" for lo, hi in zip(edges, upper)]
+
+
+def compare(rows: list) -> dict:
+    """
+    Side-by-side view of precomputed brand rows ({"brand_id", "brand_name",
+    "stats", "keys"}): stats per brand, each brand's share of priced products
+    per band, and pairwise catalog overlap (shared titles, Jaccard index).
+    """
+    if not rows:
+        return {"bands": band_labels(ANALYTICS_PRICE_BANDS), "brands": [], "overlap": []}
+    counts = np.array([r["stats"]["band_counts"] for r in rows], dtype=np.float64)
+    priced = counts.sum(axis=1, keepdims=True)
+    shares = np.divide(counts, priced, out=np.zeros_like(counts), where=priced > 0).round(4)
+
+    brands = []
+    for r, share in zip(rows, shares):
+        stats = {k: v for k, v in r["stats"].items() if k != "band_edges"}
+        brands.append({"brand_id": r["brand_id"], "brand_name": r["brand_name"], **stats, "band_share": share.tolist()})
+
+    overlap = []
+    for i in range(len(rows)):
+        for j in range(i + 1, len(rows)):
+            a, b = rows[i]["keys"], rows[j]["keys"]
+            shared = int(np.intersect1d(a, b, assume_unique=True).size)
+            union = a.size + b.size - shared
+            overlap.append({"brand_id_a": rows[i]["brand_id"], "brand_id_b": rows[j]["brand_id"], "shared": shared,
+                            "jaccard": round(shared / union, 4) if union else 0.0})
+    return {"bands": band_labels(ANALYTICS_PRICE_BANDS), "brands": brands, "overlap": overlap}
@@ -1,55 +1,150 @@
+import os
+import json
 import streamlit as st
 import requests
 import pandas as pd
 
-BACKEND_URL = "http://127.0.0.1:8000"
+# optional: stored catalogs load as one Arrow file instead of JSON pages
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
+CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "300"))     # seconds backend responses are reused
+PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "50"))      # rows per product / brand table page
 
 st.set_page_config(page_title="Shopify Insights Dashboard", layout="wide")
 st.title("🛍️ Shopify Insights Dashboard")
 st.caption("Clean, user-friendly tables (with images) — no raw HTML or JSON.")
 
-page = st.sidebar.radio("📌 Navigation", ["Fetch Insights", "Competitors", "Stored Brands"])
+page = st.sidebar.radio("📌 Navigation", ["Fetch Insights", "Competitors", "Stored Brands", "Compare Brands"])
+
+# --------- Backend calls ---------
+class BackendError(Exception):
+    def __init__(self, status: int, text: str):
+        super().__init__(f"Error {status}: {text}")
+        self.status = status
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """One keep-alive session shared by every rerun and user."""
+    return requests.Session()
+
+
+def _get_json(path: str, params: tuple = ()) -> dict:
+    """{"json", "next_cursor"} for a GET; errors raise, so they are never cached."""
+    resp = http_session().get(f"{BACKEND_URL}{path}", params=dict(params), timeout=180)
+    if resp.status_code != 200:
+        raise BackendError(resp.status_code, resp.text)
+    return {"json": resp.json(), "next_cursor": resp.headers.get("X-Next-Cursor")}
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner="Fetching competitors...")
+def fetch_competitors(url: str) -> list:
+    return _get_json("/fetch-competitors", (("website_url", url),))["json"]
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_stored(path: str, params: tuple = ()) -> dict:
+    """Reads of stored brands (/brands, /brand/{id}, /brand/{id}/products)."""
+    return _get_json(path, params)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner="Loading catalog...")
+def fetch_catalog(brand_id: int) -> pd.DataFrame:
+    """A stored brand's whole catalog (/brand/{id}/products.arrow) with a numeric price column."""
+    resp = http_session().get(f"{BACKEND_URL}/brand/{brand_id}/products.arrow", timeout=180)
+    if resp.status_code != 200:
+        raise BackendError(resp.status_code, resp.text)
+    return pa.ipc.open_file(pa.BufferReader(resp.content)).read_pandas()
+
+
+def invalidate_stored():
+    """Drop cached stored-brand reads (a crawl may have just saved new data)."""
+    fetch_stored.clear()
+    fetch_catalog.clear()
 
-def render_brand_tabs(data: dict):
-    st.success(f"📌 Showing insights for **{data['brand_name']}**")
 
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(
-        ["📦 Products", "⭐ Hero Products", "📜 Policies", "📞 Contact", "❓ FAQs", "🔗 About & Links"]
+if st.sidebar.button("🔄 Reload from backend"):
+    st.cache_data.clear()
+
+# --------- Pagination ---------
+def local_page(items: list, key: str) -> list:
+    """Slice of `items` for the page picked under the table."""
+    pages = max(1, -(-len(items) // PAGE_SIZE))
+    number = st.number_input(f"Page (of {pages})", 1, pages, 1, key=f"{key}_page") if pages > 1 else 1
+    return items[(number - 1) * PAGE_SIZE:number * PAGE_SIZE]
+
+
+def cursor_pager(key: str):
+    """Cursor of the current page of a cursor-paginated listing (earlier cursors kept for ◀)."""
+    return st.session_state.setdefault(key, [None])[-1]
+
+
+def cursor_nav(key: str, next_cursor):
+    stack = st.session_state[key]
+    col1, col2, col3 = st.columns([1, 1, 6])
+    col1.button("◀ Prev", key=f"{key}_prev", disabled=len(stack) == 1, on_click=stack.pop)
+    col2.button("Next ▶", key=f"{key}_next", disabled=next_cursor is None, on_click=stack.append, args=(next_cursor,))
+    col3.caption(f"Page {len(stack)}")
+
+# --------- Sections ---------
+SECTIONS = ["📦 Products", "⭐ Hero Products", "📜 Policies", "📞 Contact", "❓ FAQs", "🔗 About & Links"]
+# brand fields each section needs (for /brand/{id}?fields=); products are paged separately
+SECTION_FIELDS = {
+    "📦 Products": [],
+    "⭐ Hero Products": ["hero_products"],
+    "📜 Policies": ["policies"],
+    "📞 Contact": ["contact_details", "social_handles"],
+    "❓ FAQs": ["faqs"],
+    "🔗 About & Links": ["about", "important_links"],
+}
+
+
+# insights keys shown by each section (what a streamed section needs before it can render)
+SECTION_KEYS = {**SECTION_FIELDS, "📦 Products": ["products"]}
+
+
+def pick_section(key: str) -> str:
+    # only the selected section is built on each rerun (st.tabs would build all six)
+    return st.radio("Section", SECTIONS, horizontal=True, key=f"{key}_section", label_visibility="collapsed")
+
+
+def product_table(prods, caption: str):
+    """Products as a list of API dicts or a catalog DataFrame (numeric prices)."""
+    if len(prods) == 0:
+        st.info("No products found")
+        return
+    df = prods if isinstance(prods, pd.DataFrame) else pd.DataFrame(prods)
+    # normalize columns that might be missing
+    for col in ("image_url", "product_url", "price", "title"):
+        if col not in df.columns: df[col] = ""
+    st.dataframe(
+        df[["image_url", "title", "price", "product_url"]],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "image_url": st.column_config.ImageColumn("Image", width="small"),
+            "title": st.column_config.TextColumn("Title"),
+            "price": (st.column_config.NumberColumn("Price", format="%.2f")
+                      if pd.api.types.is_numeric_dtype(df["price"]) else st.column_config.TextColumn("Price")),
+            "product_url": st.column_config.LinkColumn("Product Link"),
+        },
     )
+    st.caption(caption)
 
-    # Products
-    with tab1:
-        prods = data.get("products", [])
-        if prods:
-            df = pd.DataFrame(prods)
-            # normalize columns that might be missing
-            if "image_url" not in df.columns: df["image_url"] = ""
-            if "product_url" not in df.columns: df["product_url"] = ""
-            if "price" not in df.columns: df["price"] = ""
-            if "title" not in df.columns: df["title"] = ""
-            st.dataframe(
-                df[["image_url", "title", "price", "product_url"]],
-                use_container_width=True,
-                hide_index=True,
-                column_config={
-                    "image_url": st.column_config.ImageColumn("Image", width="small"),
-                    "title": st.column_config.TextColumn("Title"),
-                    "price": st.column_config.TextColumn("Price"),
-                    "product_url": st.column_config.LinkColumn("Product Link"),
-                },
-            )
-            st.caption(f"Total products shown: {len(df)}")
-        else:
-            st.info("No products found")
 
+def render_section(section: str, data: dict):
+    """Everything but the product table, from a (possibly partial) insights dict."""
     # Hero Products
-    with tab2:
+    if section == "⭐ Hero Products":
         hero = data.get("hero_products", [])
         if hero:
             dfh = pd.DataFrame(hero)
-            if "image_url" not in dfh.columns: dfh["image_url"] = ""
-            if "product_url" not in dfh.columns: dfh["product_url"] = ""
-            if "title" not in dfh.columns: dfh["title"] = ""
+            for col in ("image_url", "product_url", "title"):
+                if col not in dfh.columns: dfh[col] = ""
             st.dataframe(
                 dfh[["image_url", "title", "product_url"]],
                 use_container_width=True,
@@ -65,7 +160,7 @@ def render_brand_tabs(data: dict):
             st.info("No hero products found")
 
     # Policies
-    with tab3:
+    elif section == "📜 Policies":
         pol = data.get("policies", {})
         if pol:
             st.table(pd.DataFrame([pol]))
@@ -73,7 +168,7 @@ def render_brand_tabs(data: dict):
             st.info("No policies available")
 
     # Contact & Social
-    with tab4:
+    elif section == "📞 Contact":
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Contact Details")
@@ -83,7 +178,7 @@ def render_brand_tabs(data: dict):
             st.table(pd.DataFrame([data.get("social_handles", {})]))
 
     # FAQs
-    with tab5:
+    elif section == "❓ FAQs":
         faqs = data.get("faqs", [])
         if faqs:
             st.table(pd.DataFrame(faqs))
@@ -91,7 +186,7 @@ def render_brand_tabs(data: dict):
             st.info("No FAQs found")
 
     # About & Links
-    with tab6:
+    elif section == "🔗 About & Links":
         st.subheader("About the Brand")
         st.write(data.get("about", "N/A"))
         links = data.get("important_links", [])
@@ -101,61 +196,167 @@ def render_brand_tabs(data: dict):
         else:
             st.info("No important links found")
 
+
+def render_brand_tabs(data: dict, key: str):
+    """A fully fetched brand (live crawl or competitor)."""
+    st.success(f"📌 Showing insights for **{data['brand_name']}**")
+    section = pick_section(key)
+    if section == "📦 Products":
+        prods = data.get("products", [])
+        shown = local_page(prods, key)
+        product_table(shown, f"Showing {len(shown)} of {len(prods)} products")
+    else:
+        render_section(section, data)
+
+
+def stream_insights(url: str) -> dict:
+    """Render each section as /fetch-insights/stream delivers it; returns the assembled insights."""
+    status = st.empty()
+    status.info("⏳ Crawling...")
+    slots = {}
+    for section, tab in zip(SECTIONS, st.tabs(SECTIONS)):
+        with tab:
+            slots[section] = st.empty()
+            slots[section].caption("⏳ Loading...")
+
+    data = {}
+    with http_session().get(f"{BACKEND_URL}/fetch-insights/stream", params={"website_url": url},
+                            stream=True, timeout=180) as resp:
+        if resp.status_code != 200:
+            raise BackendError(resp.status_code, resp.text)
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["event"] == "start":
+                data["brand_name"] = event["brand_name"]
+                status.info(f"⏳ Crawling **{event['brand_name']}**...")
+            elif event["event"] == "section":
+                data[event["key"]] = event["data"]
+                for section, keys in SECTION_KEYS.items():
+                    if event["key"] not in keys or not all(k in data for k in keys):
+                        continue
+                    with slots[section].container():
+                        if section == "📦 Products":
+                            # no pager while streaming; the next rerun shows the paginated table
+                            prods = data["products"]
+                            product_table(prods[:PAGE_SIZE], f"Showing {min(PAGE_SIZE, len(prods))} of {len(prods)} products")
+                        else:
+                            render_section(section, data)
+            elif event["event"] == "summary":
+                missing = f" — not found: {', '.join(event['missing'])}" if event["missing"] else ""
+                status.success(f"📌 Showing insights for **{event['brand_name']}** ({event['elapsed_ms'] / 1000:.1f}s){missing}")
+    return data
+
+
+def render_stored_brand(brand_id: int):
+    """A stored brand, loading only the fields (or product page) the selected section shows."""
+    key = f"brand_{brand_id}"
+    section = pick_section(key)
+    fields = ",".join(["brand_name"] + SECTION_FIELDS[section])
+    data = fetch_stored(f"/brand/{brand_id}", (("fields", fields),))["json"]
+    st.success(f"📌 Showing insights for **{data['brand_name']}**")
+    if section == "📦 Products" and pa is not None:
+        df = fetch_catalog(brand_id)
+        shown = local_page(df, key)
+        priced = df["price"].dropna()
+        stats = f" — prices {priced.min():.2f} to {priced.max():.2f}, median {priced.median():.2f}" if len(priced) else ""
+        product_table(shown, f"Showing {len(shown)} of {len(df)} products{stats}")
+    elif section == "📦 Products":
+        cursor_key = f"{key}_products"
+        cursor = cursor_pager(cursor_key)
+        result = fetch_stored(f"/brand/{brand_id}/products", (("limit", PAGE_SIZE),) + ((("cursor", cursor),) if cursor else ()))
+        product_table(result["json"], f"Products shown: {len(result['json'])}")
+        cursor_nav(cursor_key, result["next_cursor"])
+    else:
+        render_section(section, data)
+
 # --------- Pages ---------
 if page == "Fetch Insights":
     st.header("🔎 Fetch Brand Insights")
     url = st.text_input("Enter Shopify Store URL", "memy.co.in")
     if st.button("Fetch Insights"):
+        invalidate_stored()
         try:
-            resp = requests.get(f"{BACKEND_URL}/fetch-insights", params={"website_url": url})
-            if resp.status_code == 200:
-                data = resp.json()
-                render_brand_tabs(data)
-            else:
-                st.error(f"Error {resp.status_code}: {resp.text}")
+            # sections appear as they arrive; kept for later reruns (section / page changes)
+            st.session_state["insights"] = stream_insights(url)
         except Exception as e:
             st.error(f"❌ Failed to fetch insights: {e}")
+    elif st.session_state.get("insights"):
+        render_brand_tabs(st.session_state["insights"], "insights")
 
 elif page == "Competitors":
     st.header("🏆 Competitor Insights")
     url = st.text_input("Enter Shopify Store URL", "memy.co.in")
     if st.button("Fetch Competitors"):
+        st.session_state["competitors_url"] = url
+        # a click means a new crawl, not the cached list from the last one
+        fetch_competitors.clear()
+        invalidate_stored()
+    if st.session_state.get("competitors_url"):
         try:
-            resp = requests.get(f"{BACKEND_URL}/fetch-competitors", params={"website_url": url})
-            if resp.status_code == 200:
-                brands = resp.json()
-                for comp in brands:
-                    st.markdown(f"### 🏬 {comp['brand_name']}")
-                    render_brand_tabs(comp)
-                    st.divider()
-            else:
-                st.error(f"Error {resp.status_code}: {resp.text}")
+            brands = fetch_competitors(st.session_state["competitors_url"])
+            for i, comp in enumerate(brands):
+                with st.expander(f"🏬 {comp['brand_name']}", expanded=i == 0):
+                    render_brand_tabs(comp, f"competitor_{i}")
         except Exception as e:
             st.error(f"❌ Failed to fetch competitors: {e}")
 
 elif page == "Stored Brands":
-    st.header("💾 Stored Brands (from MySQL)")
+    st.header("💾 Stored Brands")
     try:
-        resp = requests.get(f"{BACKEND_URL}/brands")
-        if resp.status_code == 200:
-            brands = resp.json()
-            if not brands:
-                st.info("No brands stored yet. Fetch some first!")
-            else:
-                df_list = pd.DataFrame(brands)
-                st.dataframe(df_list, use_container_width=True, hide_index=True)
-                # Pick by dropdown (no raw IDs to type)
-                options = {f"{row['brand_name']} (ID: {row['id']})": row["id"] for row in brands}
-                selected = st.selectbox("Select a stored brand to view", list(options.keys()))
-                if selected:
-                    brand_id = options[selected]
-                    detail = requests.get(f"{BACKEND_URL}/brand/{brand_id}")
-                    if detail.status_code == 200:
-                        data = detail.json()
-                        render_brand_tabs(data)
-                    else:
-                        st.error("❌ Brand not found")
+        cursor = cursor_pager("brands_page")
+        result = fetch_stored("/brands", (("limit", PAGE_SIZE),) + ((("cursor", cursor),) if cursor else ()))
+        brands = result["json"]
+        if not brands:
+            st.info("No brands stored yet. Fetch some first!")
         else:
-            st.error(f"Error {resp.status_code}: {resp.text}")
+            df_list = pd.DataFrame(brands)
+            st.dataframe(df_list, use_container_width=True, hide_index=True)
+            cursor_nav("brands_page", result["next_cursor"])
+            # Pick by dropdown (no raw IDs to type)
+            options = {f"{row['brand_name']} (ID: {row['id']})": row["id"] for row in brands}
+            selected = st.selectbox("Select a stored brand to view", list(options.keys()))
+            if selected:
+                try:
+                    render_stored_brand(options[selected])
+                except BackendError as e:
+                    st.error("❌ Brand not found" if e.status == 404 else f"❌ {e}")
     except Exception as e:
         st.error(f"❌ Failed to connect to backend: {e}")
+
+elif page == "Compare Brands":
+    st.header("📊 Compare Brands")
+    try:
+        brands = fetch_stored("/brands", (("limit", 1000),))["json"]
+        if len(brands) < 2:
+            st.info("Store at least two brands to compare them.")
+        else:
+            options = {f"{row['brand_name']} (ID: {row['id']})": row["id"] for row in brands}
+            picked = st.multiselect("Brands", list(options), default=list(options)[:5])
+            if len(picked) >= 2:
+                ids = ",".join(str(options[p]) for p in picked)
+                result = fetch_stored("/analytics/prices", (("brand_ids", ids),))["json"]
+                stats = pd.DataFrame(result["brands"]).set_index("brand_name")
+
+                st.subheader("Prices")
+                cols = ["products", "priced", "min", "p10", "p25", "p50", "p75", "p90", "max", "mean"]
+                st.dataframe(stats[cols].rename(columns={"p50": "median"}), use_container_width=True)
+
+                st.subheader("Share of products per price band")
+                # one stacked bar per brand: how its priced catalog splits across the shared bands
+                shares = pd.DataFrame(stats["band_share"].tolist(), index=stats.index, columns=result["bands"])
+                st.bar_chart(shares)
+                st.dataframe((shares * 100).round(1), use_container_width=True)
+                st.caption("% of each brand's priced products")
+
+                st.subheader("Catalog overlap (shared product titles)")
+                names = dict(zip(stats["brand_id"], stats.index))
+                overlap = pd.DataFrame(result["overlap"])
+                overlap["brand_a"] = overlap["brand_id_a"].map(names)
+                overlap["brand_b"] = overlap["brand_id_b"].map(names)
+                st.dataframe(overlap[["brand_a", "brand_b", "shared", "jaccard"]], use_container_width=True, hide_index=True)
+            else:
+                st.info("Pick at least two brands.")
+    except Exception as e:
+        st.error(f"❌ Failed to load analytics: {e}")
@@ -0,0 +1,222 @@
+"""
+Local stand-in for a Shopify storefront, used by the benchmarks.
+
+Serves recorded pages from a fixtures directory (index.html -> /,
+pages/about.html -> /pages/about, ...), a synthetic /products.json catalog of
+any size, and a sitemap index listing the pages. Every response can be
+delayed to mimic network latency, and requests are counted per path.
+
+    python -m benchmarks.fixture_server --products 2000 --latency-ms 40
+    python -m benchmarks.fixture_server --record https://somestore.com --out benchmarks/fixtures/somestore
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "store")
+
+# pages a recording fetches (same paths the scraper probes)
+RECORD_PATHS = [
+    "", "pages/about", "about", "pages/our-story", "pages/faq", "faq", "pages/faqs", "pages/contact",
+    "policies/privacy-policy", "policies/refund-policy", "policies/shipping-policy",
+    "policies/terms-of-service", "collections/all",
+]
+
+
+# ---------------- Fixture pages ----------------
+def load_pages(directory: str = FIXTURES_DIR) -> dict:
+    """{url path: html} for every .html file under `directory`."""
+    pages = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(".html"):
+                continue
+            rel = os.path.relpath(os.path.join(root, name), directory)[:-len(".html")].replace(os.sep, "/")
+            path = "/" if rel == "index" else "/" + rel
+            with open(os.path.join(root, name), encoding="utf-8") as f:
+                pages[path] = f.read()
+    return pages
+
+
+def synthetic_products(page: int, limit: int, total: int) -> list:
+    """One page of a products.json catalog with `total` products, shaped like Shopify's."""
+    start = (page - 1) * limit
+    return [
+        {
+            "id": 7000000000 + i,
+            "title": f"Linen Shirt {i}",
+            "handle": f"linen-shirt-{i}",
+            "body_html": f"<p>Breathable linen shirt <strong>no. {i}</strong>, cut in small batches.</p>",
+            "vendor": "Fixture Apparel",
+            "product_type": "Shirts",
+            "tags": ["linen", "summer"],
+            "variants": [
+                {"id": 40000000000 + i * 3 + v, "title": size, "price": f"{1299 + (i % 40) * 50 + v * 100}.00",
+                 "available": (i + v) % 7 != 0}
+                for v, size in enumerate(("S", "M", "L"))
+            ],
+            "images": [{"src": f"https://cdn.shopify.com/s/files/1/0000/0001/products/shirt-{i}.jpg"}],
+        }
+        for i in range(start, min(total, start + limit))
+    ]
+
+
+def _sitemap(base: str, pages: dict) -> tuple:
+    index = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        f"<sitemap><loc>{base}/sitemap_pages_1.xml</loc></sitemap></sitemapindex>"
+    )
+    urls = "".join(f"<url><loc>{base}{path}</loc></url>" for path in sorted(pages) if path.startswith("/pages/"))
+    child = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+    return index, child
+
+
+# ---------------- Server ----------------
+class FixtureStore:
+    """
+    One fake store on its own port. `hits` counts requests by path
+    (query string included) since the last reset().
+    """
+
+    def __init__(self, pages: dict | None = None, products: int = 1000, latency_ms: float = 0,
+                 port: int = 0, etags: bool = True):
+        self.pages = load_pages() if pages is None else pages
+        self.products = products
+        self.latency = latency_ms / 1000
+        self.etags = etags
+        self.hits = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.hits.clear()
+
+    def requests(self) -> int:
+        with self._lock:
+            return sum(self.hits.values())
+
+    def _respond(self, path: str, query: dict):
+        """(status, content type, body) for a request path."""
+        if path == "/products.json":
+            page = int(query.get("page", ["1"])[0])
+            limit = min(int(query.get("limit", ["30"])[0]), 250)
+            body = json.dumps({"products": synthetic_products(page, limit, self.products)})
+            return 200, "application/json", body
+        if path in ("/sitemap.xml", "/sitemap_pages_1.xml"):
+            index, child = _sitemap(f"http://{self.base_url}", self.pages)
+            return 200, "application/xml", index if path == "/sitemap.xml" else child
+        page = self.pages.get(path.rstrip("/") or "/")
+        if page is None:
+            return 404, "text/html", "<h1>404 Page Not Found</h1>"
+        return 200, "text/html; charset=utf-8", page
+
+    def _handler(self):
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body leave in one write (flushed after each request); with the
+            # default unbuffered wfile, Nagle + delayed ACK stalled keep-alive responses ~40 ms
+            wbufsize = 64 * 1024
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                with store._lock:
+                    store.hits[self.path] += 1
+                if store.latency:
+                    time.sleep(store.latency)
+                status, content_type, body = store._respond(parts.path, parse_qs(parts.query))
+                data = body.encode("utf-8")
+                etag = '"%s"' % hashlib.md5(data).hexdigest()
+                if status == 200 and store.etags and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                if status == 200 and store.etags:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # crawler gave up on this request (e.g. deadline or cancelled prefetch)
+
+        return Handler
+
+
+# ---------------- Recording ----------------
+def record(base_url: str, out_dir: str, paths: list = RECORD_PATHS) -> list:
+    """Save a live store's pages as fixtures; returns the paths written."""
+    import http_client
+
+    root = base_url if base_url.startswith(("http://", "https://")) else "https://" + base_url
+    written = []
+    for path in paths:
+        try:
+            resp = http_client.get(f"{root.rstrip('/')}/{path}", timeout=10)
+        except Exception as e:
+            print(f"[record] {path or '/'} -> {e}")
+            continue
+        if resp.status_code != 200 or "html" not in resp.headers.get("Content-Type", ""):
+            continue
+        target = os.path.join(out_dir, (path or "index") + ".html")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(resp.text)
+        written.append(path or "/")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve (or record) a fixture Shopify store.")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--record", metavar="STORE_URL")
+    parser.add_argument("--out", help="directory for --record (default: benchmarks/fixtures/<host>)")
+    args = parser.parse_args()
+
+    if args.record:
+        host = urlsplit(args.record if "//" in args.record else "//" + args.record).netloc
+        out = args.out or os.path.join(os.path.dirname(__file__), "fixtures", host)
+        print(f"recorded {record(args.record, out)} -> {out}")
+    else:
+        store = FixtureStore(load_pages(args.fixtures), args.products, args.latency_ms, args.port).start()
+        print(f"serving {len(store.pages)} pages and {args.products} products on http://{store.base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            store.stop()
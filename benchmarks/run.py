@@ -0,0 +1,275 @@
+"""
+Offline benchmarks for the crawler, run against local fixture stores.
+
+    python -m benchmarks.run                                  # all benchmarks, print a table
+    python -m benchmarks.run --products 5000 --latency-ms 40 --repeat 10
+    python -m benchmarks.run --save benchmarks/baselines/main.json
+    python -m benchmarks.run --compare benchmarks/baselines/main.json
+    python -m benchmarks.run --only extract_products,fetch_brand_insights
+    python -m benchmarks.run --api http://127.0.0.1:8000      # also hit /fetch-insights on a running server
+
+Per benchmark: p50/p95 wall time, requests made per store, peak traced
+memory and CPU time spent building HTML trees (make_soup). By default the
+crawler's DB persistence (path map, page validators) is switched off and its
+in-memory path map and per-host rate limits are reset before every run, so
+each run is a cold crawl;
+--warm keeps what earlier runs learned, --with-db uses the configured DB.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import threading
+import tracemalloc
+from datetime import datetime
+
+import requests
+
+from benchmarks.fixture_server import FixtureStore, load_pages, FIXTURES_DIR
+
+import scraper
+import service
+import http_client
+import path_map
+import validators
+from pagestore import crawl_scope
+
+EXTRACTORS = [
+    "extract_about", "extract_policies", "extract_contact", "extract_socials",
+    "extract_faqs", "extract_products", "extract_hero_products", "extract_links",
+]
+
+
+# ---------------- Instrumentation ----------------
+class ParseTimer:
+    """Wraps scraper.make_soup and sums the CPU time (per thread) spent in it."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self._original = scraper.make_soup
+
+    def __enter__(self):
+        original = self._original
+
+        def timed_make_soup(html):
+            started = time.thread_time()
+            try:
+                return original(html)
+            finally:
+                with self._lock:
+                    self.seconds += time.thread_time() - started
+
+        scraper.make_soup = timed_make_soup
+        return self
+
+    def __exit__(self, *exc):
+        scraper.make_soup = self._original
+
+    def take(self) -> float:
+        with self._lock:
+            seconds, self.seconds = self.seconds, 0.0
+        return seconds
+
+
+def _offline_db():
+    """Keep the crawler's learned state in memory only (no DB reads or writes)."""
+    path_map.get_store_paths = lambda domain: []
+    path_map.save_store_paths = lambda domain, entries: None
+    validators.CONDITIONAL_REFRESH = False
+
+
+def _reset_crawl_state():
+    http_client._scheduler = http_client.HostScheduler()
+    with path_map._lock:
+        path_map._maps.clear()
+        path_map._dirty.clear()
+        path_map._loaded.clear()
+    with validators._lock:
+        validators._state.clear()
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# ---------------- Runner ----------------
+def measure(name: str, fn, stores: list, repeat: int, warmup: int, warm: bool, timer: ParseTimer) -> dict:
+    """Run `fn` warmup + repeat times; memory is traced on one extra run so it doesn't skew timings."""
+    def one_run():
+        if not warm:
+            _reset_crawl_state()
+        for store in stores:
+            store.reset()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        return elapsed, sum(store.requests() for store in stores)
+
+    for _ in range(warmup):
+        one_run()
+    timer.take()
+
+    times, request_counts = [], []
+    for _ in range(repeat):
+        elapsed, count = one_run()
+        times.append(elapsed)
+        request_counts.append(count)
+    parse_cpu = timer.take()
+
+    tracemalloc.start()
+    try:
+        one_run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    timer.take()
+
+    result = {
+        "runs": repeat,
+        "p50_ms": round(_percentile(times, 50) * 1000, 2),
+        "p95_ms": round(_percentile(times, 95) * 1000, 2),
+        "mean_ms": round(sum(times) / len(times) * 1000, 2),
+        "requests_per_store": round(sum(request_counts) / len(request_counts) / len(stores), 1),
+        "peak_mem_mb": round(peak / 2**20, 2),
+        "parse_cpu_ms": round(parse_cpu / repeat * 1000, 2),
+    }
+    print(f"  {name:<28} p50 {result['p50_ms']:>9.1f} ms  p95 {result['p95_ms']:>9.1f} ms  "
+          f"req/store {result['requests_per_store']:>6.1f}  peak {result['peak_mem_mb']:>7.2f} MB  "
+          f"parse {result['parse_cpu_ms']:>8.1f} ms")
+    return result
+
+
+def _in_scope(fn, *args):
+    def run():
+        with crawl_scope():
+            fn(*args)
+    return run
+
+
+def build_benchmarks(store: FixtureStore, competitors: list, api: str | None) -> dict:
+    base = store.base_url
+    benches = {}
+    for name in EXTRACTORS:
+        benches[name] = (_in_scope(getattr(scraper, name), base), [store])
+    benches["fetch_brand_insights"] = (lambda: service.fetch_brand_insights(base), [store])
+    benches["fetch_brand_insights_async"] = (lambda: asyncio.run(service.fetch_brand_insights_async(base)), [store])
+
+    service.competitor_map[base] = [c.base_url for c in competitors]
+    benches["fetch_competitors"] = (lambda: service.fetch_competitors(base), [store] + competitors)
+
+    if api:
+        url = api.rstrip("/") + "/fetch-insights"
+
+        def endpoint(refresh: bool):
+            resp = requests.get(url, params={"website_url": base, "refresh": str(refresh).lower()}, timeout=120)
+            resp.raise_for_status()
+
+        benches["api_fetch_insights_live"] = (lambda: endpoint(True), [store])
+        benches["api_fetch_insights_cached"] = (lambda: endpoint(False), [store])
+    return benches
+
+
+# ---------------- Baselines ----------------
+COMPARED = ["p50_ms", "p95_ms", "requests_per_store", "peak_mem_mb", "parse_cpu_ms"]
+# absolute change below which a metric is treated as noise
+NOISE_FLOOR = {"p50_ms": 5, "p95_ms": 5, "requests_per_store": 0, "peak_mem_mb": 0.1, "parse_cpu_ms": 2}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print deltas against a saved baseline; returns the (benchmark, metric) pairs that regressed."""
+    regressions = []
+    print(f"\nvs baseline from {baseline['meta'].get('created_at', '?')} (regression threshold {threshold:.0f}%)")
+    for name, current in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"  {name:<28} (new)")
+            continue
+        cells = []
+        for metric in COMPARED:
+            old, new = before.get(metric), current[metric]
+            if not old:
+                cells.append(f"{metric} {new}")
+                continue
+            delta = (new - old) / old * 100
+            flag = ""
+            if delta > threshold and new - old > NOISE_FLOOR[metric]:
+                flag = " !"
+                regressions.append((name, metric))
+            cells.append(f"{metric} {delta:+.0f}%{flag}")
+        print(f"  {name:<28} " + "  ".join(cells))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the crawler against local fixture stores.")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="directory of recorded store pages")
+    parser.add_argument("--products", type=int, default=1000, help="products in each synthetic catalog")
+    parser.add_argument("--latency-ms", type=float, default=20, help="delay added to every fixture response")
+    parser.add_argument("--competitors", type=int, default=3, help="competitor stores for fetch_competitors")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--warm", action="store_true", help="keep the learned path map between runs")
+    parser.add_argument("--with-db", action="store_true", help="use the configured DB for path map / validators")
+    parser.add_argument("--api", help="base URL of a running API to benchmark /fetch-insights end to end")
+    parser.add_argument("--save", help="write results to this baseline file")
+    parser.add_argument("--compare", help="baseline file to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="%% increase that counts as a regression")
+    args = parser.parse_args(argv)
+
+    if not args.with_db:
+        _offline_db()
+
+    pages = load_pages(args.fixtures)
+    store = FixtureStore(pages, args.products, args.latency_ms).start()
+    competitors = [FixtureStore(pages, args.products, args.latency_ms).start() for _ in range(args.competitors)]
+
+    benches = build_benchmarks(store, competitors, args.api)
+    if args.only:
+        wanted = set(args.only.split(","))
+        benches = {name: bench for name, bench in benches.items() if name in wanted}
+
+    print(f"{len(pages)} fixture pages, {args.products} products/store, {args.latency_ms} ms latency, "
+          f"{args.repeat} runs ({'warm' if args.warm else 'cold'})")
+    results = {}
+    with ParseTimer() as timer:
+        for name, (fn, stores) in benches.items():
+            results[name] = measure(name, fn, stores, args.repeat, args.warmup, args.warm, timer)
+
+    for s in [store] + competitors:
+        s.stop()
+
+    meta = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "products": args.products,
+        "latency_ms": args.latency_ms,
+        "competitors": args.competitors,
+        "repeat": args.repeat,
+        "warm": args.warm,
+    }
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        changed = [k for k in ("products", "latency_ms", "competitors", "warm") if baseline["meta"].get(k) != meta[k]]
+        if changed:
+            print(f"\nnote: baseline was recorded with different settings: {', '.join(changed)}")
+        regressions = compare(results, baseline, args.threshold)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"\nbaseline saved to {args.save}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
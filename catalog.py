@@ -0,0 +1,127 @@
+import io
+
+# Columnar product catalogs (Arrow). A catalog is a pyarrow.Table with
+# PRODUCT_SCHEMA: strings stored contiguously and prices as float64 (null
+# when unknown), instead of one dict with a "12.00" string per product.
+# The scraper builds one record batch per products.json page and the table
+# travels through the crawl, the insights cache and save_brand_data as the
+# "products" section; codec encodes it as the usual product dicts for JSON.
+# The Parquet/Arrow exports build one from the products table. pyarrow is
+# optional: without it crawls keep product dicts and the exports are
+# unavailable. Code that reads a "products" section goes through fields() /
+# to_dicts(), which accept either form.
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+COLUMNS = ("position", "title", "product_url", "image_url", "price")
+
+PRODUCT_SCHEMA = pa.schema([
+    ("position", pa.int32()),
+    ("title", pa.string()),
+    ("product_url", pa.string()),
+    ("image_url", pa.string()),
+    ("price", pa.float64()),
+]) if pa is not None else None
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def _require():
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed; columnar catalogs are unavailable")
+
+
+# ---------------- Building ----------------
+class Builder:
+    """Accumulates products column by column and emits record batches."""
+
+    def __init__(self):
+        _require()
+        self.position = 0
+        self._cols = {name: [] for name in COLUMNS}
+
+    def add(self, title: str, product_url: str, image_url: str, price, position: int | None = None):
+        """One product; position defaults to the next one in catalog order."""
+        if position is not None:
+            self.position = position
+        cols = self._cols
+        cols["position"].append(self.position)
+        cols["title"].append(title)
+        cols["product_url"].append(product_url)
+        cols["image_url"].append(image_url)
+        cols["price"].append(price)
+        self.position += 1
+
+    def batch(self):
+        """Record batch of everything added since the last call."""
+        batch = pa.record_batch([pa.array(self._cols[name], PRODUCT_SCHEMA.field(name).type) for name in COLUMNS],
+                                schema=PRODUCT_SCHEMA)
+        self._cols = {name: [] for name in COLUMNS}
+        return batch
+
+
+def table(batches: list):
+    _require()
+    return pa.Table.from_batches(batches, schema=PRODUCT_SCHEMA)
+
+
+# ---------------- Converting ----------------
+def is_table(products) -> bool:
+    return pa is not None and isinstance(products, pa.Table)
+
+
+def fields(products):
+    """(title, product_url, image_url, price) per product of a catalog table or a list of product dicts."""
+    if is_table(products):
+        return zip(*(products.column(name).to_pylist() for name in ("title", "product_url", "image_url", "price")))
+    return ((p.get("title"), p.get("product_url"), p.get("image_url"), p.get("price")) for p in products or [])
+
+
+def to_dicts(products) -> list:
+    """Product dicts as the JSON API returns them (price a "12.00" string, "" when unknown)."""
+    if not is_table(products):
+        return products
+    return [
+        {"title": title, "product_url": url, "image_url": image_url, "price": f"{price:.2f}" if price is not None else ""}
+        for title, url, image_url, price in fields(products)
+    ]
+
+
+def to_parquet(catalog) -> bytes:
+    buf = io.BytesIO()
+    pq.write_table(catalog, buf, compression="zstd")
+    return buf.getvalue()
+
+
+def to_arrow_file(catalog) -> bytes:
+    """Arrow IPC file (Feather v2): memory-mappable, so readers can load it without copying."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, catalog.schema) as writer:
+        writer.write_table(catalog)
+    return sink.getvalue().to_pybytes()
+
+
+
+# ---------------- Completeness ----------------
+class _Partial(list):
+    """Products of a catalog walk that stopped early."""
+
+
+def incomplete(products):
+    """`products` (a table or product dicts) marked as a cut-short catalog (a products.json page failed)."""
+    if is_table(products):
+        return products.replace_schema_metadata({"complete": "0"})
+    return _Partial(products)
+
+
+def is_complete(products) -> bool:
+    """False for a cut-short catalog: savers must not read the products it lacks as removed."""
+    if is_table(products):
+        return (products.schema.metadata or {}).get(b"complete") != b"0"
+    return not isinstance(products, _Partial)
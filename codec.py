@@ -0,0 +1,97 @@
+import os
+import json
+import base64
+import threading
+
+import catalog
+
+# JSON encoding for stored blobs and API responses. orjson and zstandard are
+# optional: without them this falls back to the stdlib json module and plain
+# (uncompressed) blobs.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ---------- Settings (overridable from .env) ----------
+CODEC_COMPRESS = os.getenv("CODEC_COMPRESS", "zstd").lower()   # "zstd" or "none"
+CODEC_ZSTD_LEVEL = int(os.getenv("CODEC_ZSTD_LEVEL", "3"))
+CODEC_MIN_SIZE = int(os.getenv("CODEC_MIN_SIZE", "2048"))      # smaller blobs are stored as plain JSON
+
+# Stored blob formats. Blobs live in text columns, so compressed ones are
+# base64 text behind a version tag; anything untagged is plain JSON (which is
+# also how rows written before this module look).
+ZSTD_TAG = "zj1:"
+
+
+# ---------------- JSON ----------------
+def _default(obj):
+    """Types JSON doesn't know: a crawled catalog table is written as its product dicts."""
+    if catalog.is_table(obj):
+        return catalog.to_dicts(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj, sort_keys: bool = False) -> bytes:
+    """Compact UTF-8 JSON."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, sort_keys=sort_keys,
+                      default=_default).encode("utf-8")
+
+
+def dumps_str(obj) -> str:
+    return dumps(obj).decode("utf-8")
+
+
+def loads(data):
+    """Parse JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# ---------------- Stored blobs ----------------
+_local = threading.local()   # zstd contexts are not safe to share between threads
+
+
+def _compressor():
+    if not hasattr(_local, "compressor"):
+        _local.compressor = zstandard.ZstdCompressor(level=CODEC_ZSTD_LEVEL)
+    return _local.compressor
+
+
+def _decompressor():
+    if not hasattr(_local, "decompressor"):
+        _local.decompressor = zstandard.ZstdDecompressor()
+    return _local.decompressor
+
+
+def encode_blob(obj) -> str:
+    """Text for a blob column: zstd-compressed and tagged when large enough, else plain JSON."""
+    raw = dumps(obj)
+    if CODEC_COMPRESS == "zstd" and zstandard is not None and len(raw) >= CODEC_MIN_SIZE:
+        return ZSTD_TAG + base64.b64encode(_compressor().compress(raw)).decode("ascii")
+    return raw.decode("utf-8")
+
+
+def blob_json(text: str) -> bytes:
+    """JSON bytes of a stored blob without parsing it (for responses)."""
+    if text.startswith(ZSTD_TAG):
+        if zstandard is None:
+            raise RuntimeError("stored blob is zstd-compressed; install zstandard to read it")
+        return _decompressor().decompress(base64.b64decode(text[len(ZSTD_TAG):]))
+    return text.encode("utf-8")
+
+
+def decode_blob(text: str):
+    """Value of a stored blob, in any of the formats above."""
+    if text.startswith(ZSTD_TAG):
+        return loads(blob_json(text))
+    return loads(text)
@@ -1,9 +1,23 @@
 import os
-import json
-from sqlalchemy import create_engine, Column, Integer, String, Text
+import re
+import hashlib
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlsplit
+from sqlalchemy import (
+    create_engine, event, select, delete, update, func, text, bindparam, Column, Integer, String, Text, Boolean,
+    DateTime, Numeric, JSON, ForeignKey, Index, UniqueConstraint,
+)
+from sqlalchemy.dialects.mysql import LONGTEXT, insert as mysql_insert, match as mysql_match
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
+import analytics
+import catalog
+import codec
+import metrics
+
 # ---------- Load Environment Variables ----------
 load_dotenv()
 
@@ -13,56 +27,1301 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "shopifydb")
 
-# ---------- Database URL using pymysql ----------
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# "mysql" (default) or "sqlite": a local file, no server needed (dev, load tests, benchmarks)
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "shopify.db")
+
+# ---------- Pool settings ----------
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))        # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))        # below MySQL's wait_timeout
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# ---------- Database URLs (sync via pymysql, async via aiomysql / aiosqlite) ----------
+if DB_BACKEND == "sqlite":
+    DATABASE_URL = f"sqlite:///{DB_SQLITE_PATH}"
+    ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_SQLITE_PATH}"
+else:
+    DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    ASYNC_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+def _engine_options() -> dict:
+    options = {
+        "echo": False,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "json_serializer": codec.dumps_str,
+        "json_deserializer": codec.loads,
+    }
+    if DB_BACKEND == "sqlite":
+        options["connect_args"] = {"check_same_thread": False, "timeout": DB_POOL_TIMEOUT}
+    return options
+
+def _sqlite_pragmas(dbapi_conn, _record):
+    # WAL lets readers run during a write; foreign keys make ON DELETE CASCADE work
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
 
 # ---------- SQLAlchemy Setup ----------
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(DATABASE_URL, **_engine_options())
+if DB_BACKEND == "sqlite":
+    event.listen(engine, "connect", _sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# ---------- Table Model ----------
+# Async engine for the API's read paths; created on first use so the sync
+# tools (jobs.py, ingest.py) don't need the async driver installed.
+_async_engine = None
+_AsyncSession = None
+
+def async_session():
+    """New AsyncSession (use as `async with async_session() as session`)."""
+    global _async_engine, _AsyncSession
+    if _AsyncSession is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options())
+        if DB_BACKEND == "sqlite":
+            event.listen(_async_engine.sync_engine, "connect", _sqlite_pragmas)
+        _AsyncSession = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _AsyncSession()
+
+async def dispose_async_engine():
+    global _async_engine, _AsyncSession
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _AsyncSession = None
+
+# MySQL TEXT stops at 64 KB, too small for a full product catalog
+LongText = Text().with_variant(LONGTEXT(), "mysql")
+
+# ---------- Legacy table (one JSON blob per brand) ----------
 class BrandInsights(Base):
     __tablename__ = "brand_insights"
 
     id = Column(Integer, primary_key=True, index=True)
     brand_name = Column(String(255), nullable=False)
-    data = Column(Text, nullable=False)  # JSON stored as text
+    data = Column(LongText, nullable=False)  # JSON stored as text (see codec)
+
+# ---------- Normalized brand tables ----------
+class Brand(Base):
+    __tablename__ = "brands"
+
+    id = Column(Integer, primary_key=True)
+    domain = Column(String(255), nullable=False, unique=True)
+    brand_name = Column(String(255), nullable=False)
+    about = Column(LongText, nullable=True)
+    contact_details = Column(JSON, nullable=True)
+    social_handles = Column(JSON, nullable=True)
+    hero_products = Column(JSON, nullable=True)
+    data_hash = Column(String(64), nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+class Product(Base):
+    __tablename__ = "products"
+    __table_args__ = (
+        UniqueConstraint("brand_id", "product_url", name="uq_product_url"),
+        Index("ix_products_brand_price", "brand_id", "price"),
+        Index("ix_products_brand_position", "brand_id", "position"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    brand_id = Column(Integer, ForeignKey("brands.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    product_url = Column(String(700), nullable=False)
+    title = Column(String(512), nullable=False)
+    image_url = Column(String(1024), nullable=False)
+    price = Column(Numeric(12, 2), nullable=True)
+    seen_at = Column(DateTime, nullable=False)
+
+class Policy(Base):
+    __tablename__ = "policies"
+    __table_args__ = (UniqueConstraint("brand_id", "kind", name="uq_policy_kind"),)
+
+    id = Column(Integer, primary_key=True)
+    brand_id = Column(Integer, ForeignKey("brands.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(32), nullable=False)
+    text = Column(Text, nullable=False)
+
+class Faq(Base):
+    __tablename__ = "faqs"
+    __table_args__ = (UniqueConstraint("brand_id", "position", name="uq_faq_position"),)
+
+    id = Column(Integer, primary_key=True)
+    brand_id = Column(Integer, ForeignKey("brands.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+
+class Link(Base):
+    __tablename__ = "links"
+    __table_args__ = (UniqueConstraint("brand_id", "position", name="uq_link_position"),)
+
+    id = Column(Integer, primary_key=True)
+    brand_id = Column(Integer, ForeignKey("brands.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    url = Column(String(1024), nullable=False)
+
+# ---------- Catalog history (deltas + periodic checkpoints) ----------
+class CatalogSnapshot(Base):
+    """One row per save that changed a brand's catalog; checkpoints also hold the full catalog."""
+    __tablename__ = "catalog_snapshots"
+    __table_args__ = (Index("ix_catalog_snapshots_brand_time", "brand_id", "taken_at"),)
+
+    id = Column(Integer, primary_key=True)
+    brand_id = Column(Integer, ForeignKey("brands.id", ondelete="CASCADE"), nullable=False)
+    taken_at = Column(DateTime, nullable=False)
+    since_checkpoint = Column(Integer, nullable=False)   # 0 = this row is a checkpoint
+    added = Column(Integer, nullable=False)
+    removed = Column(Integer, nullable=False)
+    price_changed = Column(Integer, nullable=False)
+    catalog = Column(LongText, nullable=True)            # codec blob of the full catalog, checkpoints only
+
+class ProductChange(Base):
+    __tablename__ = "product_changes"
+    __table_args__ = (
+        Index("ix_product_changes_brand_time", "brand_id", "changed_at"),
+        Index("ix_product_changes_brand_url", "brand_id", "product_url", "changed_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    brand_id = Column(Integer, ForeignKey("brands.id", ondelete="CASCADE"), nullable=False)
+    snapshot_id = Column(Integer, ForeignKey("catalog_snapshots.id", ondelete="CASCADE"), nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+    product_url = Column(String(700), nullable=False)
+    change = Column(String(8), nullable=False)           # added | removed | price
+    title = Column(String(512), nullable=False)
+    old_price = Column(Numeric(12, 2), nullable=True)
+    new_price = Column(Numeric(12, 2), nullable=True)
+
+# ---------- Full-text search ----------
+class SearchDoc(Base):
+    """
+    One searchable text per product title, FAQ, about text and policy.
+    Indexed by a FULLTEXT index on MySQL and by the search_fts FTS5 table
+    (kept in sync by triggers, see init_search_index) on SQLite.
+    """
+    __tablename__ = "search_docs"
+    __table_args__ = (
+        UniqueConstraint("brand_id", "section", "ref", name="uq_search_doc"),
+        Index("ft_search_docs", "title", "body", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    brand_id = Column(Integer, ForeignKey("brands.id", ondelete="CASCADE"), nullable=False)
+    section = Column(String(16), nullable=False)     # products | faqs | about | policies
+    ref = Column(String(700), nullable=False)        # product URL, FAQ position, policy kind
+    url = Column(String(1024), nullable=False)
+    title = Column(String(512), nullable=False)
+    body = Column(LongText, nullable=False)
+    digest = Column(String(40), nullable=False)      # skip rewriting unchanged docs
+
+# ---------- Cross-brand analytics ----------
+class BrandStats(Base):
+    """Price / catalog statistics of a brand (see analytics.py), recomputed whenever it is saved."""
+    __tablename__ = "brand_stats"
+
+    id = Column(Integer, primary_key=True)
+    brand_id = Column(Integer, ForeignKey("brands.id", ondelete="CASCADE"), nullable=False, unique=True)
+    computed_at = Column(DateTime, nullable=False)
+    stats = Column(JSON, nullable=False)             # size, percentiles, band edges and counts
+    title_keys = Column(LongText, nullable=False)    # analytics.pack_keys of normalized title hashes
+
+# ---------- Learned probe paths per store ----------
+class StorePath(Base):
+    __tablename__ = "store_paths"
+    __table_args__ = (UniqueConstraint("domain", "path", name="uq_store_path"),)
+
+    id = Column(Integer, primary_key=True)
+    domain = Column(String(255), nullable=False, index=True)
+    path = Column(String(512), nullable=False)
+    section = Column(String(32), nullable=True)   # sitemap hits and pages a section was extracted from
+    ok = Column(Boolean, nullable=False)           # True = 200, False = 404/410
+    checked_at = Column(DateTime, nullable=False)
+
+# ---------- Competitor fingerprinting ----------
+class StoreVerdict(Base):
+    """Whether a domain is a Shopify store (see fingerprint.py)."""
+    __tablename__ = "store_verdicts"
+
+    id = Column(Integer, primary_key=True)
+    domain = Column(String(255), nullable=False, unique=True)
+    verdict = Column(String(16), nullable=False)   # shopify | other | unreachable
+    checked_at = Column(DateTime, nullable=False)
+
+# ---------- Conditional refresh state ----------
+class PageValidator(Base):
+    __tablename__ = "page_validators"
+    __table_args__ = (UniqueConstraint("domain", "path", name="uq_page_validator"),)
+
+    id = Column(Integer, primary_key=True)
+    domain = Column(String(255), nullable=False, index=True)
+    path = Column(String(512), nullable=False)     # path + query
+    status = Column(Integer, nullable=False)
+    etag = Column(String(255), nullable=True)
+    last_modified = Column(String(64), nullable=True)
+    body_hash = Column(String(64), nullable=False)
+    fetched_at = Column(DateTime, nullable=False)
+
+class SectionResult(Base):
+    __tablename__ = "section_results"
+    __table_args__ = (UniqueConstraint("domain", "section", name="uq_section_result"),)
+
+    id = Column(Integer, primary_key=True)
+    domain = Column(String(255), nullable=False, index=True)
+    section = Column(String(32), nullable=False)
+    sources = Column(Text, nullable=False)         # JSON list of URLs the result was built from
+    result = Column(LongText, nullable=False)      # codec blob
+    updated_at = Column(DateTime, nullable=False)
+
+# ---------- Background crawl jobs ----------
+class CrawlJob(Base):
+    __tablename__ = "crawl_jobs"
+    __table_args__ = (Index("ix_crawl_jobs_status_id", "status", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(32), nullable=False)          # "insights" | "competitors"
+    website_url = Column(String(255), nullable=False)
+    status = Column(String(16), nullable=False)        # queued | running | done | failed
+    progress = Column(JSON, nullable=True)             # {site: {"status", "error"?}}
+    result = Column(LongText, nullable=True)           # codec blob, once done
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+# ---------- Bulk ingestion runs ----------
+class IngestRun(Base):
+    __tablename__ = "ingest_runs"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=True)
+    status = Column(String(16), nullable=False)        # pending | running | done | interrupted
+    total = Column(Integer, nullable=False)
+    done = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    resumed_from = Column(Integer, nullable=False, default=0)   # done + failed when the current session started
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)       # start of the current session
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+class IngestItem(Base):
+    """Checkpoint: one row per store of a run; only `pending` rows are crawled on resume."""
+    __tablename__ = "ingest_items"
+    __table_args__ = (
+        UniqueConstraint("run_id", "domain", name="uq_ingest_item"),
+        Index("ix_ingest_items_run_status", "run_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey("ingest_runs.id", ondelete="CASCADE"), nullable=False)
+    domain = Column(String(255), nullable=False)
+    website_url = Column(String(255), nullable=False)
+    status = Column(String(16), nullable=False)        # pending | done | failed
+    error = Column(Text, nullable=True)
+    elapsed_ms = Column(Integer, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
 
 # ---------- Initialize DB ----------
 def init_db():
     Base.metadata.create_all(bind=engine)
+    init_search_index()
+    migrate_legacy_insights()
+    backfill_search_index()
+    backfill_brand_stats()
 
-# ---------- Save or Update Brand Data ----------
-def save_brand_data(brand_name: str, data: dict):
+def migrate_legacy_insights():
+    """Copy rows of the old brand_insights blob table into the normalized tables (once)."""
     session = SessionLocal()
     try:
-        existing = session.query(BrandInsights).filter_by(brand_name=brand_name).first()
-        if existing:
-            existing.data = json.dumps(data)
-        else:
-            new_brand = BrandInsights(brand_name=brand_name, data=json.dumps(data))
-            session.add(new_brand)
-        session.commit()
+        if session.query(Brand.id).first() is not None:
+            return
+        legacy = session.query(BrandInsights).all()
+    finally:
+        session.close()
+    for row in legacy:
+        save_brand_data(row.brand_name, codec.decode_blob(row.data))
+
+def init_search_index():
+    """SQLite: FTS5 index over search_docs (external content), maintained by triggers."""
+    if DB_BACKEND != "sqlite":
+        return
+    with engine.begin() as conn:
+        for ddl in _SQLITE_FTS_DDL:
+            conn.exec_driver_sql(ddl)
+
+_SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    "title, body, content='search_docs', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS search_docs_ai AFTER INSERT ON search_docs BEGIN "
+    "INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_docs_ad AFTER DELETE ON search_docs BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_docs_au AFTER UPDATE ON search_docs BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+]
+
+def backfill_search_index():
+    """Index brands saved before search existed (once, while search_docs is empty)."""
+    session = SessionLocal()
+    try:
+        if session.query(SearchDoc.id).first() is not None:
+            return
+        brand_ids = [r.id for r in session.query(Brand.id).order_by(Brand.id)]
     finally:
         session.close()
+    for brand_id in brand_ids:
+        session = SessionLocal()
+        try:
+            brand = session.get(Brand, brand_id)
+            data = _brand_data(session, brand)
+            brand_name = brand.brand_name
+        finally:
+            session.close()
+        with engine.begin() as conn:
+            _index_brand(conn, brand_id, brand_name, data)
+    if brand_ids:
+        print(f"[search] indexed {len(brand_ids)} stored brands")
+
+def backfill_brand_stats():
+    """Compute stats for brands that have none, or were computed with other price bands."""
+    session = SessionLocal()
+    try:
+        current = {r.brand_id: r.stats.get("band_edges") for r in session.query(BrandStats.brand_id, BrandStats.stats)}
+        brand_ids = [r.id for r in session.query(Brand.id).order_by(Brand.id)
+                     if current.get(r.id) != analytics.ANALYTICS_PRICE_BANDS]
+    finally:
+        session.close()
+    for brand_id in brand_ids:
+        with engine.begin() as conn:
+            products = [
+                {"title": r.title, "price": r.price}
+                for r in conn.execute(select(Product.title, Product.price).where(Product.brand_id == brand_id))
+            ]
+            _refresh_brand_stats(conn, brand_id, products, datetime.utcnow().replace(microsecond=0))
+    if brand_ids:
+        print(f"[analytics] computed stats for {len(brand_ids)} stored brands")
+
+# ---------- Bulk upsert ----------
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "1000"))
+
+def _conflict_cols(model) -> list:
+    """Columns of the model's unique key (what ON CONFLICT needs on SQLite)."""
+    for constraint in model.__table__.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            return [c.name for c in constraint.columns]
+    return [c.name for c in model.__table__.columns if c.unique]
+
+def _upsert(conn, model, rows: list, update_cols: list, keep_if_null: tuple = ()):
+    """
+    One INSERT ... ON DUPLICATE KEY UPDATE statement (executemany) per batch
+    of rows (INSERT ... ON CONFLICT DO UPDATE on SQLite). Columns in
+    `keep_if_null` keep their stored value when the new one is NULL.
+    """
+    for i in range(0, len(rows), DB_BATCH_SIZE):
+        if conn.dialect.name == "sqlite":
+            stmt = sqlite_insert(model)
+            new_values = stmt.excluded
+        else:
+            stmt = mysql_insert(model)
+            new_values = stmt.inserted
+        updates = {}
+        for c in update_cols:
+            updates[c] = func.coalesce(new_values[c], model.__table__.c[c]) if c in keep_if_null else new_values[c]
+        if conn.dialect.name == "sqlite":
+            stmt = stmt.on_conflict_do_update(index_elements=_conflict_cols(model), set_=updates)
+        else:
+            stmt = stmt.on_duplicate_key_update(updates)
+        conn.execute(stmt, rows[i:i + DB_BATCH_SIZE])
+
+def brand_domain(brand_name: str) -> str:
+    """Unique key of a brand: host name without scheme, www. or trailing path."""
+    url = brand_name if brand_name.startswith(("http://", "https://")) else "http://" + brand_name
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+def _price(value):
+    try:
+        # str(): a columnar catalog's float price 12.99 must not become Decimal("12.9900000000000002...")
+        return Decimal(str(value)) if value not in (None, "") else None
+    except InvalidOperation:
+        return None
+
+# ---------- Catalog history ----------
+# a full copy of the catalog is kept every N snapshots (and on a brand's first one)
+SNAPSHOT_CHECKPOINT_EVERY = int(os.getenv("SNAPSHOT_CHECKPOINT_EVERY", "30"))
+CHANGE_KINDS = ("added", "removed", "price")
+
+def _price_str(price) -> str:
+    return f"{price:.2f}" if price is not None else ""
+
+def _cents(price):
+    return price.quantize(Decimal("0.01")) if price is not None and price.is_finite() else None
+
+def _record_catalog_changes(conn, brand_id: int, products: list, now: datetime):
+    """
+    Diff the new catalog against the stored one (by product_url) and write
+    only the added, removed and re-priced products, plus a snapshot row.
+    Must run before the products table is updated.
+    """
+    previous = {
+        r.product_url: r for r in conn.execute(
+            select(Product.product_url, Product.title, Product.price).where(Product.brand_id == brand_id)
+        )
+    }
+    last = conn.execute(
+        select(CatalogSnapshot.since_checkpoint).where(CatalogSnapshot.brand_id == brand_id)
+        .order_by(CatalogSnapshot.id.desc()).limit(1)
+    ).first()
+
+    changes = []
+    for p in products:
+        old = previous.get(p["product_url"])
+        if old is None:
+            changes.append({"product_url": p["product_url"], "change": "added", "title": p["title"],
+                            "old_price": None, "new_price": p["price"]})
+        elif _cents(old.price) != _cents(p["price"]):
+            changes.append({"product_url": p["product_url"], "change": "price", "title": p["title"],
+                            "old_price": old.price, "new_price": p["price"]})
+    seen = {p["product_url"] for p in products}
+    for url, old in previous.items():
+        if url not in seen:
+            changes.append({"product_url": url, "change": "removed", "title": old.title,
+                            "old_price": old.price, "new_price": None})
+
+    first = last is None and not previous
+    if first:
+        changes = []   # a brand's first catalog is the baseline checkpoint, not a list of additions
+    elif not changes:
+        return
+    checkpoint = first or last is None or last.since_checkpoint + 1 >= SNAPSHOT_CHECKPOINT_EVERY
+    counts = {kind: sum(1 for c in changes if c["change"] == kind) for kind in CHANGE_KINDS}
+    snapshot_id = conn.execute(CatalogSnapshot.__table__.insert().values(
+        brand_id=brand_id,
+        taken_at=now,
+        since_checkpoint=0 if checkpoint else last.since_checkpoint + 1,
+        added=counts["added"],
+        removed=counts["removed"],
+        price_changed=counts["price"],
+        catalog=codec.encode_blob([
+            {"product_url": p["product_url"], "title": p["title"], "price": _price_str(p["price"])} for p in products
+        ]) if checkpoint else None,
+    )).inserted_primary_key[0]
+    for i in range(0, len(changes), DB_BATCH_SIZE):
+        conn.execute(ProductChange.__table__.insert(), [
+            {"brand_id": brand_id, "snapshot_id": snapshot_id, "changed_at": now, **c}
+            for c in changes[i:i + DB_BATCH_SIZE]
+        ])
+
+# ---------- Brand stats maintenance ----------
+def _refresh_brand_stats(conn, brand_id: int, products: list, now: datetime):
+    """Recompute one brand's BrandStats row from the catalog being saved (other brands are untouched)."""
+    prices = [float(p["price"]) if p["price"] is not None else float("nan") for p in products]
+    _upsert(conn, BrandStats, [{
+        "brand_id": brand_id,
+        "computed_at": now,
+        "stats": analytics.price_stats(prices),
+        "title_keys": analytics.pack_keys(analytics.title_keys(p["title"] for p in products)),
+    }], ["computed_at", "stats", "title_keys"])
+
+# ---------- Search index maintenance ----------
+SEARCH_SECTIONS = ("products", "faqs", "about", "policies")
+
+def _store_home(brand_name: str) -> str:
+    """Root URL of a store with the scheme it was crawled with (the scraper's default is http)."""
+    url = brand_name if brand_name.startswith(("http://", "https://")) else "http://" + brand_name
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc.lower()}/"
+
+def _section_pages(conn, domain: str) -> dict:
+    """{section: path} of the pages the about, FAQ and policy text was last extracted from (path_map.mark)."""
+    rows = conn.execute(
+        select(StorePath.section, StorePath.path)
+        .where(StorePath.domain == domain, StorePath.ok.is_(True), StorePath.section.isnot(None))
+        .order_by(StorePath.checked_at)
+    )
+    return {r.section: r.path for r in rows}
+
+def _search_docs(home: str, pages: dict, data: dict) -> list:
+    """Docs of a brand; FAQ / about / policy docs link to their source page (the home page if unknown)."""
+    def page(section):
+        return home + pages[section] if section in pages else home
+
+    docs, seen = [], set()
+    for title, url, _, _ in catalog.fields(data.get("products")):
+        url = (url or "")[:700]
+        if url and url not in seen:
+            seen.add(url)
+            docs.append({"section": "products", "ref": url, "url": url, "title": title or "", "body": ""})
+    for i, f in enumerate(data.get("faqs") or []):
+        docs.append({"section": "faqs", "ref": str(i), "url": page("faq"),
+                     "title": f.get("question") or "", "body": f.get("answer") or ""})
+    if data.get("about"):
+        docs.append({"section": "about", "ref": "about", "url": page("about"), "title": "", "body": data["about"]})
+    for kind, body in (data.get("policies") or {}).items():
+        if body:
+            docs.append({"section": "policies", "ref": kind, "url": page(kind), "title": kind, "body": body})
+    for d in docs:
+        d["title"] = d["title"][:512]
+        d["digest"] = hashlib.sha1(f"{d['url']}\0{d['title']}\0{d['body']}".encode("utf-8")).hexdigest()
+    return docs
+
+def _index_brand(conn, brand_id: int, brand_name: str, data: dict):
+    """Bring a brand's search docs in line with `data`, touching only docs that changed."""
+    domain = brand_domain(brand_name)
+    existing = {
+        (r.section, r.ref): r for r in conn.execute(
+            select(SearchDoc.id, SearchDoc.section, SearchDoc.ref, SearchDoc.digest).where(SearchDoc.brand_id == brand_id)
+        )
+    }
+    inserts, updates, keep = [], [], set()
+    for d in _search_docs(_store_home(brand_name), _section_pages(conn, domain), data):
+        key = (d["section"], d["ref"])
+        keep.add(key)
+        old = existing.get(key)
+        if old is None:
+            inserts.append({"brand_id": brand_id, **d})
+        elif old.digest != d["digest"]:
+            updates.append({"doc_id": old.id, "url": d["url"], "title": d["title"], "body": d["body"], "digest": d["digest"]})
+    stale = [r.id for key, r in existing.items() if key not in keep]
+    for i in range(0, len(stale), DB_BATCH_SIZE):
+        conn.execute(delete(SearchDoc).where(SearchDoc.id.in_(stale[i:i + DB_BATCH_SIZE])))
+    for i in range(0, len(inserts), DB_BATCH_SIZE):
+        conn.execute(SearchDoc.__table__.insert(), inserts[i:i + DB_BATCH_SIZE])
+    if updates:
+        stmt = SearchDoc.__table__.update().where(SearchDoc.id == bindparam("doc_id")).values(
+            url=bindparam("url"), title=bindparam("title"), body=bindparam("body"), digest=bindparam("digest"),
+        )
+        for i in range(0, len(updates), DB_BATCH_SIZE):
+            conn.execute(stmt, updates[i:i + DB_BATCH_SIZE])
+
+def _digest(data: dict) -> str:
+    return hashlib.sha256(codec.dumps(data, sort_keys=True)).hexdigest()
+
+# ---------- Save or Update Brand Data ----------
+@metrics.timed(metrics.DB_SECONDS, op="save_brand_data")
+def save_brand_data(brand_name: str, data: dict):
+    """
+    Upsert a brand and its products, policies, FAQs and links in one
+    transaction. Returns False when the stored copy was already identical.
+    """
+    # DATETIME keeps whole seconds; seen_at must compare equal after the round trip
+    now = datetime.utcnow().replace(microsecond=0)
+    with engine.begin() as conn:
+        return _save_brand(conn, brand_name, data, now)
+
+def _with_stored_products(conn, brand_id: int, domain: str, data: dict) -> dict:
+    """
+    `data` with the stored products filled in when this crawl's catalog is
+    empty or cut short (see catalog.is_complete): a failed crawl must not read
+    as products removed, in the change history, the products table or search.
+    """
+    products = data.get("products") or []
+    complete = catalog.is_complete(products)
+    if products and complete:
+        return data
+    seen = {url for _, url, _, _ in catalog.fields(products)}
+    stored = [
+        {"title": r.title, "product_url": r.product_url, "image_url": r.image_url, "price": _price_str(r.price)}
+        for r in conn.execute(
+            select(Product.title, Product.product_url, Product.image_url, Product.price)
+            .where(Product.brand_id == brand_id).order_by(Product.position)
+        )
+        if r.product_url not in seen
+    ]
+    if not stored:
+        return data
+    print(f"[catalog] {domain} -> {'incomplete' if products else 'empty'} catalog, kept {len(stored)} stored products")
+    return {**data, "products": list(catalog.to_dicts(products)) + stored}
+
+def _save_brand(conn, brand_name: str, data: dict, now: datetime) -> bool:
+    domain = brand_domain(brand_name)
+    current = conn.execute(select(Brand.id, Brand.data_hash).where(Brand.domain == domain)).first()
+    if current is not None:
+        data = _with_stored_products(conn, current.id, domain, data)
+    data_hash = _digest(data)
+    if current is not None and current.data_hash == data_hash:
+        # still counts as a fresh copy for the insights cache
+        conn.execute(update(Brand).where(Brand.id == current.id).values(updated_at=now))
+        return False
+
+    _upsert(conn, Brand, [{
+        "domain": domain,
+        "brand_name": brand_name,
+        "about": data.get("about"),
+        "contact_details": data.get("contact_details"),
+        "social_handles": data.get("social_handles"),
+        "hero_products": data.get("hero_products"),
+        "data_hash": data_hash,
+        "updated_at": now,
+    }], ["brand_name", "about", "contact_details", "social_handles", "hero_products", "data_hash", "updated_at"])
+    brand_id = current.id if current is not None else conn.execute(
+        select(Brand.id).where(Brand.domain == domain)
+    ).scalar_one()
+
+    # products (dicts or a columnar catalog): upsert by URL, then drop the ones not seen in this crawl
+    products, seen = [], set()
+    for title, url, image_url, price in catalog.fields(data.get("products")):
+        url = (url or "")[:700]
+        if not url or url in seen:
+            continue
+        seen.add(url)
+        products.append({
+            "brand_id": brand_id,
+            "position": len(products),
+            "product_url": url,
+            "title": (title or "")[:512],
+            "image_url": (image_url or "")[:1024],
+            "price": _price(price),
+            "seen_at": now,
+        })
+    _record_catalog_changes(conn, brand_id, products, now)
+    # by URL, not seen_at: two saves within the same second share a timestamp
+    gone = [
+        r.id for r in conn.execute(select(Product.id, Product.product_url).where(Product.brand_id == brand_id))
+        if r.product_url not in seen
+    ]
+    _upsert(conn, Product, products, ["position", "title", "image_url", "price", "seen_at"])
+    for i in range(0, len(gone), DB_BATCH_SIZE):
+        conn.execute(delete(Product).where(Product.id.in_(gone[i:i + DB_BATCH_SIZE])))
+    _refresh_brand_stats(conn, brand_id, products, now)
+
+    policies = [
+        {"brand_id": brand_id, "kind": kind, "text": text or ""}
+        for kind, text in (data.get("policies") or {}).items()
+    ]
+    _upsert(conn, Policy, policies, ["text"])
+    conn.execute(delete(Policy).where(
+        Policy.brand_id == brand_id, Policy.kind.notin_([p["kind"] for p in policies] or [""])
+    ))
+
+    faqs = [
+        {"brand_id": brand_id, "position": i, "question": f.get("question") or "", "answer": f.get("answer") or ""}
+        for i, f in enumerate(data.get("faqs") or [])
+    ]
+    _upsert(conn, Faq, faqs, ["question", "answer"])
+    conn.execute(delete(Faq).where(Faq.brand_id == brand_id, Faq.position >= len(faqs)))
+
+    links = [
+        {"brand_id": brand_id, "position": i, "url": (u or "")[:1024]}
+        for i, u in enumerate(data.get("important_links") or [])
+    ]
+    _upsert(conn, Link, links, ["url"])
+    conn.execute(delete(Link).where(Link.brand_id == brand_id, Link.position >= len(links)))
+
+    _index_brand(conn, brand_id, brand_name, data)
+    return True
 
 # ---------- Fetch All Brands ----------
+@metrics.timed(metrics.DB_SECONDS, op="get_all_brands")
 def get_all_brands():
     session = SessionLocal()
     try:
-        rows = session.query(BrandInsights.id, BrandInsights.brand_name).all()
+        rows = session.query(Brand.id, Brand.brand_name).order_by(Brand.id).all()
         return [{"id": r.id, "brand_name": r.brand_name} for r in rows]
     finally:
         session.close()
 
 # ---------- Fetch Brand by ID ----------
+def _product_dict(p) -> dict:
+    return {
+        "title": p.title,
+        "product_url": p.product_url,
+        "image_url": p.image_url,
+        "price": _price_str(p.price),
+    }
+
+# Fields of a brand's insights, in response order; the last four come from child tables
+BRAND_FIELDS = ("brand_name", "about", "policies", "contact_details", "social_handles", "faqs", "products",
+                "hero_products", "important_links")
+
+def _child_query(field: str, brand_id: int):
+    if field == "products":
+        return select(Product).where(Product.brand_id == brand_id).order_by(Product.position)
+    if field == "policies":
+        return select(Policy).where(Policy.brand_id == brand_id).order_by(Policy.id)
+    if field == "faqs":
+        return select(Faq).where(Faq.brand_id == brand_id).order_by(Faq.position)
+    if field == "important_links":
+        return select(Link).where(Link.brand_id == brand_id).order_by(Link.position)
+    return None
+
+def _brand_dict(brand, fields, children: dict) -> dict:
+    data = {}
+    for field in fields:
+        rows = children.get(field)
+        if field == "policies":
+            data[field] = {p.kind: p.text for p in rows}
+        elif field == "faqs":
+            data[field] = [{"question": f.question, "answer": f.answer} for f in rows]
+        elif field == "products":
+            data[field] = [_product_dict(p) for p in rows]
+        elif field == "important_links":
+            data[field] = [l.url for l in rows]
+        elif field in ("contact_details", "social_handles"):
+            data[field] = getattr(brand, field) or {}
+        elif field == "hero_products":
+            data[field] = brand.hero_products or []
+        else:
+            data[field] = getattr(brand, field)
+    return data
+
+def _brand_data(session, brand, fields=BRAND_FIELDS) -> dict:
+    children = {}
+    for field in fields:
+        query = _child_query(field, brand.id)
+        if query is not None:
+            children[field] = session.scalars(query).all()
+    return _brand_dict(brand, fields, children)
+
+async def _brand_data_async(session, brand, fields=BRAND_FIELDS) -> dict:
+    """Only the child tables behind the requested fields are queried."""
+    children = {}
+    for field in fields:
+        query = _child_query(field, brand.id)
+        if query is not None:
+            children[field] = (await session.scalars(query)).all()
+    return _brand_dict(brand, fields, children)
+
+@metrics.timed(metrics.DB_SECONDS, op="get_brand_by_id")
 def get_brand_by_id(brand_id: int):
     session = SessionLocal()
     try:
-        row = session.query(BrandInsights).filter_by(id=brand_id).first()
-        if row:
-            return json.loads(row.data)
-        return None
+        brand = session.get(Brand, brand_id)
+        if brand is None:
+            return None
+        return _brand_data(session, brand)
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="get_brand_snapshot")
+def get_brand_snapshot(domain: str):
+    """Stored copy of a brand as {"data", "updated_at"} (time of the last crawl), or None."""
+    session = SessionLocal()
+    try:
+        brand = session.query(Brand).filter_by(domain=domain).first()
+        if brand is None:
+            return None
+        return {"data": _brand_data(session, brand), "updated_at": brand.updated_at}
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="get_catalog_at")
+def get_catalog_at(brand_id: int, when: datetime):
+    """
+    A brand's catalog as it was at `when`: the last checkpoint before then
+    with the later changes applied. None if history doesn't go back that far.
+    """
+    session = SessionLocal()
+    try:
+        checkpoint = session.query(CatalogSnapshot).filter(
+            CatalogSnapshot.brand_id == brand_id,
+            CatalogSnapshot.since_checkpoint == 0,
+            CatalogSnapshot.taken_at <= when,
+        ).order_by(CatalogSnapshot.id.desc()).first()
+        if checkpoint is None:
+            return None
+        catalog = {p["product_url"]: p for p in codec.decode_blob(checkpoint.catalog)}
+        changes = session.query(ProductChange).filter(
+            ProductChange.brand_id == brand_id,
+            ProductChange.snapshot_id > checkpoint.id,
+            ProductChange.changed_at <= when,
+        ).order_by(ProductChange.id)
+        for c in changes:
+            if c.change == "removed":
+                catalog.pop(c.product_url, None)
+            else:
+                catalog[c.product_url] = {"product_url": c.product_url, "title": c.title, "price": _price_str(c.new_price)}
+        return list(catalog.values())
     finally:
         session.close()
+
+# ---------- Async reads (API) ----------
+@metrics.timed(metrics.DB_SECONDS, op="get_all_brands_async")
+async def get_all_brands_async(limit: int = 100, after: int = 0) -> dict:
+    """
+    One page of {"id", "brand_name"} ordered by id, starting after id `after`
+    (keyset pagination: each page is an index range scan, however deep).
+    Returns {"items", "next_cursor"}; next_cursor is None on the last page.
+    """
+    async with async_session() as session:
+        rows = (await session.execute(
+            select(Brand.id, Brand.brand_name).where(Brand.id > after).order_by(Brand.id).limit(limit + 1)
+        )).all()
+    items = [{"id": r.id, "brand_name": r.brand_name} for r in rows[:limit]]
+    return {"items": items, "next_cursor": items[-1]["id"] if len(rows) > limit else None}
+
+@metrics.timed(metrics.DB_SECONDS, op="get_brand_by_id_async")
+async def get_brand_by_id_async(brand_id: int, fields=BRAND_FIELDS):
+    async with async_session() as session:
+        brand = await session.get(Brand, brand_id)
+        if brand is None:
+            return None
+        return await _brand_data_async(session, brand, fields)
+
+@metrics.timed(metrics.DB_SECONDS, op="get_brand_products_async")
+async def get_brand_products_async(brand_id: int, limit: int = 100, after: int = -1):
+    """
+    One page of a brand's products in catalog order, after position `after`.
+    Returns {"items", "next_cursor"}, or None if the brand doesn't exist.
+    """
+    async with async_session() as session:
+        if (await session.scalar(select(Brand.id).where(Brand.id == brand_id))) is None:
+            return None
+        rows = (await session.scalars(
+            select(Product).where(Product.brand_id == brand_id, Product.position > after)
+            .order_by(Product.position).limit(limit + 1)
+        )).all()
+    items = [_product_dict(p) for p in rows[:limit]]
+    return {"items": items, "next_cursor": rows[limit - 1].position if len(rows) > limit else None}
+
+@metrics.timed(metrics.DB_SECONDS, op="get_brand_catalog_async")
+async def get_brand_catalog_async(brand_id: int):
+    """
+    A brand's whole catalog as an Arrow table (catalog.PRODUCT_SCHEMA), read
+    DB_BATCH_SIZE rows at a time straight into columns. None if the brand
+    doesn't exist.
+    """
+    builder = catalog.Builder()
+    batches = []
+    async with async_session() as session:
+        if (await session.scalar(select(Brand.id).where(Brand.id == brand_id))) is None:
+            return None
+        result = await session.stream(
+            select(Product.position, Product.title, Product.product_url, Product.image_url, Product.price)
+            .where(Product.brand_id == brand_id).order_by(Product.position)
+        )
+        async for rows in result.partitions(DB_BATCH_SIZE):
+            for r in rows:
+                builder.add(r.title, r.product_url, r.image_url, float(r.price) if r.price is not None else None,
+                            position=r.position)
+            batches.append(builder.batch())
+    return catalog.table(batches)
+
+def _change_dict(c) -> dict:
+    return {
+        "changed_at": c.changed_at.isoformat(),
+        "product_url": c.product_url,
+        "title": c.title,
+        "change": c.change,
+        "old_price": _price_str(c.old_price),
+        "new_price": _price_str(c.new_price),
+    }
+
+@metrics.timed(metrics.DB_SECONDS, op="get_product_changes_async")
+async def get_product_changes_async(brand_id: int, since: datetime, until: datetime | None = None,
+                                    kinds=CHANGE_KINDS, limit: int = 1000):
+    """
+    Catalog changes of a brand between `since` and `until`, newest first,
+    read straight from the (brand_id, changed_at) index. None if the brand
+    doesn't exist.
+    """
+    async with async_session() as session:
+        if (await session.scalar(select(Brand.id).where(Brand.id == brand_id))) is None:
+            return None
+        query = select(ProductChange).where(ProductChange.brand_id == brand_id, ProductChange.changed_at >= since)
+        if until is not None:
+            query = query.where(ProductChange.changed_at < until)
+        if set(kinds) != set(CHANGE_KINDS):
+            query = query.where(ProductChange.change.in_(kinds))
+        rows = (await session.scalars(query.order_by(ProductChange.changed_at.desc(), ProductChange.id).limit(limit))).all()
+        return [_change_dict(c) for c in rows]
+
+@metrics.timed(metrics.DB_SECONDS, op="get_brand_stats_async")
+async def get_brand_stats_async(brand_ids=None, limit: int = 50) -> list:
+    """
+    Precomputed stats rows ({"brand_id", "brand_name", "stats", "keys"}) of
+    the given brands, or of the first `limit` brands by id; brands without a
+    row yet are left out.
+    """
+    query = select(Brand.id, Brand.brand_name, BrandStats.stats, BrandStats.title_keys).join(
+        BrandStats, BrandStats.brand_id == Brand.id
+    )
+    if brand_ids is not None:
+        query = query.where(Brand.id.in_(brand_ids))
+    async with async_session() as session:
+        rows = (await session.execute(query.order_by(Brand.id).limit(limit))).all()
+    return [
+        {"brand_id": r.id, "brand_name": r.brand_name, "stats": r.stats, "keys": analytics.unpack_keys(r.title_keys)}
+        for r in rows
+    ]
+
+def _fts_query(q: str) -> str:
+    """User text -> FTS5 query: "quoted phrases" stay phrases, other words are ANDed."""
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|([\w\-\']+)', q):
+        words = re.findall(r"\w+", phrase or word)
+        if words:
+            terms.append('"' + " ".join(words) + '"')
+    return " ".join(terms)
+
+@metrics.timed(metrics.DB_SECONDS, op="search_async")
+async def search_async(q: str, sections=SEARCH_SECTIONS, limit: int = 20) -> list:
+    """Ranked matches for `q` across every stored brand: brand, section, title, URL and a snippet."""
+    section_filter = set(sections) != set(SEARCH_SECTIONS)
+    async with async_session() as session:
+        if DB_BACKEND == "sqlite":
+            query = _fts_query(q)
+            if not query:
+                return []
+            sql = (
+                "SELECT d.brand_id, b.brand_name, d.section, d.title, d.url, "
+                "snippet(search_fts, -1, '[', ']', '...', 16) AS snippet, -bm25(search_fts, 2.0, 1.0) AS score "
+                "FROM search_fts JOIN search_docs d ON d.id = search_fts.rowid JOIN brands b ON b.id = d.brand_id "
+                "WHERE search_fts MATCH :q" + (" AND d.section IN :sections" if section_filter else "") +
+                " ORDER BY bm25(search_fts, 2.0, 1.0) LIMIT :limit"
+            )
+            stmt = text(sql)
+            params = {"q": query, "limit": limit}
+            if section_filter:
+                stmt = stmt.bindparams(bindparam("sections", expanding=True))
+                params["sections"] = list(sections)
+            rows = (await session.execute(stmt, params)).all()
+        else:
+            score = mysql_match(SearchDoc.title, SearchDoc.body, against=q).in_natural_language_mode().label("score")
+            stmt = select(
+                SearchDoc.brand_id, Brand.brand_name, SearchDoc.section, SearchDoc.title, SearchDoc.url,
+                func.left(SearchDoc.body, 200).label("snippet"), score,
+            ).join(Brand, Brand.id == SearchDoc.brand_id).where(score > 0)
+            if section_filter:
+                stmt = stmt.where(SearchDoc.section.in_(sections))
+            rows = (await session.execute(stmt.order_by(score.desc()).limit(limit))).all()
+    return [
+        {
+            "brand_id": r.brand_id,
+            "brand_name": r.brand_name,
+            "section": r.section,
+            "title": r.title,
+            "url": r.url,
+            "snippet": r.snippet,
+            "score": round(float(r.score), 4),
+        }
+        for r in rows
+    ]
+
+@metrics.timed(metrics.DB_SECONDS, op="get_brand_snapshot_async")
+async def get_brand_snapshot_async(domain: str):
+    async with async_session() as session:
+        brand = (await session.scalars(select(Brand).where(Brand.domain == domain))).first()
+        if brand is None:
+            return None
+        return {"data": await _brand_data_async(session, brand), "updated_at": brand.updated_at}
+
+# ---------- Store path map ----------
+@metrics.timed(metrics.DB_SECONDS, op="get_store_paths")
+def get_store_paths(domain: str):
+    session = SessionLocal()
+    try:
+        rows = session.query(StorePath).filter_by(domain=domain).all()
+        return [
+            {"path": r.path, "section": r.section, "ok": r.ok, "checked_at": r.checked_at}
+            for r in rows
+        ]
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="save_store_paths")
+def save_store_paths(domain: str, entries: list):
+    """Upsert (domain, path) rows; `entries` are dicts like get_store_paths returns."""
+    if not entries:
+        return
+    rows = [{"domain": domain, **e} for e in entries]
+    with engine.begin() as conn:
+        _upsert(conn, StorePath, rows, ["section", "ok", "checked_at"], keep_if_null=("section",))
+
+# ---------- Store verdicts ----------
+@metrics.timed(metrics.DB_SECONDS, op="get_store_verdicts")
+def get_store_verdicts(domains: list) -> dict:
+    """{domain: {"verdict", "checked_at"}} for the domains that were probed before."""
+    if not domains:
+        return {}
+    session = SessionLocal()
+    try:
+        rows = session.query(StoreVerdict).filter(StoreVerdict.domain.in_(domains)).all()
+        return {r.domain: {"verdict": r.verdict, "checked_at": r.checked_at} for r in rows}
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="save_store_verdicts")
+def save_store_verdicts(verdicts: dict):
+    """Upsert {domain: {"verdict", "checked_at"}}."""
+    if not verdicts:
+        return
+    rows = [{"domain": domain, **v} for domain, v in verdicts.items()]
+    with engine.begin() as conn:
+        _upsert(conn, StoreVerdict, rows, ["verdict", "checked_at"])
+
+# ---------- Page validators / section results ----------
+@metrics.timed(metrics.DB_SECONDS, op="get_page_validators")
+def get_page_validators(domain: str):
+    session = SessionLocal()
+    try:
+        rows = session.query(PageValidator).filter_by(domain=domain).all()
+        return [
+            {
+                "path": r.path, "status": r.status, "etag": r.etag,
+                "last_modified": r.last_modified, "body_hash": r.body_hash, "fetched_at": r.fetched_at,
+            }
+            for r in rows
+        ]
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="save_page_validators")
+def save_page_validators(domain: str, entries: list):
+    if not entries:
+        return
+    rows = [{"domain": domain, **e} for e in entries]
+    with engine.begin() as conn:
+        _upsert(conn, PageValidator, rows, ["status", "etag", "last_modified", "body_hash", "fetched_at"])
+
+@metrics.timed(metrics.DB_SECONDS, op="get_section_results")
+def get_section_results(domain: str):
+    session = SessionLocal()
+    try:
+        rows = session.query(SectionResult).filter_by(domain=domain).all()
+        return {r.section: {"sources": codec.loads(r.sources), "result": codec.decode_blob(r.result)} for r in rows}
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="save_section_results")
+def save_section_results(domain: str, sections: dict):
+    if not sections:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {
+            "domain": domain, "section": section, "updated_at": now,
+            "sources": codec.dumps_str(entry["sources"]), "result": codec.encode_blob(entry["result"]),
+        }
+        for section, entry in sections.items()
+    ]
+    with engine.begin() as conn:
+        _upsert(conn, SectionResult, rows, ["sources", "result", "updated_at"])
+
+# ---------- Crawl jobs ----------
+def _job_dict(job) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "website_url": job.website_url,
+        "status": job.status,
+        "progress": job.progress or {},
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+@metrics.timed(metrics.DB_SECONDS, op="create_job")
+def create_job(kind: str, website_url: str) -> dict:
+    session = SessionLocal()
+    try:
+        job = CrawlJob(kind=kind, website_url=website_url, status="queued", progress={}, created_at=datetime.utcnow())
+        session.add(job)
+        session.commit()
+        return _job_dict(job)
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="claim_next_job")
+def claim_next_job():
+    """
+    Move the oldest queued job to running and return it. The conditional
+    UPDATE makes the claim safe across worker threads and processes.
+    """
+    session = SessionLocal()
+    try:
+        while True:
+            job_id = session.query(CrawlJob.id).filter_by(status="queued").order_by(CrawlJob.id).limit(1).scalar()
+            if job_id is None:
+                return None
+            now = datetime.utcnow()
+            claimed = session.query(CrawlJob).filter_by(id=job_id, status="queued").update(
+                {"status": "running", "started_at": now, "heartbeat_at": now}, synchronize_session=False
+            )
+            session.commit()
+            if claimed:
+                return _job_dict(session.get(CrawlJob, job_id))
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="update_job")
+def update_job(job_id: int, **fields):
+    """Set job columns (status, progress, result, error, ...) and refresh its heartbeat."""
+    if "result" in fields and fields["result"] is not None:
+        fields["result"] = codec.encode_blob(fields["result"])
+    fields["heartbeat_at"] = datetime.utcnow()
+    session = SessionLocal()
+    try:
+        session.query(CrawlJob).filter_by(id=job_id).update(fields, synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="get_job")
+def get_job(job_id: int):
+    session = SessionLocal()
+    try:
+        job = session.get(CrawlJob, job_id)
+        return _job_dict(job) if job else None
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="get_job_result")
+def get_job_result(job_id: int):
+    session = SessionLocal()
+    try:
+        job = session.get(CrawlJob, job_id)
+        if job is None or job.result is None:
+            return None
+        return codec.decode_blob(job.result)
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="get_job_result_json")
+def get_job_result_json(job_id: int):
+    """A finished job's result as JSON bytes, decompressed but not parsed."""
+    session = SessionLocal()
+    try:
+        result = session.query(CrawlJob.result).filter_by(id=job_id).scalar()
+        return codec.blob_json(result) if result is not None else None
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="requeue_stale_jobs")
+def requeue_stale_jobs(stale_after: timedelta) -> int:
+    """Jobs left running by a worker that died (no heartbeat for `stale_after`) go back to the queue."""
+    session = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - stale_after
+        count = session.query(CrawlJob).filter(
+            CrawlJob.status == "running", CrawlJob.heartbeat_at < cutoff
+        ).update({"status": "queued"}, synchronize_session=False)
+        session.commit()
+        return count
+    finally:
+        session.close()
+
+# ---------- Bulk ingestion ----------
+def _ingest_run_dict(run) -> dict:
+    processed = run.done + run.failed - run.resumed_from
+    end = run.finished_at or run.heartbeat_at
+    minutes = (end - run.started_at).total_seconds() / 60 if run.started_at and end else 0
+    return {
+        "run_id": run.id,
+        "name": run.name,
+        "status": run.status,
+        "total": run.total,
+        "done": run.done,
+        "failed": run.failed,
+        "pending": run.total - run.done - run.failed,
+        "stores_per_minute": round(processed / minutes, 1) if minutes > 0 else None,
+        "created_at": run.created_at.isoformat() if run.created_at else None,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "heartbeat_at": run.heartbeat_at.isoformat() if run.heartbeat_at else None,
+    }
+
+@metrics.timed(metrics.DB_SECONDS, op="create_ingest_run")
+def create_ingest_run(sites: list, name: str | None = None) -> dict:
+    """New run with one pending item per distinct store domain in `sites`."""
+    items = {}
+    for site in sites:
+        domain = brand_domain(site)
+        if domain and domain not in items:
+            items[domain] = site[:255]
+    with engine.begin() as conn:
+        run_id = conn.execute(IngestRun.__table__.insert().values(
+            name=name, status="pending", total=len(items), done=0, failed=0, resumed_from=0,
+            created_at=datetime.utcnow(),
+        )).inserted_primary_key[0]
+        rows = [{"run_id": run_id, "domain": d, "website_url": u, "status": "pending"} for d, u in items.items()]
+        for i in range(0, len(rows), DB_BATCH_SIZE):
+            conn.execute(IngestItem.__table__.insert(), rows[i:i + DB_BATCH_SIZE])
+    return get_ingest_run(run_id)
+
+@metrics.timed(metrics.DB_SECONDS, op="get_ingest_run")
+def get_ingest_run(run_id: int):
+    session = SessionLocal()
+    try:
+        run = session.get(IngestRun, run_id)
+        return _ingest_run_dict(run) if run else None
+    finally:
+        session.close()
+
+@metrics.timed(metrics.DB_SECONDS, op="start_ingest_run")
+def start_ingest_run(run_id: int, retry_failed: bool = False) -> list:
+    """Mark a run as running (a new session) and return the website URLs still to crawl."""
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        if retry_failed:
+            conn.execute(update(IngestItem).where(IngestItem.run_id == run_id, IngestItem.status == "failed")
+                         .values(status="pending", error=None))
+            conn.execute(update(IngestRun).where(IngestRun.id == run_id).values(failed=0))
+        conn.execute(update(IngestRun).where(IngestRun.id == run_id).values(
+            status="running", started_at=now, heartbeat_at=now, finished_at=None,
+            resumed_from=IngestRun.done + IngestRun.failed,
+        ))
+        rows = conn.execute(
+            select(IngestItem.website_url)
+            .where(IngestItem.run_id == run_id, IngestItem.status == "pending")
+            .order_by(IngestItem.id)
+        ).all()
+    return [r.website_url for r in rows]
+
+@metrics.timed(metrics.DB_SECONDS, op="save_ingest_batch")
+def save_ingest_batch(run_id: int, results: list):
+    """
+    Store a batch of crawl results and checkpoint their items in one
+    transaction. `results` are dicts {"site", "data" | "error", "elapsed_ms"}.
+    Each brand is saved in its own savepoint: one that fails to save is
+    marked failed without rolling back the rest. Returns how many crawled
+    brands failed to save.
+    """
+    if not results:
+        return 0
+    now = datetime.utcnow().replace(microsecond=0)
+    done = failed = rejected = 0
+    with engine.begin() as conn:
+        for r in results:
+            status, error = "failed", r.get("error")
+            if r.get("data") is not None:
+                try:
+                    with conn.begin_nested():
+                        _save_brand(conn, r["data"]["brand_name"], r["data"], now)
+                    status = "done"
+                except Exception as e:
+                    print(f"[ingest] save {r['site']} -> {e}")
+                    error = f"save failed: {e}"
+                    rejected += 1
+            if status == "done":
+                done += 1
+            else:
+                failed += 1
+            conn.execute(update(IngestItem).where(
+                IngestItem.run_id == run_id, IngestItem.domain == brand_domain(r["site"])
+            ).values(status=status, error=error, elapsed_ms=r.get("elapsed_ms"), finished_at=now))
+        conn.execute(update(IngestRun).where(IngestRun.id == run_id).values(
+            done=IngestRun.done + done, failed=IngestRun.failed + failed, heartbeat_at=now,
+        ))
+    return rejected
+
+@metrics.timed(metrics.DB_SECONDS, op="finish_ingest_run")
+def finish_ingest_run(run_id: int, status: str = "done"):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(update(IngestRun).where(IngestRun.id == run_id).values(
+            status=status, finished_at=now, heartbeat_at=now,
+        ))
@@ -0,0 +1,183 @@
+import os
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+import codec
+import http_client
+import metrics
+from db import brand_domain, get_store_verdicts, save_store_verdicts
+
+# ---------- Settings ----------
+FINGERPRINT_WORKERS = int(os.getenv("FINGERPRINT_WORKERS", "16"))        # candidates probed at once
+FINGERPRINT_TIMEOUT = float(os.getenv("FINGERPRINT_TIMEOUT", "5"))       # seconds per probe
+VERDICT_TTLS = {
+    "shopify": timedelta(days=float(os.getenv("FINGERPRINT_TTL_SHOPIFY_DAYS", "30"))),
+    "other": timedelta(days=float(os.getenv("FINGERPRINT_TTL_OTHER_DAYS", "30"))),
+    "unreachable": timedelta(hours=float(os.getenv("FINGERPRINT_TTL_UNREACHABLE_HOURS", "24"))),
+}
+
+# Response headers only Shopify's edge sends
+SHOPIFY_HEADERS = ("x-shopid", "x-shopify-stage", "x-sorting-hat-shopid", "x-shardid")
+
+# Link targets that are never competitor stores; rejected without a probe
+NOT_STORES = {
+    "instagram.com", "facebook.com", "fb.com", "twitter.com", "x.com", "tiktok.com", "youtube.com", "youtu.be",
+    "pinterest.com", "linkedin.com", "whatsapp.com", "wa.me", "t.me", "snapchat.com", "threads.net",
+    "google.com", "goo.gl", "apple.com", "apps.apple.com", "play.google.com", "paypal.com", "stripe.com",
+    "razorpay.com", "klarna.com", "afterpay.com", "shopify.com", "shop.app", "amazon.com", "amazon.in",
+    "flipkart.com", "cloudflare.com", "trustpilot.com", "judge.me", "klaviyo.com", "mailchimp.com",
+    "wikipedia.org", "bit.ly", "linktr.ee",
+}
+
+# domain -> {"verdict", "checked_at"}; read through to the store_verdicts table
+_verdicts = {}
+_lock = threading.Lock()
+
+
+# ---------------- Verdicts ----------------
+def _fresh(entry: dict, now: datetime) -> bool:
+    return now - entry["checked_at"] < VERDICT_TTLS.get(entry["verdict"], timedelta(0))
+
+
+def _quick_verdict(domain: str):
+    """
+    Verdict from the name alone, or None when a probe is needed. Only
+    rejections are decided by name: a *.myshopify.com link can point at a
+    closed store, so it is probed like any other candidate.
+    """
+    parts = domain.split(".")
+    if any(".".join(parts[i:]) in NOT_STORES for i in range(len(parts) - 1)):
+        return "other"
+    return None
+
+
+def is_obviously_not_shopify(domain: str) -> bool:
+    """True when the name alone rules the domain out (social networks, payment providers, ...)."""
+    return _quick_verdict(brand_domain(domain)) == "other"
+
+
+def _is_shopify(resp) -> bool:
+    if any(h in resp.headers for h in SHOPIFY_HEADERS):
+        return True
+    if "shopify" in resp.headers.get("powered-by", "").lower():
+        return True
+    if resp.status_code != 200 or "json" not in resp.headers.get("Content-Type", ""):
+        return False
+    try:
+        return isinstance(codec.loads(resp.content).get("products"), list)
+    except Exception:
+        return False
+
+
+def _probe_url(domain: str) -> str:
+    return f"https://{domain}/products.json?limit=1"
+
+
+def _record(domain: str, verdict: str, source: str) -> dict:
+    metrics.FINGERPRINTS.inc(verdict=verdict, source=source)
+    return {"verdict": verdict, "checked_at": datetime.utcnow()}
+
+
+def probe(domain: str) -> str:
+    """One small products.json request (no retries): shopify, other or unreachable."""
+    try:
+        resp = http_client.get(_probe_url(domain), timeout=FINGERPRINT_TIMEOUT, retries=0)
+    except Exception as e:
+        print(f"[fingerprint] {domain} -> {e}")
+        return "unreachable"
+    return "shopify" if _is_shopify(resp) else "other"
+
+
+async def probe_async(domain: str) -> str:
+    try:
+        resp = await http_client.aget(_probe_url(domain), timeout=FINGERPRINT_TIMEOUT, retries=0)
+    except Exception as e:
+        print(f"[fingerprint] {domain} -> {e}")
+        return "unreachable"
+    return "shopify" if _is_shopify(resp) else "other"
+
+
+def _cached(domains: list) -> tuple:
+    """(verdicts known and fresh, domains still to probe); loads misses from the DB in one query."""
+    now = datetime.utcnow()
+    known, unknown = {}, []
+    for domain in domains:
+        quick = _quick_verdict(domain)
+        if quick is not None:
+            known[domain] = quick
+            metrics.FINGERPRINTS.inc(verdict=quick, source="name")
+            continue
+        with _lock:
+            entry = _verdicts.get(domain)
+        if entry is not None and _fresh(entry, now):
+            known[domain] = entry["verdict"]
+            metrics.FINGERPRINTS.inc(verdict=entry["verdict"], source="cache")
+        else:
+            unknown.append(domain)
+    if unknown:
+        try:
+            stored = get_store_verdicts(unknown)
+        except Exception as e:
+            print(f"[fingerprint] load verdicts -> {e}")
+            stored = {}
+        with _lock:
+            _verdicts.update(stored)
+        fresh = {d for d, entry in stored.items() if _fresh(entry, now)}
+        for domain in fresh:
+            known[domain] = stored[domain]["verdict"]
+            metrics.FINGERPRINTS.inc(verdict=known[domain], source="db")
+        unknown = [d for d in unknown if d not in fresh]
+    return known, unknown
+
+
+def _store(probed: dict):
+    with _lock:
+        _verdicts.update(probed)
+    try:
+        save_store_verdicts(probed)
+    except Exception as e:
+        print(f"[fingerprint] save verdicts -> {e}")
+
+
+# ---------------- Classification ----------------
+def classify(domains: list) -> dict:
+    """{domain: verdict}, probing only domains without a fresh verdict, FINGERPRINT_WORKERS at a time."""
+    domains = list(dict.fromkeys(brand_domain(d) for d in domains))
+    known, unknown = _cached(domains)
+    if unknown:
+        with ThreadPoolExecutor(max_workers=max(1, min(FINGERPRINT_WORKERS, len(unknown)))) as pool:
+            futures = {d: pool.submit(copy_context().run, probe, d) for d in unknown}
+            probed = {d: _record(d, f.result(), "probe") for d, f in futures.items()}
+        _store(probed)
+        known.update({d: v["verdict"] for d, v in probed.items()})
+    return {d: known[d] for d in domains}
+
+
+async def classify_async(domains: list) -> dict:
+    domains = list(dict.fromkeys(brand_domain(d) for d in domains))
+    known, unknown = await asyncio.to_thread(_cached, domains)
+    if unknown:
+        slots = asyncio.Semaphore(max(1, FINGERPRINT_WORKERS))
+
+        async def one(domain):
+            async with slots:
+                return _record(domain, await probe_async(domain), "probe")
+
+        probed = dict(zip(unknown, await asyncio.gather(*(one(d) for d in unknown))))
+        await asyncio.to_thread(_store, probed)
+        known.update({d: v["verdict"] for d, v in probed.items()})
+    return {d: known[d] for d in domains}
+
+
+def shopify_only(domains: list, limit: int | None = None) -> list:
+    """The candidates that are Shopify stores, in input order."""
+    verdicts = classify(domains)
+    return [d for d, v in verdicts.items() if v == "shopify"][:limit]
+
+
+async def shopify_only_async(domains: list, limit: int | None = None) -> list:
+    verdicts = await classify_async(domains)
+    return [d for d, v in verdicts.items() if v == "shopify"][:limit]
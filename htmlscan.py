@@ -0,0 +1,83 @@
+import os
+from bs4 import BeautifulSoup, Tag
+from bs4.builder import builder_registry
+
+import metrics
+
+
+# ---------------- Parser backend ----------------
+def _pick_parser() -> str:
+    """
+    HTML_PARSER from .env ("lxml", "html5lib", "html.parser"); defaults to
+    lxml and falls back to the stdlib parser when the backend isn't installed.
+    """
+    wanted = os.getenv("HTML_PARSER", "lxml")
+    if builder_registry.lookup(wanted) is not None:
+        return wanted
+    return "html.parser"
+
+
+PARSER = _pick_parser()
+
+FAQ_HEADING_TAGS = {"h2", "h3", "strong", "dt"}
+
+
+# ---------------- Single-pass scan ----------------
+class PageScan:
+    """
+    Everything the extractors look for, collected in one walk over the tree:
+    anchors with an href, product cards (anchors pointing at /products/, each
+    paired with the first <img> at or after it, like
+    `a.find("img") or a.find_next("img")`), paragraphs and FAQ headings.
+    """
+
+    def __init__(self, soup):
+        self.anchors = []
+        self.product_cards = []
+        self.paragraphs = []
+        self.faq_headings = []
+        waiting_for_img = []
+
+        for el in soup.descendants:
+            if not isinstance(el, Tag):
+                continue
+            name = el.name
+            if name == "a":
+                href = el.get("href")
+                if href is not None:
+                    self.anchors.append(el)
+                    if "/products/" in href:
+                        card = [el, None]
+                        self.product_cards.append(card)
+                        waiting_for_img.append(card)
+            elif name == "img":
+                for card in waiting_for_img:
+                    card[1] = el
+                waiting_for_img = []
+            elif name == "p":
+                self.paragraphs.append(el)
+            if name in FAQ_HEADING_TAGS:
+                self.faq_headings.append(el)
+
+
+class ParsedPage(BeautifulSoup):
+    """BeautifulSoup tree that builds (and keeps) its PageScan on first use."""
+
+    _scan = None
+
+    @property
+    def scan(self) -> PageScan:
+        if self._scan is None:
+            self._scan = PageScan(self)
+        return self._scan
+
+
+def make_soup(html: str) -> ParsedPage:
+    with metrics.timer(metrics.PARSE_SECONDS, kind="html"):
+        return ParsedPage(html, PARSER)
+
+
+def scan_page(soup) -> PageScan:
+    if isinstance(soup, ParsedPage):
+        return soup.scan
+    return PageScan(soup)
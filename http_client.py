@@ -0,0 +1,377 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# ---------- Settings (overridable from .env) ----------
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "12"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))   # global cap
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "6"))           # per-host cap
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_HOST_POOLS = int(os.getenv("HTTP_HOST_POOLS", "100"))             # hosts kept warm (sync)
+USER_AGENT = os.getenv("HTTP_USER_AGENT", "Mozilla/5.0 (compatible; ShopifyInsightsBot/1.0)")
+HTTP_HOST_RATE = float(os.getenv("HTTP_HOST_RATE", "10"))              # requests/second per host
+HTTP_HOST_BURST = float(os.getenv("HTTP_HOST_BURST", "20"))            # token bucket size
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))                     # extra attempts on 429/5xx/network errors
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))       # seconds, doubled per attempt (jittered)
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "8"))
+HTTP_RETRY_AFTER_MAX = float(os.getenv("HTTP_RETRY_AFTER_MAX", "30"))  # longer Retry-After -> give up
+HTTP_BREAKER_THRESHOLD = int(os.getenv("HTTP_BREAKER_THRESHOLD", "3")) # consecutive failures that open the circuit
+HTTP_BREAKER_COOLDOWN = float(os.getenv("HTTP_BREAKER_COOLDOWN", "60"))
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 and httpx decode br)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+DEFAULT_HEADERS = {"User-Agent": USER_AGENT, "Accept-Encoding": ACCEPT_ENCODING}
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+# ---------- Per-host scheduling ----------
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)      # host asks us to slow down
+_PILOT_POLL = 0.05
+
+
+class HostUnavailable(Exception):
+    """The host's circuit is open: it failed repeatedly and is skipped until the cooldown ends."""
+
+
+class _HostState:
+    def __init__(self):
+        self.rate = HTTP_HOST_RATE
+        self.tokens = HTTP_HOST_BURST
+        self.refilled = time.monotonic()
+        self.blocked_until = 0.0        # Retry-After
+        self.failures = 0               # consecutive
+        self.open_until = 0.0
+        self.confirmed = False          # answered at least once since (re)opening
+        self.pilot = False              # first request to an unconfirmed host is in flight
+
+
+class HostScheduler:
+    """
+    Token bucket per host (HTTP_HOST_RATE, HTTP_HOST_BURST) that backs off on
+    429/503 and Retry-After, plus a circuit breaker. Until a host has answered
+    once, only one request to it is in flight (the pilot), so a dead store
+    costs one timeout at a time instead of one per probe. The circuit opens
+    after HTTP_BREAKER_THRESHOLD consecutive failed requests (network errors
+    or 429/503; a request counts once however often it was retried). Other
+    answers, 500s included, mean the host is up. After HTTP_BREAKER_COOLDOWN
+    the next request is a pilot again (half-open).
+    Thread-safe; callers sleep for the returned delay themselves, so the same
+    scheduler serves threads and event loops.
+    """
+
+    def __init__(self):
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState()
+        return state
+
+    def reserve(self, host: str) -> float:
+        """0 when a request may be sent now (a token is taken), else seconds to wait before asking again."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(host)
+            if state.open_until > now:
+                raise HostUnavailable(f"{host} circuit open for {state.open_until - now:.0f}s")
+            if state.open_until:
+                # cooldown over: half-open, the next request is a pilot
+                state.open_until = 0.0
+                state.confirmed = False
+            if not state.confirmed and state.pilot:
+                return _PILOT_POLL
+            if state.blocked_until > now:
+                return state.blocked_until - now
+            state.tokens = min(HTTP_HOST_BURST, state.tokens + (now - state.refilled) * state.rate)
+            state.refilled = now
+            if state.tokens < 1:
+                return (1 - state.tokens) / state.rate
+            state.tokens -= 1
+            if not state.confirmed:
+                state.pilot = True
+            return 0.0
+
+    def success(self, host: str, status: int, retry_after: float | None = None):
+        """Any HTTP answer: the host is up. 429/503 halve its rate, others raise it back gradually."""
+        with self._lock:
+            state = self._state(host)
+            state.confirmed = True
+            state.pilot = False
+            if status in THROTTLE_STATUSES:
+                state.rate = max(HTTP_HOST_RATE / 16, state.rate / 2)
+                if retry_after:
+                    state.blocked_until = max(state.blocked_until, time.monotonic() + retry_after)
+            else:
+                state.rate = min(HTTP_HOST_RATE, state.rate + HTTP_HOST_RATE / 10)
+                state.failures = 0
+
+    def failure(self, host: str, count: bool = True):
+        """
+        An attempt failed (no answer, or 429/503). Callers pass count=False for
+        retries of a request already counted, so one URL can't open the circuit.
+        """
+        with self._lock:
+            state = self._state(host)
+            state.pilot = False
+            if count:
+                self._failed(host, state)
+
+    def _failed(self, host: str, state: _HostState):
+        state.failures += 1
+        if state.failures >= HTTP_BREAKER_THRESHOLD:
+            state.open_until = time.monotonic() + HTTP_BREAKER_COOLDOWN
+            state.failures = 0
+            metrics.CIRCUIT_OPENED.inc()
+            print(f"[http_client] {host} -> circuit open for {HTTP_BREAKER_COOLDOWN:.0f}s")
+
+    def cancelled(self, host: str):
+        """A request was abandoned before it got an answer; let another caller be the pilot."""
+        with self._lock:
+            state = self._state(host)
+            if not state.confirmed:
+                state.pilot = False
+
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            state = self._hosts.get(host)
+            return state is not None and state.open_until > time.monotonic()
+
+
+_scheduler = HostScheduler()
+
+
+def retry_after_seconds(resp) -> float | None:
+    """Retry-After header as seconds (delta-seconds or HTTP date), or None."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+def _retry_delay(resp, attempt: int, retries: int = HTTP_RETRIES):
+    """Seconds to wait before retrying `resp`, 0 when the scheduler already waits (Retry-After), None to give up."""
+    if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+        return None
+    retry_after = retry_after_seconds(resp)
+    if retry_after is not None:
+        return None if retry_after > HTTP_RETRY_AFTER_MAX else 0.0
+    return _backoff(attempt)
+
+
+# ---------- Sync session ----------
+_session = None
+_session_lock = threading.Lock()
+_global_slots = threading.BoundedSemaphore(HTTP_MAX_CONNECTIONS)
+
+
+def get_session() -> requests.Session:
+    """
+    Process-wide requests.Session. One urllib3 pool per host, at most
+    HTTP_MAX_PER_HOST connections each (pool_block makes extra callers wait
+    instead of opening throwaway connections).
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_HOST_POOLS,
+                    pool_maxsize=HTTP_MAX_PER_HOST,
+                    pool_block=True,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def get(url: str, params: dict | None = None, timeout: float | None = None,
+        headers: dict | None = None, retries: int | None = None) -> requests.Response:
+    """
+    GET through the shared session, within the global connection budget and
+    the host's schedule (see HostScheduler). 429/5xx answers and network
+    errors are retried up to HTTP_RETRIES times (or `retries`); raises
+    HostUnavailable while the host's circuit is open.
+    """
+    read_timeout = timeout or HTTP_READ_TIMEOUT
+    retries = HTTP_RETRIES if retries is None else retries
+    host = _host(url)
+    attempt = 0
+    counted = False     # this request already counted towards the breaker
+    while True:
+        while True:
+            delay = _scheduler.reserve(host)
+            if delay <= 0:
+                break
+            time.sleep(delay)
+        error = None
+        with _global_slots:
+            started = time.perf_counter()
+            try:
+                resp = get_session().get(url, params=params, headers=headers, timeout=(HTTP_CONNECT_TIMEOUT, read_timeout))
+            except Exception as e:
+                error = e
+            metrics.record_fetch("sync", None if error else resp, error=error, elapsed=time.perf_counter() - started)
+        if error is not None:
+            _scheduler.failure(host, count=not counted)
+            counted = True
+            if attempt >= retries or _scheduler.is_open(host):
+                raise error
+            metrics.RETRIES.inc(reason="error")
+            time.sleep(_backoff(attempt))
+            attempt += 1
+            continue
+        _scheduler.success(host, resp.status_code, retry_after_seconds(resp))
+        if resp.status_code in THROTTLE_STATUSES:
+            _scheduler.failure(host, count=not counted)
+            counted = True
+        delay = _retry_delay(resp, attempt, retries)
+        if delay is None or _scheduler.is_open(host):
+            return resp
+        metrics.RETRIES.inc(reason=str(resp.status_code))
+        time.sleep(delay)
+        attempt += 1
+
+
+def close():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+# ---------- Async client ----------
+_async_client = None
+_async_client_loop = None
+_host_slots = {}
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """One AsyncClient per running event loop (httpx clients are loop-bound)."""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+        )
+        _async_client_loop = loop
+        _host_slots.clear()
+    return _async_client
+
+
+def _host_slot(url: str) -> asyncio.Semaphore:
+    host = _host(url)
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+    return slot
+
+
+async def aget(url: str, params: dict | None = None, timeout: float | None = None,
+               headers: dict | None = None, retries: int | None = None) -> httpx.Response:
+    """
+    GET through the shared AsyncClient, at most HTTP_MAX_PER_HOST in flight
+    per host; same scheduling, retries and circuit breaker as get().
+    """
+    client = get_async_client()
+    read_timeout = timeout or HTTP_READ_TIMEOUT
+    retries = HTTP_RETRIES if retries is None else retries
+    host = _host(url)
+    attempt = 0
+    counted = False     # this request already counted towards the breaker
+    while True:
+        while True:
+            delay = _scheduler.reserve(host)
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        error = None
+        try:
+            async with _host_slot(url):
+                started = time.perf_counter()
+                try:
+                    resp = await client.get(
+                        url,
+                        params=params,
+                        headers=headers,
+                        timeout=httpx.Timeout(read_timeout, connect=HTTP_CONNECT_TIMEOUT),
+                    )
+                except Exception as e:
+                    error = e
+                metrics.record_fetch("async", None if error else resp, error=error, elapsed=time.perf_counter() - started)
+        except asyncio.CancelledError:
+            _scheduler.cancelled(host)
+            raise
+        if error is not None:
+            _scheduler.failure(host, count=not counted)
+            counted = True
+            if attempt >= retries or _scheduler.is_open(host):
+                raise error
+            metrics.RETRIES.inc(reason="error")
+            await asyncio.sleep(_backoff(attempt))
+            attempt += 1
+            continue
+        _scheduler.success(host, resp.status_code, retry_after_seconds(resp))
+        if resp.status_code in THROTTLE_STATUSES:
+            _scheduler.failure(host, count=not counted)
+            counted = True
+        delay = _retry_delay(resp, attempt, retries)
+        if delay is None or _scheduler.is_open(host):
+            return resp
+        metrics.RETRIES.inc(reason=str(resp.status_code))
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def aclose():
+    global _async_client, _async_client_loop
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+    _host_slots.clear()
@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+
+import http_client
+from db import (
+    init_db,
+    create_ingest_run,
+    get_ingest_run,
+    start_ingest_run,
+    save_ingest_batch,
+    finish_ingest_run,
+)
+from service import fetch_brand_insights_async, SECTIONS, _empty_section
+
+# ---------- Settings ----------
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "16"))        # stores crawled at once
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "25"))          # stores per DB transaction
+INGEST_FLUSH_SECONDS = float(os.getenv("INGEST_FLUSH_SECONDS", "15"))  # flush a partial batch after this long
+INGEST_STALE_SECONDS = float(os.getenv("INGEST_STALE_SECONDS", "300")) # running run without heartbeat -> resumable
+
+# run_id -> asyncio.Task for runs driven by this process (API)
+_runs = {}
+
+
+# ---------------- Input ----------------
+def read_domains(path: str) -> list:
+    """One store per line; blank lines and # comments are skipped, CSV rows use the first column."""
+    sites = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            site = line.split("#", 1)[0].split(",", 1)[0].strip()
+            if site:
+                sites.append(site)
+    return sites
+
+
+def _has_data(data: dict) -> bool:
+    return any(data.get(key) != _empty_section(key) for key in SECTIONS)
+
+
+# ---------------- Pipeline ----------------
+async def run_ingest(run_id: int, concurrency: int = INGEST_CONCURRENCY, retry_failed: bool = False) -> dict:
+    """
+    Crawl the pending stores of a run, `concurrency` at a time, and write
+    results in batches of INGEST_BATCH_SIZE. Each batch commits the brands and
+    their checkpoint rows together, so an interrupted run resumes with exactly
+    the stores that were not saved yet.
+
+    Politeness: every store appears once per run (deduplicated by domain), is
+    crawled by one worker at a time under the async crawl's deadline, and all
+    requests go through http_client's per-host rate limit and circuit breaker.
+    """
+    sites = await asyncio.to_thread(start_ingest_run, run_id, retry_failed)
+    queue = asyncio.Queue()
+    for site in sites:
+        queue.put_nowait(site)
+
+    buffer = []
+    flush_lock = asyncio.Lock()
+    stats = {"done": 0, "failed": 0, "last_flush": time.monotonic()}
+    started = time.monotonic()
+
+    def throughput() -> float:
+        minutes = (time.monotonic() - started) / 60
+        return round((stats["done"] + stats["failed"]) / minutes, 1) if minutes > 0 else 0.0
+
+    async def flush():
+        async with flush_lock:
+            batch = buffer[:]
+            buffer.clear()
+            stats["last_flush"] = time.monotonic()
+            if not batch:
+                return
+            rejected = await asyncio.to_thread(save_ingest_batch, run_id, batch)
+            stats["done"] -= rejected
+            stats["failed"] += rejected
+            print(f"[ingest] run {run_id}: {stats['done'] + stats['failed']}/{len(sites)} "
+                  f"({stats['failed']} failed), {throughput()} stores/min")
+
+    async def worker():
+        while True:
+            try:
+                site = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.monotonic()
+            try:
+                data = await fetch_brand_insights_async(site)
+                result = {"site": site, "data": data} if _has_data(data) else {"site": site, "error": "no data extracted"}
+            except Exception as e:
+                result = {"site": site, "error": str(e)}
+            result["elapsed_ms"] = round((time.monotonic() - t0) * 1000)
+            stats["failed" if "error" in result else "done"] += 1
+            buffer.append(result)
+            if len(buffer) >= INGEST_BATCH_SIZE or time.monotonic() - stats["last_flush"] >= INGEST_FLUSH_SECONDS:
+                await flush()
+
+    status = "interrupted"
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(sites))))]
+    try:
+        await asyncio.gather(*workers)
+        status = "done"
+    finally:
+        # the first failure (or cancellation) stops every worker; unsaved stores stay pending
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        try:
+            await flush()
+        finally:
+            await asyncio.to_thread(finish_ingest_run, run_id, status)
+
+    return {
+        "run_id": run_id,
+        "status": status,
+        "crawled": stats["done"] + stats["failed"],
+        "done": stats["done"],
+        "failed": stats["failed"],
+        "elapsed_s": round(time.monotonic() - started, 1),
+        "stores_per_minute": throughput(),
+    }
+
+
+# ---------------- Background runs (API) ----------------
+def is_active(run_id: int) -> bool:
+    task = _runs.get(run_id)
+    return task is not None and not task.done()
+
+
+def resumable(run: dict) -> bool:
+    """A run can be (re)started unless it is finished or another process is still heartbeating it."""
+    if run["status"] == "done" and run["pending"] == 0:
+        return False
+    if run["status"] == "running" and run["heartbeat_at"]:
+        age = datetime.utcnow() - datetime.fromisoformat(run["heartbeat_at"])
+        return age > timedelta(seconds=INGEST_STALE_SECONDS)
+    return True
+
+
+def start_background(run_id: int, retry_failed: bool = False) -> asyncio.Task:
+    """Drive a run from the API's event loop."""
+    if is_active(run_id):
+        return _runs[run_id]
+    task = asyncio.create_task(run_ingest(run_id, retry_failed=retry_failed))
+    _runs[run_id] = task
+    task.add_done_callback(lambda t: _finished(run_id, t))
+    return task
+
+
+def _finished(run_id: int, task):
+    _runs.pop(run_id, None)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[ingest] run {run_id} -> {task.exception()}")
+
+
+async def stop_background():
+    """Cancel runs in progress (on shutdown); they are left resumable."""
+    tasks = list(_runs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# ---------------- CLI ----------------
+async def _cli_run(run_id: int, concurrency: int, retry_failed: bool) -> dict:
+    try:
+        return await run_ingest(run_id, concurrency, retry_failed)
+    finally:
+        await http_client.aclose()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Crawl many stores and save them to the database.")
+    parser.add_argument("domains_file", nargs="?", help="file with one store domain per line")
+    parser.add_argument("--name", help="label for a new run")
+    parser.add_argument("--resume", type=int, metavar="RUN_ID", help="continue an interrupted run")
+    parser.add_argument("--retry-failed", action="store_true", help="with --resume: crawl failed stores again")
+    parser.add_argument("--status", type=int, metavar="RUN_ID", help="print a run's progress and exit")
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    init_db()
+    if args.status:
+        print(get_ingest_run(args.status))
+        return 0
+    if args.resume:
+        run = get_ingest_run(args.resume)
+        if run is None:
+            print(f"run {args.resume} not found")
+            return 1
+    elif args.domains_file:
+        run = create_ingest_run(read_domains(args.domains_file), name=args.name or os.path.basename(args.domains_file))
+        print(f"[ingest] created run {run['run_id']} with {run['total']} stores")
+    else:
+        parser.error("give a domains file or --resume RUN_ID")
+
+    try:
+        summary = asyncio.run(_cli_run(run["run_id"], args.concurrency, args.retry_failed))
+    except KeyboardInterrupt:
+        print(f"[ingest] interrupted; continue with: python ingest.py --resume {run['run_id']}")
+        return 130
+    print(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
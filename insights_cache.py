@@ -0,0 +1,289 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from datetime import timezone
+
+import codec
+from db import brand_domain, get_brand_snapshot_async, save_brand_data
+from service import SECTIONS, crawl_sections_async, stream_sections_async, _empty_section
+
+# ---------- Settings (overridable from .env) ----------
+INSIGHTS_CACHE_SIZE = int(os.getenv("INSIGHTS_CACHE_SIZE", "256"))           # stores kept in memory
+INSIGHTS_MAX_STALE = float(os.getenv("INSIGHTS_MAX_STALE", str(7 * 86400)))  # seconds past TTL still served
+
+# Seconds a section stays fresh; INSIGHTS_TTL_<SECTION> overrides, e.g. INSIGHTS_TTL_PRODUCTS=600
+_DEFAULT_TTLS = {"products": 3600, "hero_products": 3600}
+SECTION_TTLS = {
+    key: float(os.getenv(f"INSIGHTS_TTL_{key.upper()}", str(_DEFAULT_TTLS.get(key, 86400))))
+    for key in SECTIONS
+}
+
+
+# ---------------- In-memory LRU ----------------
+# domain -> {"data": full insights dict, "fetched": {section: epoch seconds}, "json": encoded data (lazy)}
+# Refreshes put a new entry, so a cached "json" always matches its "data".
+_entries = OrderedDict()
+_lock = threading.Lock()
+# domain -> (asyncio.Task or, for streamed crawls, Future, frozenset of the sections it crawls)
+_inflight = {}
+
+
+def _get(domain: str):
+    with _lock:
+        entry = _entries.get(domain)
+        if entry is not None:
+            _entries.move_to_end(domain)
+        return entry
+
+
+def _put(domain: str, entry: dict):
+    with _lock:
+        _entries[domain] = entry
+        _entries.move_to_end(domain)
+        while len(_entries) > INSIGHTS_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def invalidate(website_url: str):
+    with _lock:
+        _entries.pop(brand_domain(website_url), None)
+
+
+async def _load(domain: str):
+    """L1 entry, else the stored copy in the DB (all sections as old as its last crawl)."""
+    entry = _get(domain)
+    if entry is not None:
+        return entry
+    try:
+        snapshot = await get_brand_snapshot_async(domain)
+    except Exception as e:
+        print(f"[insights_cache] {domain} -> {e}")
+        return None
+    if snapshot is None:
+        return None
+    fetched_at = snapshot["updated_at"].replace(tzinfo=timezone.utc).timestamp()
+    entry = {"data": snapshot["data"], "fetched": {key: fetched_at for key in SECTIONS}}
+    _put(domain, entry)
+    return entry
+
+
+def _stale_sections(entry: dict, now: float, grace: float = 0) -> list:
+    return [
+        key for key in SECTIONS
+        if now - entry["fetched"].get(key, float("-inf")) > SECTION_TTLS[key] + grace
+    ]
+
+
+# ---------------- Refresh ----------------
+async def _refresh(website_url: str, domain: str, keys: list):
+    """Crawl only the expired sections, merge them into the cached copy and persist it."""
+    results, missing = await crawl_sections_async(website_url, keys)
+    return await _merge(website_url, domain, results, missing)
+
+
+async def _merge(website_url: str, domain: str, results: dict, missing) -> dict:
+    """Fold freshly crawled sections into the cached copy, cache it and save it."""
+    now = time.time()
+    entry = _get(domain) or await _load(domain)
+    if entry is None:
+        entry = {"data": {"brand_name": website_url}, "fetched": {}}
+    data = dict(entry["data"])
+    fetched = dict(entry["fetched"])
+    for key in SECTIONS:
+        if key in results:
+            data[key] = results[key]
+            fetched[key] = now
+        elif key not in data:
+            # failed and nothing cached: serve the empty value but leave it expired
+            data[key] = _empty_section(key)
+    entry = {"data": data, "fetched": fetched}
+    _put(domain, entry)
+    if missing:
+        print(f"[insights_cache] {domain} -> kept cached {sorted(missing)}")
+    try:
+        await asyncio.to_thread(save_brand_data, data["brand_name"], data)
+    except Exception as e:
+        print(f"[insights_cache] save {domain} -> {e}")
+    return entry
+
+
+async def _refresh_more(running, website_url: str, domain: str, keys: list):
+    """Crawl `keys` alongside a running refresh that doesn't cover them; the entry reflects both."""
+    entry = await _refresh(website_url, domain, keys)
+    await asyncio.wait([running])
+    return _get(domain) or entry
+
+
+def _running(domain: str, keys) -> asyncio.Future | None:
+    """The in-flight refresh of a store if it crawls every one of `keys`."""
+    running = _inflight.get(domain)
+    if running is None or running[0].done() or not set(keys) <= running[1]:
+        return None
+    return running[0]
+
+
+def _register(domain: str, task, keys):
+    _inflight[domain] = (task, frozenset(keys))
+    task.add_done_callback(lambda t: _finished(domain, t))
+
+
+def _start_refresh(website_url: str, domain: str, keys: list) -> asyncio.Future:
+    """
+    One refresh per store at a time: callers join the running one when it
+    crawls all the sections they need, else the missing ones are crawled
+    alongside it and the new task (covering both) takes its place.
+    """
+    task = _running(domain, keys)
+    if task is not None:
+        return task
+    running = _inflight.get(domain)
+    if running is not None and not running[0].done():
+        extra = [key for key in keys if key not in running[1]]
+        task = asyncio.create_task(_refresh_more(running[0], website_url, domain, extra))
+        keys = running[1] | set(keys)
+    else:
+        task = asyncio.create_task(_refresh(website_url, domain, keys))
+    _register(domain, task, keys)
+    return task
+
+
+def _finished(domain: str, task):
+    running = _inflight.get(domain)
+    if running is not None and running[0] is task:
+        del _inflight[domain]
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[insights_cache] refresh {domain} -> {task.exception()}")
+
+
+def _resolve(future, task):
+    """Settle a registered crawl future with the outcome of the task producing its entry."""
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+# ---------------- Lookup ----------------
+async def _lookup(website_url: str, refresh: bool):
+    """
+    Cache entry for a store, cache first. Returns (entry, status):
+      "hit"   every section within its TTL
+      "stale" served from cache while the expired sections are re-crawled
+      "miss"  nothing usable cached (or refresh=True); waited for a crawl
+    Concurrent lookups for the same store share one crawl.
+    """
+    domain = brand_domain(website_url)
+    entry = _get(domain) or await _load(domain)
+    now = time.time()
+
+    if entry is not None and not refresh:
+        expired = _stale_sections(entry, now)
+        if not expired:
+            return entry, "hit"
+        if not _stale_sections(entry, now, grace=INSIGHTS_MAX_STALE):
+            _start_refresh(website_url, domain, expired)
+            return entry, "stale"
+
+    keys = list(SECTIONS) if entry is None or refresh else _stale_sections(entry, now)
+    # shield: a client disconnecting must not cancel a crawl others are waiting on
+    entry = await asyncio.shield(_start_refresh(website_url, domain, keys))
+    return entry, "miss"
+
+
+async def get_insights(website_url: str, refresh: bool = False):
+    """Insights for a store as (data, status); see _lookup."""
+    entry, status = await _lookup(website_url, refresh)
+    return entry["data"], status
+
+
+async def get_insights_json(website_url: str, refresh: bool = False):
+    """Same as get_insights but (JSON bytes, status); the encoding is kept with the entry."""
+    entry, status = await _lookup(website_url, refresh)
+    if "json" not in entry:
+        entry["json"] = codec.dumps(entry["data"])
+    return entry["json"], status
+
+
+# ---------------- Streaming ----------------
+async def stream_insights(website_url: str, refresh: bool = False):
+    """
+    Insights as a sequence of events, each section as soon as it is known:
+      {"event": "start", "brand_name", "sections": [keys]}
+      {"event": "section", "key", "data", "source": cache | crawl | stale | missing, "elapsed_ms"}
+      {"event": "summary", "brand_name", "sources": {key: source}, "missing", "elapsed_ms"}
+    Sections within their TTL come straight from the cache; the rest are
+    crawled concurrently and emitted as their extractors finish. The merged
+    result is cached and saved (save_brand_data) before the summary.
+    """
+    started = time.monotonic()
+    domain = brand_domain(website_url)
+
+    def ms() -> int:
+        return round((time.monotonic() - started) * 1000)
+
+    entry = _get(domain) or await _load(domain)
+    now = time.time()
+    expired = list(SECTIONS) if entry is None or refresh else _stale_sections(entry, now)
+    cached = {} if entry is None else entry["data"]
+    sources = {}
+    yield {"event": "start", "brand_name": cached.get("brand_name", website_url), "sections": list(SECTIONS)}
+
+    for key in SECTIONS:
+        if key not in expired:
+            sources[key] = "cache"
+            yield {"event": "section", "key": key, "data": cached[key], "source": "cache", "elapsed_ms": ms()}
+
+    if expired:
+        task = _running(domain, expired)
+        if task is not None:
+            # a refresh of this store already crawls these sections: wait for it instead of crawling twice
+            entry = await asyncio.shield(task)
+            for key in expired:
+                if entry["fetched"].get(key, float("-inf")) >= now:
+                    sources[key] = "crawl"
+                else:   # the joined refresh failed on it
+                    sources[key] = "stale" if key in cached else "missing"
+                yield {"event": "section", "key": key, "data": entry["data"][key], "source": sources[key], "elapsed_ms": ms()}
+        else:
+            # registered like a refresh, so concurrent lookups of this store join this crawl
+            crawl = asyncio.get_running_loop().create_future()
+            _register(domain, crawl, expired)
+            results = {}
+            sections = stream_sections_async(website_url, expired)
+            try:
+                async for key, result, ok in sections:
+                    if ok:
+                        results[key] = result
+                        sources[key] = "crawl"
+                        yield {"event": "section", "key": key, "data": result, "source": "crawl", "elapsed_ms": ms()}
+                    else:
+                        sources[key] = "stale" if key in cached else "missing"
+                        data = cached[key] if key in cached else _empty_section(key)
+                        yield {"event": "section", "key": key, "data": data, "source": sources[key], "elapsed_ms": ms()}
+            finally:
+                try:
+                    # closing the section stream flushes path_map / validators, which the save below reads
+                    await sections.aclose()
+                except Exception as e:
+                    print(f"[insights_cache] stream {domain} -> {e}")
+                finally:
+                    # also when the client went away mid-stream: the sections crawled so far are kept
+                    merge = asyncio.ensure_future(
+                        _merge(website_url, domain, results, {key for key in expired if key not in results})
+                    )
+                    merge.add_done_callback(lambda t: _resolve(crawl, t))
+            entry = await asyncio.shield(merge)
+
+    yield {
+        "event": "summary",
+        "brand_name": entry["data"].get("brand_name", website_url),
+        "sources": sources,
+        "missing": [key for key, source in sources.items() if source == "missing"],
+        "elapsed_ms": ms(),
+    }
@@ -0,0 +1,126 @@
+import os
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from db import (
+    init_db,
+    create_job,
+    claim_next_job,
+    update_job,
+    requeue_stale_jobs,
+    save_brand_data,
+)
+from service import fetch_brand_insights, competitor_sites, crawl_sites
+from pagestore import crawl_scope
+
+# ---------- Settings ----------
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))                 # 0 = API only, run `python jobs.py` elsewhere
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "900"))  # running job without heartbeat -> requeued
+
+JOB_KINDS = ("insights", "competitors")
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_threads = []
+
+
+# ---------------- Enqueue ----------------
+def enqueue(kind: str, website_url: str) -> dict:
+    if kind not in JOB_KINDS:
+        raise ValueError(f"unknown job kind: {kind}")
+    job = create_job(kind, website_url)
+    _wakeup.set()
+    return job
+
+
+# ---------------- Job execution ----------------
+def _set_progress(job_id: int, progress: dict, lock, site: str, state: dict):
+    with lock:
+        progress[site] = state
+        snapshot = dict(progress)
+    update_job(job_id, progress=snapshot)
+
+
+def _crawl_site(job_id: int, site: str, progress: dict, lock) -> dict:
+    _set_progress(job_id, progress, lock, site, {"status": "running"})
+    try:
+        data = fetch_brand_insights(site)
+        save_brand_data(data["brand_name"], data)
+        _set_progress(job_id, progress, lock, site, {"status": "done"})
+        return data
+    except Exception as e:
+        _set_progress(job_id, progress, lock, site, {"status": "error", "error": str(e)})
+        raise
+
+
+def run_job(job: dict):
+    job_id = job["job_id"]
+    try:
+        with crawl_scope():
+            if job["kind"] == "competitors":
+                sites = competitor_sites(job["website_url"])
+            else:
+                sites = [job["website_url"]]
+            progress = {site: {"status": "pending"} for site in sites}
+            update_job(job_id, progress=dict(progress))
+            lock = threading.Lock()
+            results = crawl_sites(sites, crawl=lambda site: _crawl_site(job_id, site, progress, lock))
+        result = results if job["kind"] == "competitors" else results[0]
+        update_job(job_id, status="done", result=result, finished_at=datetime.utcnow())
+    except Exception as e:
+        traceback.print_exc()
+        update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+
+
+# ---------------- Worker pool ----------------
+def _worker_loop():
+    while not _stop.is_set():
+        try:
+            job = claim_next_job()
+        except Exception as e:
+            print(f"[jobs] claim failed -> {e}")
+            job = None
+        if job is None:
+            _wakeup.wait(JOB_POLL_SECONDS)
+            _wakeup.clear()
+            try:
+                requeue_stale_jobs(timedelta(seconds=JOB_STALE_SECONDS))
+            except Exception as e:
+                print(f"[jobs] requeue failed -> {e}")
+            continue
+        run_job(job)
+
+
+def start_workers(count: int = JOB_WORKERS):
+    """Requeue jobs orphaned by a previous process, then start `count` worker threads."""
+    if count <= 0 or _threads:
+        return
+    requeued = requeue_stale_jobs(timedelta(seconds=JOB_STALE_SECONDS))
+    if requeued:
+        print(f"[jobs] requeued {requeued} interrupted job(s)")
+    _stop.clear()
+    for i in range(count):
+        t = threading.Thread(target=_worker_loop, name=f"crawl-worker-{i}", daemon=True)
+        t.start()
+        _threads.append(t)
+
+
+def stop_workers(timeout: float = 5):
+    _stop.set()
+    _wakeup.set()
+    for t in _threads:
+        t.join(timeout)
+    _threads.clear()
+
+
+if __name__ == "__main__":
+    # standalone worker process: `python jobs.py`
+    init_db()
+    start_workers(max(JOB_WORKERS, 1))
+    try:
+        while True:
+            _stop.wait(60)
+    except KeyboardInterrupt:
+        stop_workers()
@@ -1,33 +1,249 @@
-from fastapi import FastAPI, Query, HTTPException
-from service import fetch_brand_insights, fetch_competitors
-from db import init_db, save_brand_data, get_all_brands, get_brand_by_id
+import time
+from datetime import datetime, timedelta
+from fastapi import FastAPI, Query, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from service import fetch_competitors_async
+import insights_cache
+import http_client
+from scraper import stream_products, PRODUCTS_PREFETCH
+from db import (
+    init_db, get_all_brands_async, get_brand_by_id_async, get_brand_products_async, get_brand_catalog_async,
+    get_product_changes_async, get_brand_stats_async,
+    dispose_async_engine, search_async, BRAND_FIELDS, CHANGE_KINDS, SEARCH_SECTIONS, get_job, get_job_result_json, create_ingest_run, get_ingest_run,
+)
+from models import CrawlJobRequest, IngestRequest
+import jobs
+import ingest
+import metrics
+import codec
+import catalog
+import analytics
 
-app = FastAPI(title="Shopify Insights API")
+class CodecJSONResponse(JSONResponse):
+    """Default response class: encodes through codec (orjson when installed)."""
+    def render(self, content) -> bytes:
+        return codec.dumps(content)
+
+def _json_bytes(body: bytes, headers: dict | None = None) -> Response:
+    """Response for an already encoded JSON body (skips FastAPI's encoder)."""
+    return Response(content=body, media_type="application/json", headers=headers)
+
+app = FastAPI(title="Shopify Insights API", default_response_class=CodecJSONResponse)
 
 init_db()
 
+@app.on_event("startup")
+async def startup():
+    jobs.start_workers()
+
+@app.on_event("shutdown")
+async def shutdown():
+    jobs.stop_workers()
+    await ingest.stop_background()
+    await http_client.aclose()
+    http_client.close()
+    await dispose_async_engine()
+
+def _route_path(request: Request) -> str:
+    route = request.scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Per-route latency metrics, plus a Server-Timing header (net / parse / extract / db / crawl)."""
+    started = time.perf_counter()
+    with metrics.request_timings() as timings:
+        try:
+            response = await call_next(request)
+        except Exception:
+            metrics.ERRORS.inc(where="api")
+            metrics.API_REQUESTS.inc(route=_route_path(request), status=500)
+            raise
+    elapsed = time.perf_counter() - started
+    path = _route_path(request)
+    metrics.API_REQUESTS.inc(route=path, status=response.status_code)
+    metrics.API_SECONDS.observe(elapsed, route=path)
+    stages = timings.header()
+    response.headers["Server-Timing"] = f"{stages}, total;dur={elapsed * 1000:.1f}" if stages else f"total;dur={elapsed * 1000:.1f}"
+    return response
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/fetch-insights")
-async def fetch_insights(website_url: str = Query(...)):
-    data = fetch_brand_insights(website_url)
-    if not data:
+async def fetch_insights(website_url: str = Query(...), refresh: bool = Query(False)):
+    """Cached insights (see insights_cache); refresh=true forces a live crawl."""
+    body, status = await insights_cache.get_insights_json(website_url, refresh=refresh)
+    if not body:
         raise HTTPException(status_code=404, detail="Could not fetch insights")
-    save_brand_data(data["brand_name"], data)
-    return data
+    return _json_bytes(body, {"X-Cache": status})
+
+@app.get("/fetch-insights/stream")
+async def fetch_insights_stream(website_url: str = Query(...), refresh: bool = Query(False)):
+    """Same insights as NDJSON events, one per section as soon as it is ready, then a summary (see insights_cache.stream_insights)."""
+    events = insights_cache.stream_insights(website_url, refresh=refresh)
+    return StreamingResponse((codec.dumps(e) + b"\n" async for e in events), media_type="application/x-ndjson")
 
 @app.get("/fetch-competitors")
 async def competitors(website_url: str = Query(...)):
-    data = fetch_competitors(website_url)
+    data = await fetch_competitors_async(website_url)
     if not data:
         raise HTTPException(status_code=404, detail="No competitor data")
-    return data
+    # encoded by codec directly: crawled catalogs may be Arrow tables, which FastAPI's encoder doesn't know
+    return CodecJSONResponse(data)
+
+@app.get("/products/stream")
+def products_stream(website_url: str = Query(...), prefetch: int = Query(PRODUCTS_PREFETCH, ge=0, le=8)):
+    """Full product catalog as NDJSON, one normalized product per line, sent as pages arrive."""
+    rows = (codec.dumps(p) + b"\n" for p in stream_products(website_url, prefetch=prefetch))
+    return StreamingResponse(rows, media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def create_crawl_job(req: CrawlJobRequest):
+    """Queue a crawl; poll /jobs/{job_id} for per-store progress."""
+    if req.kind not in jobs.JOB_KINDS:
+        raise HTTPException(status_code=422, detail=f"kind must be one of {jobs.JOB_KINDS}")
+    return await run_in_threadpool(jobs.enqueue, req.kind, req.website_url)
+
+@app.get("/jobs/{job_id}")
+async def crawl_job_status(job_id: int):
+    job = await run_in_threadpool(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+async def crawl_job_result(job_id: int):
+    job = await run_in_threadpool(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    body = await run_in_threadpool(get_job_result_json, job_id)
+    return _json_bytes(body if body is not None else b"null")
+
+@app.post("/ingest", status_code=202)
+async def start_ingest(req: IngestRequest):
+    """Bulk-crawl a list of stores in the background; poll /ingest/{run_id} for progress."""
+    if not req.domains:
+        raise HTTPException(status_code=422, detail="domains is empty")
+    run = await run_in_threadpool(create_ingest_run, req.domains, req.name)
+    ingest.start_background(run["run_id"])
+    return run
+
+@app.get("/ingest/{run_id}")
+async def ingest_status(run_id: int):
+    run = await run_in_threadpool(get_ingest_run, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+@app.post("/ingest/{run_id}/resume", status_code=202)
+async def resume_ingest(run_id: int, retry_failed: bool = Query(False)):
+    """Continue an interrupted run from its checkpoint (optionally retrying failed stores)."""
+    run = await run_in_threadpool(get_ingest_run, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if ingest.is_active(run_id) or not (ingest.resumable(run) or retry_failed and run["failed"]):
+        raise HTTPException(status_code=409, detail=f"Run is {run['status']}")
+    ingest.start_background(run_id, retry_failed=retry_failed)
+    return run
+
+def _page(page: dict) -> Response:
+    """A page of items as a JSON list; the cursor for the next one goes in X-Next-Cursor."""
+    headers = {"X-Next-Cursor": str(page["next_cursor"])} if page["next_cursor"] is not None else None
+    return _json_bytes(codec.dumps(page["items"]), headers)
+
+def _fields(fields: str | None) -> tuple:
+    if not fields:
+        return BRAND_FIELDS
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in BRAND_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"unknown fields {unknown}; choose from {list(BRAND_FIELDS)}")
+    return tuple(f for f in BRAND_FIELDS if f in wanted)
 
 @app.get("/brands")
-async def list_brands():
-    return get_all_brands()
+async def list_brands(limit: int = Query(100, ge=1, le=1000), cursor: int | None = Query(None, ge=0)):
+    """Stored brands by id, `limit` at a time; pass X-Next-Cursor back as `cursor` for the next page."""
+    return _page(await get_all_brands_async(limit, after=cursor or 0))
 
 @app.get("/brand/{brand_id}")
-async def brand_detail(brand_id: int):
-    data = get_brand_by_id(brand_id)
-    if not data:
+async def brand_detail(brand_id: int, fields: str | None = Query(None)):
+    """A stored brand; `fields` (comma-separated, e.g. policies,social_handles) limits what is loaded and sent."""
+    data = await get_brand_by_id_async(brand_id, _fields(fields))
+    if data is None:
+        raise HTTPException(status_code=404, detail="Brand not found")
+    return _json_bytes(codec.dumps(data))
+
+@app.get("/brand/{brand_id}/products")
+async def brand_products(brand_id: int, limit: int = Query(100, ge=1, le=1000), cursor: int | None = Query(None, ge=0)):
+    """A stored brand's products in catalog order, paginated like /brands."""
+    page = await get_brand_products_async(brand_id, limit, after=-1 if cursor is None else cursor)
+    if page is None:
         raise HTTPException(status_code=404, detail="Brand not found")
-    return data
+    return _page(page)
+
+# columnar exports: format -> (encoder, media type)
+EXPORT_FORMATS = {
+    "parquet": (catalog.to_parquet, "application/vnd.apache.parquet"),
+    "arrow": (catalog.to_arrow_file, "application/vnd.apache.arrow.file"),
+}
+
+@app.get("/brand/{brand_id}/products.{fmt}")
+async def brand_products_export(brand_id: int, fmt: str):
+    """A stored brand's whole catalog as Parquet or an Arrow IPC file (numeric price column)."""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=404, detail=f"format must be one of {list(EXPORT_FORMATS)}")
+    if not catalog.available():
+        raise HTTPException(status_code=501, detail="pyarrow is not installed on the server")
+    table = await get_brand_catalog_async(brand_id)
+    if table is None:
+        raise HTTPException(status_code=404, detail="Brand not found")
+    encode, media_type = EXPORT_FORMATS[fmt]
+    body = await run_in_threadpool(encode, table)
+    headers = {"Content-Disposition": f'attachment; filename="brand-{brand_id}-products.{fmt}"'}
+    return Response(content=body, media_type=media_type, headers=headers)
+
+@app.get("/search")
+async def search(q: str = Query(..., min_length=2), section: str | None = Query(None), limit: int = Query(20, ge=1, le=200)):
+    """Ranked full-text matches across stored brands; section = products | faqs | about | policies (comma-separated)."""
+    sections = SEARCH_SECTIONS if not section else tuple(s.strip() for s in section.split(",") if s.strip())
+    if not sections or any(s not in SEARCH_SECTIONS for s in sections):
+        raise HTTPException(status_code=422, detail=f"section must be among {list(SEARCH_SECTIONS)}")
+    return _json_bytes(codec.dumps(await search_async(q, sections, limit)))
+
+@app.get("/brand/{brand_id}/price-changes")
+async def brand_price_changes(brand_id: int, days: float = Query(30, gt=0, le=3650), kind: str = Query("price"),
+                              limit: int = Query(1000, ge=1, le=10000)):
+    """Catalog changes in the last `days`, newest first; kind = price | added | removed (comma-separated) | all."""
+    kinds = CHANGE_KINDS if kind == "all" else tuple(k.strip() for k in kind.split(",") if k.strip())
+    if not kinds or any(k not in CHANGE_KINDS for k in kinds):
+        raise HTTPException(status_code=422, detail=f"kind must be 'all' or among {list(CHANGE_KINDS)}")
+    since = datetime.utcnow() - timedelta(days=days)
+    changes = await get_product_changes_async(brand_id, since, kinds=kinds, limit=limit)
+    if changes is None:
+        raise HTTPException(status_code=404, detail="Brand not found")
+    return _json_bytes(codec.dumps(changes))
+
+@app.get("/analytics/prices")
+async def price_analytics(brand_ids: str | None = Query(None), limit: int = Query(50, ge=1, le=200)):
+    """
+    Price percentiles, catalog size, per-band price shares and pairwise catalog
+    overlap of stored brands (comma-separated `brand_ids`, else the first `limit`).
+    """
+    ids = None
+    if brand_ids:
+        try:
+            ids = sorted({int(b) for b in brand_ids.split(",") if b.strip()})
+        except ValueError:
+            raise HTTPException(status_code=422, detail="brand_ids must be comma-separated integers")
+        if len(ids) > limit:
+            raise HTTPException(status_code=422, detail=f"at most {limit} brand_ids")
+    rows = await get_brand_stats_async(ids, limit)
+    if ids is not None and len(rows) < len(ids):
+        missing = sorted(set(ids) - {r["brand_id"] for r in rows})
+        raise HTTPException(status_code=404, detail=f"No stored brand with id {missing}")
+    return _json_bytes(codec.dumps(await run_in_threadpool(analytics.compare, rows)))
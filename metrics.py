@@ -0,0 +1,213 @@
+import time
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Minimal in-process metrics registry rendered in the Prometheus text format
+# (GET /metrics). Values are per process: with several uvicorn workers, each
+# one reports its own counters.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_str(labels: tuple) -> str:
+    if not labels:
+        return ""
+    body = ",".join(
+        '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + body + "}"
+
+
+# ---------------- Metric types ----------------
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._values = {}   # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, row):
+                    out.append((f"{self.name}_bucket", key + (("le", bound),), count))
+                out.append((f"{self.name}_bucket", key + (("le", "+Inf"),), row[-1]))
+                out.append((f"{self.name}_sum", key, row[-2]))
+                out.append((f"{self.name}_count", key, row[-1]))
+        return out
+
+
+_registry = []
+
+
+def counter(name: str, help: str) -> Counter:
+    metric = Counter(name, help)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name: str, help: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    metric = Histogram(name, help, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_label_str(labels)} {value if isinstance(value, int) else repr(float(value))}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- Crawler metrics ----------------
+FETCHES = counter("shopify_fetch_total", "Outbound HTTP requests by client and status code (or 'error').")
+FETCH_BYTES = counter("shopify_fetch_bytes_total", "Response body bytes received (after content decoding).")
+RETRIES = counter("shopify_fetch_retries_total", "Outbound requests retried, by status code or 'error'.")
+CIRCUIT_OPENED = counter("shopify_circuit_open_total", "Times a host's circuit breaker opened.")
+FINGERPRINTS = counter("shopify_fingerprint_total", "Competitor candidates classified, by verdict and source (name/cache/db/probe).")
+FETCH_SECONDS = histogram("shopify_fetch_seconds", "Outbound request time, connect to full body.")
+PARSE_SECONDS = histogram("shopify_parse_seconds", "Time spent parsing HTML trees and products.json pages.")
+EXTRACT_SECONDS = histogram("shopify_extract_seconds", "Wall time of each extract_* call (includes its fetches and parsing).")
+CRAWL_SECONDS = histogram("shopify_crawl_seconds", "Wall time of a full single-store crawl.", DEFAULT_BUCKETS + (60, 120))
+DB_SECONDS = histogram("shopify_db_seconds", "Latency of db.py operations.")
+ERRORS = counter("shopify_errors_total", "Exceptions caught or raised, by where they happened.")
+API_REQUESTS = counter("shopify_api_requests_total", "API requests served, by route and status code.")
+API_SECONDS = histogram("shopify_api_request_seconds", "API request latency by route.", DEFAULT_BUCKETS + (60, 120))
+
+
+# ---------------- Per-request timings (Server-Timing) ----------------
+class Timings:
+    """Seconds spent per stage while serving one API request, summed across threads and tasks."""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self._totals[stage] = self._totals.get(stage, 0.0) + seconds
+
+    def header(self) -> str:
+        with self._lock:
+            return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self._totals.items())
+
+
+_timings = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def request_timings():
+    """Collect stage timings for the enclosed request (threads must run in a copied context)."""
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def add_timing(stage: str, seconds: float):
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+# ---------------- Helpers ----------------
+_STAGES = {FETCH_SECONDS: "net", PARSE_SECONDS: "parse", EXTRACT_SECONDS: "extract", DB_SECONDS: "db",
+           CRAWL_SECONDS: "crawl"}
+
+
+@contextmanager
+def timer(hist: Histogram, **labels):
+    """Observe the enclosed block's duration and add it to the request's Server-Timing stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        hist.observe(elapsed, **labels)
+        add_timing(_STAGES.get(hist, hist.name), elapsed)
+
+
+def timed(hist: Histogram, **labels):
+    """Decorator form of timer(); works for plain and async functions. Exceptions are counted in ERRORS."""
+    def decorate(fn):
+        where = labels.get("op") or labels.get("section") or fn.__name__
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timer(hist, **labels):
+                    try:
+                        return await fn(*args, **kwargs)
+                    except Exception:
+                        ERRORS.inc(where=where)
+                        raise
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(hist, **labels):
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    ERRORS.inc(where=where)
+                    raise
+        return wrapper
+
+    return decorate
+
+
+def record_fetch(client: str, resp=None, error: Exception | None = None, elapsed: float = 0.0):
+    """Count one outbound request (status, bytes, time)."""
+    if error is not None:
+        FETCHES.inc(client=client, status="error")
+        ERRORS.inc(where=f"fetch:{type(error).__name__}")
+    else:
+        FETCHES.inc(client=client, status=resp.status_code)
+        FETCH_BYTES.inc(len(resp.content), client=client)
+    FETCH_SECONDS.observe(elapsed, client=client)
+    add_timing("net", elapsed)
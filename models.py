@@ -30,3 +30,11 @@ class BrandInsights(BaseModel):
     contact_details: ContactDetails
     about: Optional[str]
     important_links: List[str]
+
+class CrawlJobRequest(BaseModel):
+    website_url: str
+    kind: str = "competitors"   # "insights" | "competitors"
+
+class IngestRequest(BaseModel):
+    domains: List[str]
+    name: Optional[str] = None
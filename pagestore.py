@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+# ---------------- URL keys ----------------
+def normalize_key(url: str) -> str:
+    """
+    Canonical cache key for a URL: lower-case scheme/host, no default port,
+    no fragment, no trailing slash, sorted query string.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+# ---------------- Page store ----------------
+class PageStore:
+    """
+    Per-crawl document store: every URL is fetched and parsed once, and every
+    extractor reads the same tree. Misses (404, errors) are remembered too, so
+    a failed probe is not repeated within the crawl. Concurrent requests for
+    the same URL (threads or asyncio tasks) share a single fetch. A
+    `namespace` keeps other per-URL outcomes (e.g. revalidation checks) apart
+    from the pages themselves.
+    """
+
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._tasks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_fetch(self, url: str, fetch, namespace: str = ""):
+        key = namespace + normalize_key(url)
+        with self._lock:
+            if key in self._pages:
+                self.hits += 1
+                return self._pages[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._pages:
+                    self.hits += 1
+                    return self._pages[key]
+                self.misses += 1
+            page = fetch(url)
+            with self._lock:
+                self._pages[key] = page
+            return page
+
+    async def get_or_fetch_async(self, url: str, fetch, namespace: str = ""):
+        key = namespace + normalize_key(url)
+        with self._lock:
+            if key in self._pages:
+                self.hits += 1
+                return self._pages[key]
+            task = self._tasks.get(key)
+            if task is None:
+                self.misses += 1
+                task = asyncio.create_task(fetch(url))
+                task.add_done_callback(lambda t, key=key: self._finish(key, t))
+                self._tasks[key] = task
+            else:
+                self.hits += 1
+        # shield: one caller being cancelled must not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task):
+        with self._lock:
+            self._tasks.pop(key, None)
+            if not task.cancelled() and task.exception() is None:
+                self._pages[key] = task.result()
+
+    def put(self, url: str, page):
+        """Seed the store with a page fetched elsewhere (e.g. a revalidation)."""
+        with self._lock:
+            self._pages[normalize_key(url)] = page
+
+    def cancel_pending(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+    def stats(self) -> dict:
+        pages = sum(1 for key in self._pages if "://" in key[:8])
+        return {"hits": self.hits, "misses": self.misses, "pages": pages}
+
+
+# ---------------- Crawl scope ----------------
+_current_store = ContextVar("page_store", default=None)
+
+
+def current_store():
+    return _current_store.get()
+
+
+@contextmanager
+def crawl_scope():
+    """
+    Make a PageStore active for the enclosed crawl. Nested scopes reuse the
+    outer store, so e.g. competitor discovery and the base store's crawl share
+    the homepage.
+    """
+    store = _current_store.get()
+    if store is not None:
+        yield store
+        return
+    store = PageStore()
+    token = _current_store.set(store)
+    try:
+        yield store
+    finally:
+        _current_store.reset(token)
+        store.cancel_pending()
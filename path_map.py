@@ -0,0 +1,246 @@
+import os
+import re
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, urljoin
+
+import http_client
+from db import get_store_paths, save_store_paths
+
+# ---------- Settings ----------
+PATH_MAP_OK_TTL = timedelta(hours=float(os.getenv("PATH_MAP_OK_TTL_HOURS", "168")))
+PATH_MAP_MISS_TTL = timedelta(hours=float(os.getenv("PATH_MAP_MISS_TTL_HOURS", "24")))
+PATH_MAP_USE_SITEMAP = os.getenv("PATH_MAP_USE_SITEMAP", "1") == "1"
+
+# page handles in sitemap.xml that answer a section
+SITEMAP_KEYWORDS = {
+    "about": ("about", "our-story", "story"),
+    "faq": ("faq",),
+    "contact": ("contact",),
+}
+SITEMAP_MARKER = "sitemap.xml"
+
+_LOC_RE = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.I)
+
+# domain -> {path: {"path", "section", "ok", "checked_at"}}; held while a crawl of the store runs
+_maps = {}
+_dirty = {}
+_loaded = set()
+# domain -> crawls between prepare() and flush(); the map is dropped when the last one flushes
+_crawls = {}
+_lock = threading.Lock()
+
+
+def _root(url: str) -> str:
+    if not url.startswith(("http://", "https://")):
+        url = "http://" + url
+    return url
+
+
+def _domain(url: str) -> str:
+    return urlsplit(_root(url)).netloc.lower()
+
+
+def _key(path: str) -> str:
+    return path.strip("/")
+
+
+def _fresh(entry: dict, now: datetime) -> bool:
+    ttl = PATH_MAP_OK_TTL if entry["ok"] else PATH_MAP_MISS_TTL
+    return now - entry["checked_at"] < ttl
+
+
+def _remember(domain: str, path: str, ok: bool, section: str | None = None):
+    entry = {"path": _key(path), "section": section, "ok": ok, "checked_at": datetime.utcnow()}
+    with _lock:
+        old = _maps.setdefault(domain, {}).get(entry["path"])
+        if old and old.get("section") and not section:
+            entry["section"] = old["section"]
+        _maps[domain][entry["path"]] = entry
+        _dirty.setdefault(domain, {})[entry["path"]] = entry
+
+
+# ---------------- Recording ----------------
+def record(url: str, status_code: int):
+    """Called for every fetched page: 200 marks the path good, 404/410 a miss."""
+    if status_code == 200:
+        ok = True
+    elif status_code in (404, 410):
+        ok = False
+    else:
+        return
+    _remember(_domain(url), urlsplit(url).path, ok)
+
+
+def mark(url: str, section: str):
+    """The page at `url` is the one a section (about, faq, a policy kind) was extracted from."""
+    _remember(_domain(url), urlsplit(url).path, True, section=section)
+
+
+# ---------------- Candidate selection ----------------
+def candidate_tiers(base_url: str, section: str, defaults: list) -> list:
+    """
+    Probe order for a section as [known_good, unknown]: fresh known-good
+    paths (including sitemap hits) first, then the default guesses that are
+    neither known-good nor a fresh miss. Known misses are skipped until their
+    TTL runs out.
+    """
+    domain = _domain(base_url)
+    now = datetime.utcnow()
+    with _lock:
+        entries = dict(_maps.get(domain, {}))
+    default_keys = [_key(p) for p in defaults]
+
+    good, unknown = [], []
+    for path in default_keys:
+        entry = entries.get(path)
+        if entry and _fresh(entry, now):
+            if entry["ok"]:
+                good.append(path)
+            continue
+        unknown.append(path)
+    for path, entry in entries.items():
+        if entry.get("section") == section and entry["ok"] and _fresh(entry, now) and path not in good:
+            good.append(path)
+    return [tier for tier in (good, unknown) if tier]
+
+
+def candidates(base_url: str, section: str, defaults: list) -> list:
+    return [path for tier in candidate_tiers(base_url, section, defaults) for path in tier]
+
+
+def is_known_miss(base_url: str, path: str) -> bool:
+    with _lock:
+        entry = _maps.get(_domain(base_url), {}).get(_key(path))
+    return bool(entry) and not entry["ok"] and _fresh(entry, datetime.utcnow())
+
+
+# ---------------- Sitemap discovery ----------------
+def _sitemap_due(domain: str) -> bool:
+    if not PATH_MAP_USE_SITEMAP:
+        return False
+    with _lock:
+        entry = _maps.get(domain, {}).get(SITEMAP_MARKER)
+    return not entry or not _fresh(entry, datetime.utcnow())
+
+
+def _pages_sitemap(xml: str) -> str | None:
+    """Shopify's sitemap.xml is an index; its pages live in sitemap_pages_*.xml."""
+    for loc in _LOC_RE.findall(xml):
+        if "sitemap_pages" in loc:
+            return loc.replace("&amp;", "&")
+    return None
+
+
+def _apply_sitemap(domain: str, xml: str):
+    for loc in _LOC_RE.findall(xml):
+        path = _key(urlsplit(loc).path)
+        if not path.startswith("pages/"):
+            continue
+        handle = path[len("pages/"):].lower()
+        for section, words in SITEMAP_KEYWORDS.items():
+            if any(w in handle for w in words):
+                _remember(domain, path, True, section=section)
+                break
+
+
+def discover_from_sitemap(base_url: str):
+    domain = _domain(base_url)
+    try:
+        resp = http_client.get(urljoin(_root(base_url), "/" + SITEMAP_MARKER))
+        _remember(domain, SITEMAP_MARKER, resp.status_code == 200)
+        if resp.status_code != 200:
+            return
+        xml = resp.text
+        child = _pages_sitemap(xml)
+        if child:
+            resp = http_client.get(child)
+            if resp.status_code != 200:
+                return
+            xml = resp.text
+        _apply_sitemap(domain, xml)
+    except Exception as e:
+        print(f"[sitemap] {domain} -> {e}")
+
+
+async def discover_from_sitemap_async(base_url: str):
+    domain = _domain(base_url)
+    try:
+        resp = await http_client.aget(urljoin(_root(base_url), "/" + SITEMAP_MARKER))
+        _remember(domain, SITEMAP_MARKER, resp.status_code == 200)
+        if resp.status_code != 200:
+            return
+        xml = resp.text
+        child = _pages_sitemap(xml)
+        if child:
+            resp = await http_client.aget(child)
+            if resp.status_code != 200:
+                return
+            xml = resp.text
+        _apply_sitemap(domain, xml)
+    except Exception as e:
+        print(f"[sitemap] {domain} -> {e}")
+
+
+# ---------------- Load / flush ----------------
+def _load(domain: str):
+    with _lock:
+        if domain in _loaded:
+            return
+    try:
+        rows = get_store_paths(domain)
+    except Exception as e:
+        print(f"[path_map] load {domain} -> {e}")
+        rows = []
+    with _lock:
+        current = _maps.setdefault(domain, {})
+        for row in rows:
+            # anything recorded in this process is newer than the DB copy
+            current.setdefault(row["path"], row)
+        _loaded.add(domain)
+
+
+def _begin(domain: str):
+    with _lock:
+        _crawls[domain] = _crawls.get(domain, 0) + 1
+
+
+def prepare(base_url: str):
+    """Load the store's map and, when due, seed it from sitemap.xml. Call before a crawl; flush() after it."""
+    domain = _domain(base_url)
+    _begin(domain)
+    _load(domain)
+    if _sitemap_due(domain):
+        discover_from_sitemap(base_url)
+
+
+async def prepare_async(base_url: str):
+    domain = _domain(base_url)
+    _begin(domain)
+    await asyncio.to_thread(_load, domain)
+    if _sitemap_due(domain):
+        await discover_from_sitemap_async(base_url)
+
+
+def flush(base_url: str):
+    """
+    Persist what this process learned about the store. Its in-memory map is
+    dropped once no other crawl of the store is running (prepare reloads it),
+    so an overlapping crawl keeps its known misses.
+    """
+    domain = _domain(base_url)
+    with _lock:
+        entries = list(_dirty.pop(domain, {}).values())
+    if entries:
+        try:
+            save_store_paths(domain, entries)
+        except Exception as e:
+            print(f"[path_map] flush {domain} -> {e}")
+    with _lock:
+        running = _crawls.pop(domain, 0) - 1
+        if running > 0:
+            _crawls[domain] = running
+        else:
+            _maps.pop(domain, None)
+            _loaded.discard(domain)
@@ -1,6 +1,34 @@
-import requests
-from bs4 import BeautifulSoup
+import os
+import asyncio
+import catalog
+import codec
+import http_client
+import metrics
+import path_map
+import validators
+from htmlscan import make_soup, scan_page
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from urllib.parse import urljoin
+from pagestore import current_store
+
+
+# ---------------- Probe paths ----------------
+ABOUT_PATHS = ["pages/about", "about", "pages/our-story"]
+FAQ_PATHS = ["pages/faq", "faq", "pages/faqs"]
+CONTACT_PATH = "pages/contact"
+POLICY_PATHS = {
+    "privacy_policy": "policies/privacy-policy",
+    "refund_policy": "policies/refund-policy",
+    "shipping_policy": "policies/shipping-policy",
+    "terms_of_service": "policies/terms-of-service",
+}
+
+# ---------------- products.json paging ----------------
+PRODUCTS_PAGE_SIZE = 250                                             # Shopify's max per page
+PRODUCTS_PREFETCH = int(os.getenv("PRODUCTS_PREFETCH", "2"))         # pages fetched ahead
+PRODUCTS_MAX_PAGES = int(os.getenv("PRODUCTS_MAX_PAGES", "400"))     # safety stop (100k products)
 
 
 # ---------------- Helpers ----------------
@@ -8,7 +36,10 @@ def clean_html(raw_html: str) -> str:
     """Remove HTML tags and return plain text"""
     if not raw_html:
         return ""
-    return BeautifulSoup(raw_html, "html.parser").get_text(" ", strip=True)
+    if "<" not in raw_html and "&" not in raw_html:
+        # already plain text (get_text() output, JSON titles): nothing to parse
+        return raw_html.strip()
+    return make_soup(raw_html).get_text(" ", strip=True)
 
 
 def _normalize_url(base_url: str) -> str:
@@ -24,58 +55,211 @@ def _abs(base_url: str, href: str | None) -> str:
 
 
 # ---------------- Networking ----------------
+def _fetch_and_parse(full_url: str):
+    try:
+        resp = http_client.get(full_url)
+        path_map.record(full_url, resp.status_code)
+        validators.remember(full_url, resp)
+        if resp.status_code == 200:
+            return make_soup(resp.text)
+        return None
+    except Exception as e:
+        print(f"[fetch_page] {full_url} -> {e}")
+        return None
+
+
 def fetch_page(base_url: str, path: str = ""):
+    """Fetch and parse a page, through the active crawl's PageStore if any."""
+    base_url = _normalize_url(base_url)
+    full_url = urljoin(base_url, path)
+    store = current_store()
+    page = _fetch_and_parse(full_url) if store is None else store.get_or_fetch(full_url, _fetch_and_parse)
+    # noted once the response was read (and its validators remembered)
+    validators.note_source(full_url)
+    return page
+
+
+# ---------------- Async networking ----------------
+async def _fetch_and_parse_async(full_url: str):
     try:
-        base_url = _normalize_url(base_url)
-        full_url = urljoin(base_url, path)
-        resp = requests.get(full_url, timeout=12)
+        resp = await http_client.aget(full_url)
+        path_map.record(full_url, resp.status_code)
+        validators.remember(full_url, resp)
         if resp.status_code == 200:
-            return BeautifulSoup(resp.text, "html.parser")
+            # parsing is CPU-bound, keep it off the event loop
+            return await asyncio.to_thread(make_soup, resp.text)
         return None
     except Exception as e:
-        print(f"[fetch_page] {path} -> {e}")
+        print(f"[fetch_page_async] {full_url} -> {e}")
         return None
 
 
+async def fetch_page_async(base_url: str, path: str = ""):
+    base_url = _normalize_url(base_url)
+    full_url = urljoin(base_url, path)
+    store = current_store()
+    if store is None:
+        page = await _fetch_and_parse_async(full_url)
+    else:
+        page = await store.get_or_fetch_async(full_url, _fetch_and_parse_async)
+    validators.note_source(full_url)
+    return page
+
+
+# ---------------- Revalidation ----------------
+def _is_page(url: str) -> bool:
+    return "products.json" not in url
+
+
+def revalidate(url: str) -> bool:
+    """
+    Conditional GET against the validators of the last crawl. True when the
+    URL is unchanged (304, or same status and body hash). A changed HTML page
+    is parsed into the active PageStore so its extractor doesn't download it
+    again; the outcome is memoized there so shared pages are checked once.
+    """
+    store = current_store()
+    if store is None:
+        return _revalidate(url)
+    return store.get_or_fetch(url, _revalidate, namespace="revalidate:")
+
+
+async def revalidate_async(url: str) -> bool:
+    store = current_store()
+    if store is None:
+        return await _revalidate_async(url)
+    return await store.get_or_fetch_async(url, _revalidate_async, namespace="revalidate:")
+
+
+def _revalidate(url: str) -> bool:
+    headers = validators.conditional_headers(url)
+    if headers is None:
+        return False
+    try:
+        resp = http_client.get(url, headers=headers)
+    except Exception as e:
+        print(f"[revalidate] {url} -> {e}")
+        return False
+    same = validators.unchanged(url, resp)
+    validators.remember(url, resp)
+    path_map.record(url, 200 if resp.status_code == 304 else resp.status_code)
+    store = current_store()
+    if not same and store is not None and _is_page(url):
+        store.put(url, make_soup(resp.text) if resp.status_code == 200 else None)
+    return same
+
+
+async def _revalidate_async(url: str) -> bool:
+    headers = validators.conditional_headers(url)
+    if headers is None:
+        return False
+    try:
+        resp = await http_client.aget(url, headers=headers)
+    except Exception as e:
+        print(f"[revalidate] {url} -> {e}")
+        return False
+    same = validators.unchanged(url, resp)
+    validators.remember(url, resp)
+    path_map.record(url, 200 if resp.status_code == 304 else resp.status_code)
+    store = current_store()
+    if not same and store is not None and _is_page(url):
+        page = await asyncio.to_thread(make_soup, resp.text) if resp.status_code == 200 else None
+        store.put(url, page)
+    return same
+
+
+async def _probe_async(base_url: str, tiers: list, parse, section: str):
+    """
+    Fetch every candidate path of a tier at once, but keep the sequential
+    priority: the first path (in list order) whose parsed result is non-empty
+    wins and is marked as the section's page. Lower-priority fetches still in
+    flight are cancelled. The next tier (see path_map.candidate_tiers) is only
+    tried when a whole tier misses.
+    """
+    for paths in tiers:
+        tasks = [asyncio.create_task(fetch_page_async(base_url, p)) for p in paths]
+        try:
+            for path, task in zip(paths, tasks):
+                soup = await task
+                if soup:
+                    out = parse(soup)
+                    if out:
+                        path_map.mark(urljoin(base_url, path), section)
+                        return out
+        finally:
+            for task in tasks:
+                task.cancel()
+    return None
+
+
 # ---------------- About ----------------
+def _parse_about(soup) -> str:
+    paras = [clean_html(p.get_text(strip=True)) for p in scan_page(soup).paragraphs]
+    return " ".join([p for p in paras if p])
+
+
+@metrics.timed(metrics.EXTRACT_SECONDS, section="about", mode="sync")
 def extract_about(base_url: str):
     base_url = _normalize_url(base_url)
-    for path in ["pages/about", "about", "pages/our-story"]:
+    for path in path_map.candidates(base_url, "about", ABOUT_PATHS):
         soup = fetch_page(base_url, path)
         if soup:
-            paras = [clean_html(p.get_text(strip=True)) for p in soup.find_all("p")]
-            txt = " ".join([p for p in paras if p])
+            txt = _parse_about(soup)
             if txt:
+                path_map.mark(urljoin(base_url, path), "about")
                 return txt
     return "No about info found"
 
 
+@metrics.timed(metrics.EXTRACT_SECONDS, section="about", mode="async")
+async def extract_about_async(base_url: str):
+    base_url = _normalize_url(base_url)
+    tiers = path_map.candidate_tiers(base_url, "about", ABOUT_PATHS)
+    txt = await _probe_async(base_url, tiers, _parse_about, "about")
+    return txt or "No about info found"
+
+
 # ---------------- Policies ----------------
+def _parse_policy(soup) -> str:
+    txt = " ".join(
+        [clean_html(p.get_text(strip=True)) for p in scan_page(soup).paragraphs]
+    )
+    return (txt[:300] + "...") if txt else "Not available"
+
+
+@metrics.timed(metrics.EXTRACT_SECONDS, section="policies", mode="sync")
 def extract_policies(base_url: str):
     base_url = _normalize_url(base_url)
     out = {}
-    policy_paths = {
-        "privacy_policy": "policies/privacy-policy",
-        "refund_policy": "policies/refund-policy",
-        "shipping_policy": "policies/shipping-policy",
-        "terms_of_service": "policies/terms-of-service",
-    }
-    for key, path in policy_paths.items():
-        soup = fetch_page(base_url, path)
+    for key, path in POLICY_PATHS.items():
+        soup = None if path_map.is_known_miss(base_url, path) else fetch_page(base_url, path)
+        out[key] = _parse_policy(soup) if soup else "Not available"
         if soup:
-            txt = " ".join(
-                [clean_html(p.get_text(strip=True)) for p in soup.find_all("p")]
-            )
-            out[key] = (txt[:300] + "...") if txt else "Not available"
-        else:
-            out[key] = "Not available"
+            path_map.mark(urljoin(base_url, path), key)
     return out
 
 
-# ---------------- Contact ----------------
-def extract_contact(base_url: str):
+@metrics.timed(metrics.EXTRACT_SECONDS, section="policies", mode="async")
+async def extract_policies_async(base_url: str):
     base_url = _normalize_url(base_url)
-    soup = fetch_page(base_url, "pages/contact")
+
+    async def fetch(path):
+        if path_map.is_known_miss(base_url, path):
+            return None
+        return await fetch_page_async(base_url, path)
+
+    soups = await asyncio.gather(*(fetch(path) for path in POLICY_PATHS.values()))
+    for (key, path), soup in zip(POLICY_PATHS.items(), soups):
+        if soup:
+            path_map.mark(urljoin(base_url, path), key)
+    return {
+        key: _parse_policy(soup) if soup else "Not available"
+        for key, soup in zip(POLICY_PATHS, soups)
+    }
+
+
+# ---------------- Contact ----------------
+def _parse_contact(soup) -> dict:
     details = {"emails": [], "phone_numbers": [], "address": ""}
     if soup:
         text = soup.get_text(" ", strip=True)
@@ -86,13 +270,29 @@ def extract_contact(base_url: str):
     return details
 
 
-# ---------------- Socials ----------------
-def extract_socials(base_url: str):
+@metrics.timed(metrics.EXTRACT_SECONDS, section="contact_details", mode="sync")
+def extract_contact(base_url: str):
     base_url = _normalize_url(base_url)
-    soup = fetch_page(base_url)
+    for path in path_map.candidates(base_url, "contact", [CONTACT_PATH]):
+        soup = fetch_page(base_url, path)
+        if soup:
+            path_map.mark(urljoin(base_url, path), "contact")
+            return _parse_contact(soup)
+    return _parse_contact(None)
+
+
+@metrics.timed(metrics.EXTRACT_SECONDS, section="contact_details", mode="async")
+async def extract_contact_async(base_url: str):
+    base_url = _normalize_url(base_url)
+    tiers = path_map.candidate_tiers(base_url, "contact", [CONTACT_PATH])
+    return await _probe_async(base_url, tiers, _parse_contact, "contact") or _parse_contact(None)
+
+
+# ---------------- Socials ----------------
+def _parse_socials(soup) -> dict:
     socials = {"facebook": "", "instagram": "", "twitter": "", "youtube": "", "tiktok": ""}
     if soup:
-        for a in soup.find_all("a", href=True):
+        for a in scan_page(soup).anchors:
             href = a["href"]
             h = href.lower()
             if "facebook.com" in h and not socials["facebook"]:
@@ -108,81 +308,272 @@ def extract_socials(base_url: str):
     return socials
 
 
+@metrics.timed(metrics.EXTRACT_SECONDS, section="social_handles", mode="sync")
+def extract_socials(base_url: str):
+    base_url = _normalize_url(base_url)
+    return _parse_socials(fetch_page(base_url))
+
+
+@metrics.timed(metrics.EXTRACT_SECONDS, section="social_handles", mode="async")
+async def extract_socials_async(base_url: str):
+    base_url = _normalize_url(base_url)
+    return _parse_socials(await fetch_page_async(base_url))
+
+
 # ---------------- FAQs ----------------
+def _parse_faqs(soup) -> list:
+    faqs = []
+    questions = scan_page(soup).faq_headings
+    answers = []
+    for q in questions:
+        nxt = q.find_next_sibling()
+        if nxt:
+            answers.append(clean_html(nxt.get_text(" ", strip=True)))
+    for i, q in enumerate(questions):
+        qq = clean_html(q.get_text(" ", strip=True))
+        aa = answers[i] if i < len(answers) else ""
+        if qq:
+            faqs.append({"question": qq, "answer": aa})
+    return faqs
+
+
+@metrics.timed(metrics.EXTRACT_SECONDS, section="faqs", mode="sync")
 def extract_faqs(base_url: str):
     base_url = _normalize_url(base_url)
-    faqs = []
-    for path in ["pages/faq", "faq", "pages/faqs"]:
+    for path in path_map.candidates(base_url, "faq", FAQ_PATHS):
         soup = fetch_page(base_url, path)
         if not soup:
             continue
-        questions = soup.find_all(["h2", "h3", "strong", "dt"])
-        answers = []
-        for q in questions:
-            nxt = q.find_next_sibling()
-            if nxt:
-                answers.append(clean_html(nxt.get_text(" ", strip=True)))
-        for i, q in enumerate(questions):
-            qq = clean_html(q.get_text(" ", strip=True))
-            aa = answers[i] if i < len(answers) else ""
-            if qq:
-                faqs.append({"question": qq, "answer": aa})
+        faqs = _parse_faqs(soup)
         if faqs:
-            break
-    return faqs
+            path_map.mark(urljoin(base_url, path), "faq")
+            return faqs
+    return []
 
 
-# ---------------- Products via Shopify JSON ----------------
-def _fetch_products_json(base_url: str):
+@metrics.timed(metrics.EXTRACT_SECONDS, section="faqs", mode="async")
+async def extract_faqs_async(base_url: str):
     base_url = _normalize_url(base_url)
+    tiers = path_map.candidate_tiers(base_url, "faq", FAQ_PATHS)
+    return await _probe_async(base_url, tiers, _parse_faqs, "faq") or []
+
+
+# ---------------- Products via Shopify JSON ----------------
+def _product_fields(p: dict, base_url: str) -> tuple:
+    """(title, product_url, image_url, lowest variant price as a float or None) of a raw product."""
+    title = clean_html(p.get("title") or "")
+    handle = p.get("handle") or ""
+    product_url = _abs(base_url, f"/products/{handle}") if handle else ""
+    image_url = ""
+    if p.get("images"):
+        image_url = p["images"][0].get("src") or ""
+        image_url = _abs(base_url, image_url) if image_url else ""
+    price = None
+    if p.get("variants"):
+        try:
+            prices = [float(v.get("price") or 0) for v in p["variants"] if v.get("price")]
+            if prices:
+                price = min(prices)
+        except Exception:
+            pass
+    return title, product_url, image_url, price
+
+
+def _normalize_product(p: dict, base_url: str) -> dict:
+    title, product_url, image_url, price = _product_fields(p, base_url)
+    return {
+        "title": title,
+        "product_url": product_url,
+        "image_url": image_url,
+        "price": f"{price:.2f}" if price is not None else ""
+    }
+
+
+class CatalogTruncated(Exception):
+    """A products.json page after the first could not be read: the catalog walk stopped early."""
+
+
+def _products_page_url(base_url: str, page: int) -> str:
+    return urljoin(base_url, f"products.json?limit={PRODUCTS_PAGE_SIZE}&page={page}")
+
+
+def _fetch_products_page(base_url: str, page: int):
+    """Raw product dicts of one products.json page, or None if the page could not be read."""
     try:
-        url = urljoin(base_url, "products.json")
-        resp = requests.get(url, params={"limit": 250}, timeout=15)
+        url = _products_page_url(base_url, page)
+        resp = http_client.get(url, timeout=15)
+        validators.remember(url, resp)
         if resp.status_code != 200:
-            return []
-        js = resp.json()
-        items = js.get("products", [])
-        out = []
-        for p in items:
-            title = clean_html(p.get("title") or "")
-            handle = p.get("handle") or ""
-            product_url = _abs(base_url, f"/products/{handle}") if handle else ""
-            image_url = ""
-            if p.get("images"):
-                image_url = p["images"][0].get("src") or ""
-                image_url = _abs(base_url, image_url) if image_url else ""
-            price = ""
-            if p.get("variants"):
-                try:
-                    prices = [float(v.get("price") or 0) for v in p["variants"] if v.get("price")]
-                    if prices:
-                        price = f"{min(prices):.2f}"
-                except Exception:
-                    pass
-            out.append({
-                "title": title,
-                "product_url": product_url,
-                "image_url": image_url,
-                "price": price
-            })
-        return out
+            return None
+        with metrics.timer(metrics.PARSE_SECONDS, kind="json"):
+            return codec.loads(resp.content).get("products", [])
+    except Exception as e:
+        print(f"[products.json] page {page} -> {e}")
+        return None
+
+
+async def _fetch_products_page_async(base_url: str, page: int):
+    try:
+        url = _products_page_url(base_url, page)
+        resp = await http_client.aget(url, timeout=15)
+        validators.remember(url, resp)
+        if resp.status_code != 200:
+            return None
+        with metrics.timer(metrics.PARSE_SECONDS, kind="json"):
+            return codec.loads(resp.content).get("products", [])
     except Exception as e:
-        print(f"[products.json] {e}")
+        print(f"[products.json] page {page} -> {e}")
+        return None
+
+
+def iter_product_pages(base_url: str, prefetch: int = PRODUCTS_PREFETCH):
+    """
+    Yield the raw product lists of products.json?page=N until the catalog is
+    exhausted (empty or short page). With prefetch > 0, up to that many of the
+    following pages are downloaded in the background while the current page
+    is consumed; only those pages are ever held in memory. A failed first page
+    just ends the walk (no products.json); a later one raises CatalogTruncated.
+    """
+    base_url = _normalize_url(base_url)
+    if prefetch <= 0:
+        for page in range(1, PRODUCTS_MAX_PAGES + 1):
+            items = _fetch_products_page(base_url, page)
+            validators.note_source(_products_page_url(base_url, page))
+            if items is None and page > 1:
+                raise CatalogTruncated(f"page {page} failed")
+            if not items:
+                return
+            yield items
+            if len(items) < PRODUCTS_PAGE_SIZE:
+                return
+        return
+
+    pool = ThreadPoolExecutor(max_workers=prefetch)
+    pending = deque()
+    next_page = 1
+    try:
+        while next_page <= min(prefetch, PRODUCTS_MAX_PAGES):
+            pending.append((next_page, pool.submit(copy_context().run, _fetch_products_page, base_url, next_page)))
+            next_page += 1
+        while pending:
+            page, future = pending.popleft()
+            items = future.result()
+            # only pages that were read are sources; prefetches cancelled below never got validators
+            validators.note_source(_products_page_url(base_url, page))
+            if items is None and page > 1:
+                raise CatalogTruncated(f"page {page} failed")
+            if not items:
+                return
+            if next_page <= PRODUCTS_MAX_PAGES:
+                pending.append((next_page, pool.submit(copy_context().run, _fetch_products_page, base_url, next_page)))
+                next_page += 1
+            yield items
+            if len(items) < PRODUCTS_PAGE_SIZE:
+                return
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def aiter_product_pages(base_url: str, prefetch: int = PRODUCTS_PREFETCH):
+    """Async generator counterpart of iter_product_pages (prefetch = extra pages kept in flight)."""
+    base_url = _normalize_url(base_url)
+    window = max(1, prefetch)
+    pending = deque()
+    next_page = 1
+    try:
+        while next_page <= min(window, PRODUCTS_MAX_PAGES):
+            pending.append((next_page, asyncio.create_task(_fetch_products_page_async(base_url, next_page))))
+            next_page += 1
+        while pending:
+            page, task = pending.popleft()
+            items = await task
+            validators.note_source(_products_page_url(base_url, page))
+            if items is None and page > 1:
+                raise CatalogTruncated(f"page {page} failed")
+            if not items:
+                return
+            if next_page <= PRODUCTS_MAX_PAGES:
+                pending.append((next_page, asyncio.create_task(_fetch_products_page_async(base_url, next_page))))
+                next_page += 1
+            yield items
+            if len(items) < PRODUCTS_PAGE_SIZE:
+                return
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+def iter_products(base_url: str, prefetch: int = PRODUCTS_PREFETCH):
+    """Normalized products of the whole products.json catalog, page by page."""
+    base_url = _normalize_url(base_url)
+    for items in iter_product_pages(base_url, prefetch):
+        for p in items:
+            yield _normalize_product(p, base_url)
+
+
+async def aiter_products(base_url: str, prefetch: int = PRODUCTS_PREFETCH):
+    base_url = _normalize_url(base_url)
+    async for items in aiter_product_pages(base_url, prefetch):
+        for p in items:
+            yield _normalize_product(p, base_url)
+
+
+# ---------------- Whole catalog ----------------
+def _add_page(collected: list, items: list, base_url: str, builder):
+    """One products.json page: a record batch when building a columnar catalog, else product dicts."""
+    if builder is None:
+        collected.extend(_normalize_product(p, base_url) for p in items)
+        return
+    for p in items:
+        builder.add(*_product_fields(p, base_url))
+    collected.append(builder.batch())
+
+
+def _finish_catalog(collected: list, builder, complete: bool = True):
+    if not collected:
         return []
+    products = collected if builder is None else catalog.table(collected)
+    return products if complete else catalog.incomplete(products)
 
 
-# ---------------- Products via HTML ----------------
-def _fetch_products_html(base_url: str):
+def _fetch_products_json(base_url: str):
+    """
+    The whole products.json catalog: an Arrow table built one record batch per
+    page (see catalog.py) when pyarrow is installed, else product dicts; []
+    when there is none. Marked incomplete (catalog.is_complete) when a page failed.
+    """
+    base_url = _normalize_url(base_url)
+    builder = catalog.Builder() if catalog.available() else None
+    collected = []
+    try:
+        for items in iter_product_pages(base_url):
+            _add_page(collected, items, base_url, builder)
+    except CatalogTruncated as e:
+        print(f"[products.json] {base_url} -> {e}, kept what was read")
+        return _finish_catalog(collected, builder, complete=False)
+    return _finish_catalog(collected, builder)
+
+
+async def _fetch_products_json_async(base_url: str):
     base_url = _normalize_url(base_url)
+    builder = catalog.Builder() if catalog.available() else None
+    collected = []
+    try:
+        async for items in aiter_product_pages(base_url):
+            _add_page(collected, items, base_url, builder)
+    except CatalogTruncated as e:
+        print(f"[products.json] {base_url} -> {e}, kept what was read")
+        return _finish_catalog(collected, builder, complete=False)
+    return _finish_catalog(collected, builder)
+
+
+# ---------------- Products via HTML ----------------
+def _parse_products_html(soup, base_url: str) -> list:
     products = []
-    soup = fetch_page(base_url, "collections/all")
-    if not soup:
-        return products
-    cards = soup.select("a[href*='/products/']")
     seen = set()
-    for a in cards:
+    for a, img in scan_page(soup).product_cards:
         href = a.get("href")
-        if not href or "/products/" not in href:
+        if not href:
             continue
         pu = _abs(base_url, href)
         if pu in seen:
@@ -194,7 +585,6 @@ def _fetch_products_html(base_url: str):
             title = clean_html(a["title"])
         if not title and a.text:
             title = clean_html(a.get_text(" ", strip=True))
-        img = a.find("img") or a.find_next("img")
         if img and (img.get("data-src") or img.get("src")):
             img_url = img.get("data-src") or img.get("src")
             img_url = _abs(base_url, img_url)
@@ -207,6 +597,23 @@ def _fetch_products_html(base_url: str):
     return products
 
 
+def _fetch_products_html(base_url: str):
+    base_url = _normalize_url(base_url)
+    soup = fetch_page(base_url, "collections/all")
+    if not soup:
+        return []
+    return _parse_products_html(soup, base_url)
+
+
+async def _fetch_products_html_async(base_url: str):
+    base_url = _normalize_url(base_url)
+    soup = await fetch_page_async(base_url, "collections/all")
+    if not soup:
+        return []
+    return _parse_products_html(soup, base_url)
+
+
+@metrics.timed(metrics.EXTRACT_SECONDS, section="products", mode="sync")
 def extract_products(base_url: str):
     items = _fetch_products_json(base_url)
     if not items:
@@ -214,18 +621,52 @@ def extract_products(base_url: str):
     return items
 
 
+def stream_products(base_url: str, prefetch: int = PRODUCTS_PREFETCH):
+    """Streaming form of extract_products: the full products.json catalog, else the HTML listing."""
+    found = False
+    try:
+        for item in iter_products(base_url, prefetch=prefetch):
+            found = True
+            yield item
+    except CatalogTruncated as e:
+        print(f"[products.json] {base_url} -> {e}")
+        return
+    if not found:
+        yield from _fetch_products_html(base_url)
+
+
+async def _tracked(coro):
+    """(result, URLs it read), kept apart from the caller's section sources."""
+    with validators.track_sources() as urls:
+        result = await coro
+    return result, urls
+
+
+@metrics.timed(metrics.EXTRACT_SECONDS, section="products", mode="async")
+async def extract_products_async(base_url: str):
+    # start the HTML fallback alongside products.json so a miss costs no extra round trip;
+    # its page only becomes a source of the section when its result is the one returned
+    html_task = asyncio.create_task(_tracked(_fetch_products_html_async(base_url)))
+    try:
+        items = await _fetch_products_json_async(base_url)
+        if not items:
+            items, urls = await html_task
+            for url in urls:
+                validators.note_source(url)
+        return items
+    finally:
+        html_task.cancel()
+
+
 # ---------------- Hero products ----------------
-def extract_hero_products(base_url: str):
-    base_url = _normalize_url(base_url)
+def _parse_hero_products(soup, base_url: str) -> list:
     products = []
-    soup = fetch_page(base_url)
     if not soup:
         return products
-    cards = soup.select("a[href*='/products/']")
     seen = set()
-    for a in cards:
+    for a, img in scan_page(soup).product_cards:
         href = a.get("href")
-        if not href or "/products/" not in href:
+        if not href:
             continue
         pu = _abs(base_url, href)
         if pu in seen:
@@ -237,7 +678,6 @@ def extract_hero_products(base_url: str):
         if not title and a.text:
             title = clean_html(a.get_text(" ", strip=True))
         img_url = ""
-        img = a.find("img") or a.find_next("img")
         if img and (img.get("data-src") or img.get("src")):
             img_url = img.get("data-src") or img.get("src")
             img_url = _abs(base_url, img_url)
@@ -251,13 +691,23 @@ def extract_hero_products(base_url: str):
     return products
 
 
-# ---------------- Important links ----------------
-def extract_links(base_url: str):
+@metrics.timed(metrics.EXTRACT_SECONDS, section="hero_products", mode="sync")
+def extract_hero_products(base_url: str):
+    base_url = _normalize_url(base_url)
+    return _parse_hero_products(fetch_page(base_url), base_url)
+
+
+@metrics.timed(metrics.EXTRACT_SECONDS, section="hero_products", mode="async")
+async def extract_hero_products_async(base_url: str):
     base_url = _normalize_url(base_url)
-    soup = fetch_page(base_url)
+    return _parse_hero_products(await fetch_page_async(base_url), base_url)
+
+
+# ---------------- Important links ----------------
+def _parse_links(soup, base_url: str) -> list:
     links = []
     if soup:
-        for a in soup.find_all("a", href=True):
+        for a in scan_page(soup).anchors:
             links.append(_abs(base_url, a["href"]))
     wanted = []
     for u in links:
@@ -271,3 +721,15 @@ def extract_links(base_url: str):
             dedup.append(u)
             seen.add(u)
     return dedup[:30]
+
+
+@metrics.timed(metrics.EXTRACT_SECONDS, section="important_links", mode="sync")
+def extract_links(base_url: str):
+    base_url = _normalize_url(base_url)
+    return _parse_links(fetch_page(base_url), base_url)
+
+
+@metrics.timed(metrics.EXTRACT_SECONDS, section="important_links", mode="async")
+async def extract_links_async(base_url: str):
+    base_url = _normalize_url(base_url)
+    return _parse_links(await fetch_page_async(base_url), base_url)
@@ -7,28 +7,202 @@ from scraper import (
     extract_products,
     extract_hero_products,
     extract_links,
+    extract_about_async,
+    extract_policies_async,
+    extract_contact_async,
+    extract_socials_async,
+    extract_faqs_async,
+    extract_products_async,
+    extract_hero_products_async,
+    extract_links_async,
     fetch_page,
+    fetch_page_async,
+    revalidate,
+    revalidate_async,
+    POLICY_PATHS,
 )
+from pagestore import crawl_scope
+import path_map
+import validators
+import metrics
+import fingerprint
+import catalog
+from htmlscan import scan_page
 from urllib.parse import urlparse
-import re
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+import asyncio
+import os
+import time
+
+# Per-store wall-clock budget (seconds) for the async crawl.
+CRAWL_DEADLINE = float(os.getenv("CRAWL_DEADLINE", "20"))
+# Stores crawled at the same time by fetch_competitors / crawl_sites.
+COMPETITOR_WORKERS = int(os.getenv("COMPETITOR_WORKERS", "6"))
 
 # ---------------- Fetch insights for a single brand ----------------
+@metrics.timed(metrics.CRAWL_SECONDS, mode="sync")
 def fetch_brand_insights(base_url: str):
     """
     Fetch all insights for a Shopify brand.
     Includes: about, policies, contact, socials, FAQs, products (with images), hero products, and links.
+    Pages are fetched and parsed once per crawl (see pagestore.PageStore), and
+    probe paths come from the store's learned path map (see path_map).
+    Sections whose source pages are unchanged since the last crawl are reused
+    as-is (see validators).
+    """
+    path_map.prepare(base_url)
+    validators.prepare(base_url)
+    try:
+        with crawl_scope() as store:
+            result = {
+                "brand_name": base_url,
+                "about": _run_section(base_url, "about", extract_about),
+                "policies": _run_section(base_url, "policies", extract_policies),
+                "contact_details": _run_section(base_url, "contact_details", extract_contact),
+                "social_handles": _run_section(base_url, "social_handles", extract_socials),
+                "faqs": _run_section(base_url, "faqs", extract_faqs),
+                "products": _run_section(base_url, "products", extract_products),            # ✅ includes image_url, product_url, price
+                "hero_products": _run_section(base_url, "hero_products", extract_hero_products),  # ✅ includes image_url, product_url
+                "important_links": _run_section(base_url, "important_links", extract_links),
+            }
+            _log_store_stats(base_url, store)
+    finally:
+        # every prepare is matched by a flush, so the per-store maps are released
+        path_map.flush(base_url)
+        validators.flush(base_url)
+    return result
+
+
+def _run_section(base_url: str, key: str, extract):
+    """Reuse the last result of a section if all its source pages revalidate, else extract."""
+    cached = validators.cached_section(base_url, key)
+    if cached and cached["sources"] and all(revalidate(url) for url in cached["sources"]):
+        return cached["result"]
+    with validators.track_sources() as sources:
+        result = extract(base_url)
+    if catalog.is_complete(result):   # a cut-short catalog is crawled again next time, not reused
+        validators.store_section(base_url, key, sources, result)
+    return result
+
+
+async def _run_section_async(base_url: str, key: str, extract):
+    cached = validators.cached_section(base_url, key)
+    if cached and cached["sources"]:
+        checks = await asyncio.gather(*(revalidate_async(url) for url in cached["sources"]))
+        if all(checks):
+            return cached["result"]
+    with validators.track_sources() as sources:
+        result = await extract(base_url)
+    if catalog.is_complete(result):
+        validators.store_section(base_url, key, sources, result)
+    return result
+
+
+def _log_store_stats(base_url: str, store):
+    stats = store.stats()
+    print(f"[page_store] {base_url} -> hits={stats['hits']} misses={stats['misses']} pages={stats['pages']}")
+
+# ---------------- Async variant ----------------
+def _empty_section(key: str):
+    """Value used for a section whose extractor failed or missed the deadline."""
+    if key == "about":
+        return "No about info found"
+    if key == "policies":
+        return {k: "Not available" for k in POLICY_PATHS}
+    if key == "contact_details":
+        return {"emails": [], "phone_numbers": [], "address": ""}
+    if key == "social_handles":
+        return {"facebook": "", "instagram": "", "twitter": "", "youtube": "", "tiktok": ""}
+    return []
+
+
+SECTIONS = {
+    "about": extract_about_async,
+    "policies": extract_policies_async,
+    "contact_details": extract_contact_async,
+    "social_handles": extract_socials_async,
+    "faqs": extract_faqs_async,
+    "products": extract_products_async,
+    "hero_products": extract_hero_products_async,
+    "important_links": extract_links_async,
+}
+
+
+async def stream_sections_async(base_url: str, keys=None, deadline: float = CRAWL_DEADLINE):
+    """
+    Run the extractors for `keys` (default: all sections) concurrently and
+    yield (key, result, ok) as each one finishes. Sections that fail or are
+    still running at the deadline come last with ok=False (pending ones are
+    cancelled). Closing the generator early cancels whatever is still running.
+    """
+    keys = list(SECTIONS) if keys is None else [k for k in SECTIONS if k in keys]
+    started = time.monotonic()
+    failed, pending = [], set()
+    try:
+        try:
+            await asyncio.wait_for(path_map.prepare_async(base_url), timeout=deadline / 2)
+        except asyncio.TimeoutError:
+            print(f"[path_map] {base_url} -> prepare timed out")
+        await asyncio.to_thread(validators.prepare, base_url)
+        ends = started + deadline
+
+        coros = {key: _run_section_async(base_url, key, SECTIONS[key]) for key in keys}
+        with crawl_scope() as store:
+            tasks = {asyncio.create_task(coro): key for key, coro in coros.items()}
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(ends - time.monotonic(), 0.1), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    key = tasks[task]
+                    if task.exception() is None:
+                        yield key, task.result(), True
+                    else:
+                        print(f"[fetch_brand_insights_async] {key} -> {task.exception()}")
+                        failed.append(key)
+            if pending:
+                print(f"[fetch_brand_insights_async] {base_url} -> {len(pending)} section(s) hit the {deadline}s deadline")
+            _log_store_stats(base_url, store)
+        for key in failed + [tasks[task] for task in pending]:
+            yield key, None, False
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.to_thread(path_map.flush, base_url)
+        await asyncio.to_thread(validators.flush, base_url)
+
+
+@metrics.timed(metrics.CRAWL_SECONDS, mode="async")
+async def crawl_sections_async(base_url: str, keys=None, deadline: float = CRAWL_DEADLINE):
+    """
+    Run the extractors for `keys` (default: all sections) concurrently.
+    Returns (results, missing): results holds the sections that finished in
+    time, missing the keys that failed or were cancelled at the deadline.
+    """
+    results, missing = {}, set()
+    async for key, result, ok in stream_sections_async(base_url, keys, deadline):
+        if ok:
+            results[key] = result
+        else:
+            missing.add(key)
+    return results, missing
+
+
+async def fetch_brand_insights_async(base_url: str, deadline: float = CRAWL_DEADLINE):
     """
-    return {
-        "brand_name": base_url,
-        "about": extract_about(base_url),
-        "policies": extract_policies(base_url),
-        "contact_details": extract_contact(base_url),
-        "social_handles": extract_socials(base_url),
-        "faqs": extract_faqs(base_url),
-        "products": extract_products(base_url),            # ✅ includes image_url, product_url, price
-        "hero_products": extract_hero_products(base_url),  # ✅ includes image_url, product_url
-        "important_links": extract_links(base_url),
-    }
+    Same result as fetch_brand_insights, but every extractor (and every probe
+    path inside it) runs concurrently. Sections that are still pending when
+    `deadline` expires are cancelled and reported as empty.
+    """
+    results, missing = await crawl_sections_async(base_url, deadline=deadline)
+    result = {"brand_name": base_url}
+    for key in SECTIONS:
+        result[key] = _empty_section(key) if key in missing else results[key]
+    return result
 
 # ---------------- Static competitor mapping ----------------
 competitor_map = {
@@ -40,17 +214,14 @@ competitor_map = {
 }
 
 # ---------------- Dynamic competitor discovery ----------------
-def discover_competitors(base_url: str, limit: int = 5):
-    """
-    Try to dynamically discover competitor Shopify stores by scanning outbound links.
-    Only returns domains that look like Shopify stores.
-    """
-    discovered = []
-    soup = fetch_page(base_url)
-    if not soup:
-        return discovered
+# outbound domains checked per store; only the ones fingerprinted as Shopify are crawled
+DISCOVERY_CANDIDATES = int(os.getenv("DISCOVERY_CANDIDATES", "25"))
 
-    for a in soup.find_all("a", href=True):
+
+def _parse_competitors(soup, base_url: str, limit: int) -> list:
+    """Candidate domains: hosts of absolute outbound links, in page order."""
+    discovered = []
+    for a in scan_page(soup).anchors:
         href = a["href"]
         # must be an absolute link
         if not href.startswith("http"):
@@ -58,42 +229,116 @@ def discover_competitors(base_url: str, limit: int = 5):
         domain = urlparse(href).netloc.lower()
 
         # skip self
-        if base_url in domain:
+        if not domain or base_url in domain:
             continue
 
-        # very naive Shopify detection
-        if ("myshopify.com" in domain) or re.search(r"\.com$", domain):
-            if domain not in discovered:
-                discovered.append(domain)
+        # name-only rejects (social networks, payment providers, ...) never reach a probe
+        if fingerprint.is_obviously_not_shopify(domain):
+            continue
+        if domain not in discovered:
+            discovered.append(domain)
 
         if len(discovered) >= limit:
             break
 
     return discovered
 
+
+def discover_competitors(base_url: str, limit: int = 5):
+    """
+    Try to dynamically discover competitor Shopify stores by scanning outbound links.
+    Only returns domains fingerprinted as Shopify stores (see fingerprint.py).
+    """
+    soup = fetch_page(base_url)
+    if not soup:
+        return []
+    return fingerprint.shopify_only(_parse_competitors(soup, base_url, DISCOVERY_CANDIDATES), limit)
+
+
+async def discover_competitors_async(base_url: str, limit: int = 5):
+    soup = await fetch_page_async(base_url)
+    if not soup:
+        return []
+    return await fingerprint.shopify_only_async(_parse_competitors(soup, base_url, DISCOVERY_CANDIDATES), limit)
+
 # ---------------- Competitor fetcher ----------------
+def _competitor_sites(base_url: str, discovered: list) -> list:
+    if base_url in competitor_map:
+        return [base_url] + competitor_map[base_url]
+    return [base_url] + discovered
+
+
+def competitor_sites(base_url: str) -> list:
+    """The store itself followed by its competitors (static map, else discovery)."""
+    discovered = [] if base_url in competitor_map else discover_competitors(base_url)
+    return _competitor_sites(base_url, discovered)
+
+
+def _timed_crawl(crawl, site: str) -> dict:
+    started = time.monotonic()
+    try:
+        result = dict(crawl(site))
+    except Exception as e:
+        result = {
+            "brand_name": site,
+            "error": str(e)
+        }
+    result["elapsed_ms"] = round((time.monotonic() - started) * 1000)
+    return result
+
+
+def crawl_sites(sites: list, crawl=fetch_brand_insights) -> list:
+    """
+    Crawl several stores at once on COMPETITOR_WORKERS threads. Results come
+    back in input order, each with its own elapsed_ms; a failing store yields
+    {"brand_name", "error"}. All threads share the caller's PageStore and the
+    process-wide request budget of http_client (HTTP_MAX_CONNECTIONS).
+    """
+    if not sites:
+        return []
+    workers = max(1, min(COMPETITOR_WORKERS, len(sites)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # copy_context: worker threads see the caller's crawl scope
+        futures = [pool.submit(copy_context().run, _timed_crawl, crawl, site) for site in sites]
+        return [f.result() for f in futures]
+
+
+async def crawl_sites_async(sites: list) -> list:
+    """Async counterpart of crawl_sites: at most COMPETITOR_WORKERS stores in flight."""
+    slots = asyncio.Semaphore(max(1, COMPETITOR_WORKERS))
+
+    async def crawl_one(site):
+        async with slots:
+            started = time.monotonic()
+            try:
+                result = dict(await fetch_brand_insights_async(site))
+            except Exception as e:
+                result = {
+                    "brand_name": site,
+                    "error": str(e)
+                }
+            result["elapsed_ms"] = round((time.monotonic() - started) * 1000)
+            return result
+
+    return list(await asyncio.gather(*(crawl_one(site) for site in sites)))
+
+
 def fetch_competitors(base_url: str):
     """
     Fetch insights for given store + competitors.
     First tries static competitor_map, falls back to dynamic discovery.
+    Stores are crawled in parallel (see crawl_sites).
     """
-    results = []
+    # one page store for the whole run, so discovery and the base crawl share the homepage
+    with crawl_scope():
+        # static, or fallback: discover dynamically
+        sites = competitor_sites(base_url)
+        return crawl_sites(sites)
 
-    # static
-    if base_url in competitor_map:
-        sites = [base_url] + competitor_map[base_url]
-    else:
-        # fallback: discover dynamically
-        dynamic_sites = discover_competitors(base_url)
-        sites = [base_url] + dynamic_sites
 
-    for site in sites:
-        try:
-            results.append(fetch_brand_insights(site))
-        except Exception as e:
-            results.append({
-                "brand_name": site,
-                "error": str(e)
-            })
-
-    return results
+async def fetch_competitors_async(base_url: str):
+    """Async counterpart of fetch_competitors; each store uses the concurrent crawl."""
+    with crawl_scope():
+        discovered = [] if base_url in competitor_map else await discover_competitors_async(base_url)
+        sites = _competitor_sites(base_url, discovered)
+        return await crawl_sites_async(sites)
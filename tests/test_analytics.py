@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+
+
+def _row(brand_id, prices, titles):
+    return {
+        "brand_id": brand_id,
+        "brand_name": f"brand{brand_id}",
+        "stats": analytics.price_stats(prices),
+        "keys": analytics.title_keys(titles),
+    }
+
+
+def test_compare_without_rows():
+    result = analytics.compare([])
+    assert result == {"bands": analytics.band_labels(analytics.ANALYTICS_PRICE_BANDS), "brands": [], "overlap": []}
+
+
+def test_compare_shares_and_overlap():
+    result = analytics.compare([
+        _row(1, [100.0, 300.0, float("nan")], ["Linen Shirt", "Silk Tie"]),
+        _row(2, [120.0], ["linen  shirt!"]),
+    ])
+    a, b = result["brands"]
+    assert (a["products"], a["priced"], b["priced"]) == (3, 2, 1)
+    assert a["band_share"][:2] == [0.5, 0.5] and b["band_share"][0] == 1.0
+    assert result["overlap"] == [{"brand_id_a": 1, "brand_id_b": 2, "shared": 1, "jaccard": 0.5}]
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select, text
+
+import catalog
+import db
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    db.init_db()
+
+
+def _products(site: str, n: int, price: str = "10.00") -> list:
+    return [
+        {"title": f"Linen Shirt {i}", "product_url": f"https://{site}/products/p{i}", "image_url": "", "price": price}
+        for i in range(n)
+    ]
+
+
+def _save(site: str, products) -> bool:
+    return db.save_brand_data(f"https://{site}", {"brand_name": f"https://{site}", "products": products})
+
+
+def _state(site: str) -> dict:
+    with db.engine.connect() as conn:
+        brand_id = conn.execute(select(db.Brand.id).where(db.Brand.domain == site)).scalar_one()
+
+        def count(model):
+            return conn.execute(select(func.count()).select_from(model).where(model.brand_id == brand_id)).scalar()
+
+        hits = conn.execute(text(
+            "SELECT count(*) FROM search_fts JOIN search_docs d ON d.id = search_fts.rowid "
+            "WHERE search_fts MATCH :q AND d.brand_id = :brand_id AND d.section = 'products'"
+        ), {"q": db._fts_query("linen shirt"), "brand_id": brand_id}).scalar()
+        changes = sorted(
+            (c.change, c.product_url.rsplit("/", 1)[-1])
+            for c in conn.execute(select(db.ProductChange).where(db.ProductChange.brand_id == brand_id))
+        )
+        return {"products": count(db.Product), "snapshots": count(db.CatalogSnapshot), "changes": changes, "hits": hits}
+
+
+def test_catalog_changes_are_deltas():
+    _save("deltas.test", _products("deltas.test", 3))
+    assert _state("deltas.test") == {"products": 3, "snapshots": 1, "changes": [], "hits": 3}
+
+    products = _products("deltas.test", 4)
+    products[0]["price"] = "12.50"
+    del products[1]
+    _save("deltas.test", products)
+    state = _state("deltas.test")
+    assert state["changes"] == [("added", "p3"), ("price", "p0"), ("removed", "p1")]
+    assert (state["products"], state["snapshots"]) == (3, 2)
+
+
+def test_empty_catalog_keeps_products_and_search():
+    _save("empty.test", _products("empty.test", 3))
+    _save("empty.test", [])
+    assert _state("empty.test") == {"products": 3, "snapshots": 1, "changes": [], "hits": 3}
+    # the stored catalog stands in for the failed one, so a repeat is unchanged
+    assert _save("empty.test", []) is False
+
+
+def test_incomplete_catalog_records_no_removals():
+    _save("partial.test", _products("partial.test", 3))
+    first_page = _products("partial.test", 1, price="15.00")
+    _save("partial.test", catalog.incomplete(first_page))
+    assert _state("partial.test") == {"products": 3, "snapshots": 2, "changes": [("price", "p0")], "hits": 3}
+
+
+def test_fts_query_quotes_every_term():
+    assert db._fts_query('argan "hair oil"') == '"argan" "hair oil"'
+    assert db._fts_query("-x OR near*") == '"x" "OR" "near"'   # operators stay plain words
+    assert db._fts_query('"" !!') == ""
+
+
+def test_search_hits_link_to_their_source_page():
+    db.save_store_paths("source.test", [
+        {"path": "pages/faq", "section": "faq", "ok": True, "checked_at": datetime.utcnow()},
+        {"path": "policies/refund-policy", "section": "refund_policy", "ok": True, "checked_at": datetime.utcnow()},
+    ])
+    db.save_brand_data("https://source.test", {
+        "brand_name": "https://source.test",
+        "faqs": [{"question": "Do you ship abroad?", "answer": "Worldwide shipping on every order."}],
+        "about": "Handmade ceramics from a small studio.",
+        "policies": {"refund_policy": "Refunds within thirty days."},
+    })
+
+    async def search(q):
+        try:
+            return {hit["section"]: hit["url"] for hit in await db.search_async(q)}
+        finally:
+            await db.dispose_async_engine()
+
+    assert asyncio.run(search("worldwide shipping")) == {"faqs": "https://source.test/pages/faq"}
+    assert asyncio.run(search("thirty days")) == {"policies": "https://source.test/policies/refund-policy"}
+    assert asyncio.run(search("handmade ceramics")) == {"about": "https://source.test/"}   # no page known
@@ -0,0 +1,19 @@
+import fingerprint
+
+
+def test_myshopify_links_are_probed(monkeypatch):
+    probed = []
+
+    def probe(domain):
+        probed.append(domain)
+        return "unreachable"
+
+    monkeypatch.setattr(fingerprint, "probe", probe)
+    monkeypatch.setattr(fingerprint, "get_store_verdicts", lambda domains: {})
+    monkeypatch.setattr(fingerprint, "save_store_verdicts", lambda verdicts: None)
+    monkeypatch.setattr(fingerprint, "_verdicts", {})
+
+    verdicts = fingerprint.classify(["https://closed-shop.myshopify.com/", "instagram.com"])
+    assert verdicts == {"closed-shop.myshopify.com": "unreachable", "instagram.com": "other"}
+    assert probed == ["closed-shop.myshopify.com"]
+    assert fingerprint.shopify_only(["closed-shop.myshopify.com"]) == []
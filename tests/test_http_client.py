@@ -0,0 +1,114 @@
+import time
+
+import pytest
+import requests
+
+import http_client
+from http_client import HostScheduler, HostUnavailable
+
+HOST = "shop.test"
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    monkeypatch.setattr(http_client, "HTTP_BREAKER_THRESHOLD", 3)
+    monkeypatch.setattr(http_client, "HTTP_BREAKER_COOLDOWN", 0.05)
+
+
+def _confirmed() -> HostScheduler:
+    scheduler = HostScheduler()
+    assert scheduler.reserve(HOST) == 0
+    scheduler.success(HOST, 200)
+    return scheduler
+
+
+def test_one_pilot_until_the_host_answers():
+    scheduler = HostScheduler()
+    assert scheduler.reserve(HOST) == 0
+    assert scheduler.reserve(HOST) == http_client._PILOT_POLL
+    scheduler.success(HOST, 200)
+    assert scheduler.reserve(HOST) == 0 and scheduler.reserve(HOST) == 0
+
+
+def test_token_bucket_spaces_requests(monkeypatch):
+    monkeypatch.setattr(http_client, "HTTP_HOST_BURST", 2)
+    scheduler = _confirmed()
+    assert scheduler.reserve(HOST) == 0
+    assert 0 < scheduler.reserve(HOST) <= 1 / http_client.HTTP_HOST_RATE
+
+
+def test_throttle_honours_retry_after():
+    scheduler = _confirmed()
+    scheduler.success(HOST, 429, retry_after=1.0)
+    assert 0.9 < scheduler.reserve(HOST) <= 1.0
+
+
+def test_circuit_opens_after_threshold_then_half_opens(breaker):
+    scheduler = _confirmed()
+    for _ in range(3):
+        scheduler.reserve(HOST)
+        scheduler.failure(HOST)
+    assert scheduler.is_open(HOST)
+    with pytest.raises(HostUnavailable):
+        scheduler.reserve(HOST)
+
+    time.sleep(0.06)
+    assert scheduler.reserve(HOST) == 0                              # half-open: one probe
+    assert scheduler.reserve(HOST) == http_client._PILOT_POLL
+    scheduler.success(HOST, 200)
+    assert scheduler.reserve(HOST) == 0
+
+
+def test_failed_pilot_counts_like_any_failure(breaker):
+    scheduler = HostScheduler()
+    scheduler.reserve(HOST)
+    scheduler.failure(HOST)
+    assert not scheduler.is_open(HOST)
+    assert scheduler.reserve(HOST) == 0                              # the next request is the pilot
+
+
+def test_other_answers_reset_the_count(breaker):
+    scheduler = _confirmed()
+    for status in (404, 500):
+        scheduler.failure(HOST)
+        scheduler.failure(HOST)
+        scheduler.success(HOST, status)
+    scheduler.failure(HOST)
+    assert not scheduler.is_open(HOST)
+
+
+class _Resp:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = b""
+
+
+class _Session:
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return _Resp(self.outcome)
+
+
+@pytest.mark.parametrize("outcome", [requests.ConnectionError("refused"), 503, 404])
+def test_a_retried_request_counts_once(breaker, monkeypatch, outcome):
+    scheduler = HostScheduler()
+    session = _Session(outcome)
+    monkeypatch.setattr(http_client, "_scheduler", scheduler)
+    monkeypatch.setattr(http_client, "get_session", lambda: session)
+    monkeypatch.setattr(http_client, "_backoff", lambda attempt: 0)
+
+    if isinstance(outcome, Exception):
+        with pytest.raises(requests.ConnectionError):
+            http_client.get(f"http://{HOST}/", retries=2)
+    else:
+        assert http_client.get(f"http://{HOST}/", retries=2).status_code == outcome
+    assert session.calls == (1 if outcome == 404 else 3)
+    assert scheduler._hosts[HOST].failures == (0 if outcome == 404 else 1)
+    assert not scheduler.is_open(HOST)
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+import insights_cache
+from service import SECTIONS
+
+
+@pytest.fixture
+def crawls(monkeypatch):
+    """Fake crawl: records the sections asked for and returns "v<n>" for each after a short wait."""
+    calls = []
+
+    async def crawl(website_url, keys):
+        calls.append(sorted(keys))
+        await asyncio.sleep(0.05)
+        return {key: f"v{len(calls)}" for key in keys}, set()
+
+    async def no_snapshot(domain):
+        return None
+
+    monkeypatch.setattr(insights_cache, "crawl_sections_async", crawl)
+    monkeypatch.setattr(insights_cache, "get_brand_snapshot_async", no_snapshot)
+    monkeypatch.setattr(insights_cache, "save_brand_data", lambda brand_name, data: None)
+    monkeypatch.setattr(insights_cache, "_entries", insights_cache.OrderedDict())
+    monkeypatch.setattr(insights_cache, "_inflight", {})
+    return calls
+
+
+def test_concurrent_lookups_share_one_crawl(crawls):
+    async def run():
+        return await asyncio.gather(*(insights_cache.get_insights("shop.test") for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert len(crawls) == 1 and all(status == "miss" for _, status in results)
+
+
+def test_forced_refresh_does_not_settle_for_a_partial_one(crawls):
+    async def run():
+        insights_cache._start_refresh("shop.test", "shop.test", ["products"])
+        return await insights_cache.get_insights("shop.test", refresh=True)
+
+    data, status = asyncio.run(run())
+    others = sorted(key for key in SECTIONS if key != "products")
+    assert crawls == [["products"], others]
+    assert all(data[key] in ("v1", "v2") for key in SECTIONS)
+
+
+def test_stream_joining_a_refresh_labels_what_it_crawled(crawls, monkeypatch):
+    async def crawl_without_faqs(website_url, keys):
+        crawls.append(sorted(keys))
+        await asyncio.sleep(0.05)
+        return {key: "v1" for key in keys if key != "faqs"}, {"faqs"}
+
+    monkeypatch.setattr(insights_cache, "crawl_sections_async", crawl_without_faqs)
+
+    async def run():
+        insights_cache._start_refresh("shop.test", "shop.test", list(SECTIONS))
+        return [e async for e in insights_cache.stream_insights("shop.test")]
+
+    summary = asyncio.run(run())[-1]
+    assert len(crawls) == 1
+    assert summary["missing"] == ["faqs"]
+    assert all(source == "crawl" for key, source in summary["sources"].items() if key != "faqs")
@@ -0,0 +1,51 @@
+import pytest
+
+import path_map
+import validators
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    """In-memory stand-ins for the store_paths / validator tables."""
+    saved = {"paths": [], "pages": [], "sections": {}}
+    monkeypatch.setattr(path_map, "PATH_MAP_USE_SITEMAP", False)
+    monkeypatch.setattr(path_map, "get_store_paths", lambda domain: [])
+    monkeypatch.setattr(path_map, "save_store_paths", lambda domain, entries: saved["paths"].extend(entries))
+    monkeypatch.setattr(validators, "CONDITIONAL_REFRESH", True)
+    monkeypatch.setattr(validators, "get_page_validators", lambda domain: [])
+    monkeypatch.setattr(validators, "get_section_results", lambda domain: {})
+    monkeypatch.setattr(validators, "save_page_validators", lambda domain, pages: saved["pages"].extend(pages))
+    monkeypatch.setattr(validators, "save_section_results", lambda domain, sections: saved["sections"].update(sections))
+    for module, names in ((path_map, ("_maps", "_dirty", "_crawls")), (validators, ("_state", "_crawls"))):
+        for name in names:
+            monkeypatch.setattr(module, name, {})
+    monkeypatch.setattr(path_map, "_loaded", set())
+    return saved
+
+
+def test_overlapping_crawl_keeps_known_misses(stores):
+    path_map.prepare("shop.test")
+    path_map.prepare("shop.test")
+    path_map.record("http://shop.test/pages/faq", 404)
+
+    path_map.flush("shop.test")   # first crawl ends, the second is still running
+    assert path_map.is_known_miss("shop.test", "pages/faq")
+    assert [e["path"] for e in stores["paths"]] == ["pages/faq"]
+
+    path_map.flush("shop.test")
+    assert "shop.test" not in path_map._maps and not path_map._crawls
+
+
+def test_overlapping_crawl_keeps_validator_state(stores):
+    validators.prepare("shop.test")
+    validators.prepare("shop.test")
+    validators.store_section("shop.test", "about", ["http://shop.test/pages/about"], "About us")
+
+    validators.flush("shop.test")
+    assert validators.cached_section("shop.test", "about")["result"] == "About us"
+    assert list(stores["sections"]) == ["about"]
+
+    validators.store_section("shop.test", "faqs", [], [])
+    validators.flush("shop.test")
+    assert list(stores["sections"]) == ["about", "faqs"]
+    assert validators.cached_section("shop.test", "about") is None
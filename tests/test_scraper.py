@@ -0,0 +1,17 @@
+import catalog
+import scraper
+
+
+def test_failed_later_page_marks_catalog_incomplete(monkeypatch):
+    pages = {1: [{"title": "A", "handle": "a"}, {"title": "B", "handle": "b"}], 2: None}
+    monkeypatch.setattr(scraper, "PRODUCTS_PAGE_SIZE", 2)
+    monkeypatch.setattr(scraper, "_fetch_products_page", lambda base_url, page: pages.get(page, []))
+    items = scraper._fetch_products_json("shop.test")
+    assert [p["title"] for p in catalog.to_dicts(items)] == ["A", "B"]
+    assert not catalog.is_complete(items)
+
+
+def test_failed_first_page_is_no_catalog(monkeypatch):
+    monkeypatch.setattr(scraper, "_fetch_products_page", lambda base_url, page: None)
+    items = scraper._fetch_products_json("shop.test")
+    assert items == [] and catalog.is_complete(items)
@@ -0,0 +1,185 @@
+import os
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from pagestore import normalize_key
+from http_client import RETRY_STATUSES
+from db import get_page_validators, save_page_validators, get_section_results, save_section_results
+
+# ---------- Settings ----------
+CONDITIONAL_REFRESH = os.getenv("CONDITIONAL_REFRESH", "1") == "1"
+
+# domain -> {"pages": {key: validator}, "sections": {section: {...}}, "dirty_pages": {...}, "dirty_sections": {...}}
+_state = {}
+# domain -> crawls between prepare() and flush(); the state is dropped when the last one flushes
+_crawls = {}
+_lock = threading.Lock()
+
+
+def _domain(url: str) -> str:
+    if not url.startswith(("http://", "https://")):
+        url = "http://" + url
+    return urlsplit(url).netloc.lower()
+
+
+def _page_key(url: str) -> str:
+    parts = urlsplit(normalize_key(url))
+    return parts.path + ("?" + parts.query if parts.query else "")
+
+
+def body_hash(body: bytes) -> str:
+    return hashlib.sha256(body or b"").hexdigest()
+
+
+def _domain_state(domain: str) -> dict:
+    return _state.setdefault(domain, {"pages": {}, "sections": {}, "dirty_pages": {}, "dirty_sections": {}})
+
+
+# ---------------- Page validators ----------------
+def remember(url: str, resp):
+    """
+    Keep ETag / Last-Modified / body hash of a response (requests or httpx).
+    Only stores being crawled (see prepare) are tracked.
+    """
+    domain = _domain(url)
+    if domain not in _state or resp.status_code in RETRY_STATUSES:
+        return
+    if resp.status_code == 304:
+        with _lock:
+            entry = _state[domain]["pages"].get(_page_key(url))
+            if entry:
+                entry["fetched_at"] = datetime.utcnow()
+        return
+    entry = {
+        "path": _page_key(url),
+        "status": resp.status_code,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "body_hash": body_hash(resp.content) if resp.status_code == 200 else "",
+        "fetched_at": datetime.utcnow(),
+    }
+    with _lock:
+        state = _domain_state(domain)
+        state["pages"][entry["path"]] = entry
+        state["dirty_pages"][entry["path"]] = entry
+
+
+def conditional_headers(url: str):
+    """Headers for a conditional GET, or None when the URL was never fetched."""
+    with _lock:
+        entry = _state.get(_domain(url), {}).get("pages", {}).get(_page_key(url))
+    if entry is None:
+        return None
+    headers = {}
+    if entry["status"] == 200:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def unchanged(url: str, resp) -> bool:
+    """304, or the same status and body as the last recorded fetch."""
+    if resp.status_code == 304:
+        return True
+    if resp.status_code in RETRY_STATUSES:
+        return False
+    with _lock:
+        entry = _state.get(_domain(url), {}).get("pages", {}).get(_page_key(url))
+    if entry is None or entry["status"] != resp.status_code:
+        return False
+    return resp.status_code != 200 or entry["body_hash"] == body_hash(resp.content)
+
+
+# ---------------- Section sources ----------------
+_sources = ContextVar("section_sources", default=None)
+
+
+@contextmanager
+def track_sources():
+    """Collect every URL read while the enclosed extractor runs."""
+    urls = []
+    token = _sources.set(urls)
+    try:
+        yield urls
+    finally:
+        _sources.reset(token)
+
+
+def note_source(url: str):
+    urls = _sources.get()
+    if urls is not None and url not in urls:
+        urls.append(url)
+
+
+def cached_section(base_url: str, section: str):
+    """Last stored {"sources", "result"} of a section, if conditional refresh is on."""
+    if not CONDITIONAL_REFRESH:
+        return None
+    with _lock:
+        return _state.get(_domain(base_url), {}).get("sections", {}).get(section)
+
+
+def store_section(base_url: str, section: str, sources: list, result):
+    if not CONDITIONAL_REFRESH:
+        return
+    entry = {"sources": list(sources), "result": result}
+    with _lock:
+        state = _domain_state(_domain(base_url))
+        state["sections"][section] = entry
+        state["dirty_sections"][section] = entry
+
+
+# ---------------- Load / flush ----------------
+def prepare(base_url: str):
+    """Load the store's validators and section results before a crawl."""
+    if not CONDITIONAL_REFRESH:
+        return
+    domain = _domain(base_url)
+    with _lock:
+        _crawls[domain] = _crawls.get(domain, 0) + 1
+    try:
+        pages = get_page_validators(domain)
+        sections = get_section_results(domain)
+    except Exception as e:
+        print(f"[validators] load {domain} -> {e}")
+        return
+    with _lock:
+        state = _domain_state(domain)
+        for entry in pages:
+            state["pages"].setdefault(entry["path"], entry)
+        for section, entry in sections.items():
+            state["sections"].setdefault(section, entry)
+
+
+def flush(base_url: str):
+    """
+    Persist what changed during the crawl. The store's in-memory state is
+    dropped once no other crawl of it is running.
+    """
+    if not CONDITIONAL_REFRESH:
+        return
+    domain = _domain(base_url)
+    with _lock:
+        state = _state.get(domain)
+        pages, sections = ({}, {}) if state is None else (state["dirty_pages"], state["dirty_sections"])
+        if state is not None:
+            state["dirty_pages"], state["dirty_sections"] = {}, {}
+    try:
+        if pages:
+            save_page_validators(domain, list(pages.values()))
+        if sections:
+            save_section_results(domain, sections)
+    except Exception as e:
+        print(f"[validators] flush {domain} -> {e}")
+    with _lock:
+        running = _crawls.pop(domain, 0) - 1
+        if running > 0:
+            _crawls[domain] = running
+        else:
+            _state.pop(domain, None)